@@ -0,0 +1,84 @@
+"""
+Helpers shared by the benchmarks.
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize_latencies(samples: list[dict[str, float]]) -> dict[str, dict[str, Any]]:
+    """
+    Computes latency statistics of every stage.
+
+    Parameters
+    ----------
+    samples : list[dict[str, float]]
+        Durations in milliseconds keyed by stage name, one dictionary per
+        request; a request may miss some stages.
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        The count, mean and p50/p95/p99 of every stage, keyed by stage name.
+    """
+    stages = sorted({stage for sample in samples for stage in sample})
+    latency = {}
+    for stage in stages:
+        values = np.array([s[stage] for s in samples if stage in s])
+        latency[stage] = {
+            "count": len(values),
+            "mean": round(float(values.mean()), 2),
+            **{f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES},
+        }
+    return latency
+
+
+def load_report(path: str) -> dict[str, Any]:
+    """
+    Reads a benchmark report.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON report.
+
+    Returns
+    -------
+    dict[str, Any]
+        The report.
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_report(report: dict[str, Any], path: str) -> None:
+    """
+    Writes a benchmark report as indented JSON, creating its directory.
+
+    Keys are written in insertion order, so reports of two runs can be
+    compared with a plain text diff.
+
+    Parameters
+    ----------
+    report : dict[str, Any]
+        The report.
+    path : str
+        Path of the JSON file.
+
+    Returns
+    -------
+    None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    logger.info("Report written to %s", path)
@@ -0,0 +1,486 @@
+"""
+Offline load test of the /chat endpoint.
+
+Builds a synthetic Chroma collection, starts the stub LLM and the API with
+uvicorn, drives concurrent traffic and writes throughput and per-stage latency
+percentiles as JSON. Nothing leaves the machine, so runs are comparable.
+
+    LOAD_TEST_DOCS=20000 LOAD_TEST_CONCURRENCY=16 python -m benchmarks.load_test
+
+Per-stage durations ('embed', 'search', 'rerank', 'prompt', 'llm') come from
+the Server-Timing header of /chat. With LOAD_TEST_STREAM=1, /chat/stream is
+used instead and the time to the first answer delta is reported.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any
+
+import httpx
+import numpy as np
+
+from benchmarks import stub_llm
+from benchmarks.common import summarize_latencies, write_report
+from data_ingest.modules.lexical_index import build_lexical_index
+from data_ingest.modules.vector_db import (
+    load_vector_db,
+    publish_index_version,
+    save_to_vector_db,
+)
+from utils.paths import find_repo_root, get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+LOAD_TEST_DOCS = int(os.environ.get("LOAD_TEST_DOCS", 5000))
+# must match the dimension of the embedding model used by the API
+LOAD_TEST_EMBEDDING_DIM = int(os.environ.get("LOAD_TEST_EMBEDDING_DIM", 384))
+LOAD_TEST_REQUESTS = int(os.environ.get("LOAD_TEST_REQUESTS", 200))
+LOAD_TEST_WARMUP_REQUESTS = int(os.environ.get("LOAD_TEST_WARMUP_REQUESTS", 10))
+LOAD_TEST_CONCURRENCY = int(os.environ.get("LOAD_TEST_CONCURRENCY", 8))
+LOAD_TEST_WORKERS = int(os.environ.get("LOAD_TEST_WORKERS", 1))
+LOAD_TEST_STREAM = os.environ.get("LOAD_TEST_STREAM", "0") == "1"
+# with 0, every query is unique and the embedding and answer caches are off
+LOAD_TEST_CACHE = os.environ.get("LOAD_TEST_CACHE", "0") == "1"
+LOAD_TEST_API_PORT = int(os.environ.get("LOAD_TEST_API_PORT", 8765))
+LOAD_TEST_LLM_PORT = int(os.environ.get("LOAD_TEST_LLM_PORT", 8766))
+LOAD_TEST_READY_TIMEOUT = float(os.environ.get("LOAD_TEST_READY_TIMEOUT", 300.0))
+LOAD_TEST_SEED = int(os.environ.get("LOAD_TEST_SEED", 0))
+LOAD_TEST_OUTPUT = os.environ.get(
+    "LOAD_TEST_OUTPUT",
+    get_data_dir("benchmarks", f"load_test_{datetime.now():%Y%m%dT%H%M%S}.json"),
+)
+
+VOCABULARY = (
+    "dziekanat rekrutacja stypendium egzamin sesja semestr przedmiot wykład "
+    "laboratorium projekt praca dyplomowa promotor harmonogram opłata legitymacja "
+    "urlop regulamin ECTS USOS sala gmach Koszykowa informatyka matematyka "
+    "analiza danych Data Science praktyki erasmus akademik konsultacje "
+    "prodziekan samorząd koło naukowe obrona termin wniosek zaliczenie"
+).split()
+
+QUESTIONS = (
+    "Jakie są godziny otwarcia dziekanatu?",
+    "Kiedy zaczyna się sesja egzaminacyjna?",
+    "Jak złożyć wniosek o stypendium rektora?",
+    "Gdzie znajduje się sala 301?",
+    "Ile punktów ECTS trzeba zdobyć w semestrze?",
+    "Kto jest prodziekanem do spraw studenckich?",
+    "Jak wygląda obrona pracy dyplomowej?",
+    "Jakie przedmioty obieralne są dostępne na kierunku IAD?",
+    "Jak zapisać się na praktyki studenckie?",
+    "Czy można wyjechać na Erasmusa na studiach magisterskich?",
+)
+
+
+def build_synthetic_database(path_to_database: str, num_docs: int, dim: int) -> None:
+    """
+    Fills a new Chroma database with random facts and publishes its version.
+
+    Texts are random sequences of university vocabulary, so the BM25 index has
+    realistic term statistics; embeddings are random unit vectors.
+
+    Parameters
+    ----------
+    path_to_database : str
+        Directory of the new database.
+    num_docs : int
+        The number of facts.
+    dim : int
+        The embedding dimension.
+
+    Returns
+    -------
+    None
+    """
+    rng = np.random.default_rng(LOAD_TEST_SEED)
+
+    texts = [
+        f"Fakt {i}: " + " ".join(rng.choice(VOCABULARY, size=rng.integers(8, 30)))
+        for i in range(num_docs)
+    ]
+    urls = [f"https://ww2.mini.pw.edu.pl/synthetic/{i % 500}" for i in range(num_docs)]
+
+    embeddings = rng.standard_normal((num_docs, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    save_to_vector_db(texts, embeddings.tolist(), urls, path_to_database)
+    build_lexical_index(load_vector_db(path_to_database), path_to_database)
+    publish_index_version(path_to_database)
+
+
+def start_server(
+    app: str, port: int, env: dict[str, str], workers: int = 1
+) -> subprocess.Popen:
+    """
+    Starts a uvicorn server in a subprocess.
+
+    Parameters
+    ----------
+    app : str
+        The application import string, e.g. 'rag_api.api:app'.
+    port : int
+        The port to bind on localhost.
+    env : dict[str, str]
+        The environment of the server.
+    workers : int, optional
+        The number of worker processes, by default 1.
+
+    Returns
+    -------
+    subprocess.Popen
+        The server process.
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        app,
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    """
+    Polls a readiness endpoint until it answers with 200.
+
+    Parameters
+    ----------
+    url : str
+        The readiness URL.
+    process : subprocess.Popen
+        The server process, checked for an early exit.
+    timeout : float
+        Maximum waiting time in seconds.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    RuntimeError
+        If the server exits or is not ready in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"Server for {url} exited with code {process.returncode}"
+            )
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} was not ready within {timeout:.0f} s")
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    """
+    Parses a Server-Timing header into stage durations.
+
+    Parameters
+    ----------
+    header : str
+        The header value, e.g. 'embed;dur=12.3, search;dur=4.1'.
+
+    Returns
+    -------
+    dict[str, float]
+        Durations in milliseconds keyed by stage name.
+    """
+    timings = {}
+    for metric in header.split(","):
+        name, *params = (part.strip() for part in metric.split(";"))
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key == "dur":
+                timings[name] = float(value)
+    return timings
+
+
+def make_query(i: int) -> str:
+    """
+    Returns the i-th query of the run.
+
+    Parameters
+    ----------
+    i : int
+        The request number.
+
+    Returns
+    -------
+    str
+        A question, made unique with random keywords unless LOAD_TEST_CACHE is set.
+    """
+    question = QUESTIONS[i % len(QUESTIONS)]
+    if LOAD_TEST_CACHE:
+        return question
+    keywords = " ".join(random.sample(VOCABULARY, 3))
+    return f"{question} ({keywords} {i})"
+
+
+async def send_request(client: httpx.AsyncClient, query: str) -> dict[str, float]:
+    """
+    Sends one chat request and measures it.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        The client bound to the API.
+    query : str
+        The question.
+
+    Returns
+    -------
+    dict[str, float]
+        The client-side 'total' latency, 'first_delta' for streaming requests,
+        and the server stage durations for /chat, all in milliseconds.
+
+    Raises
+    ------
+    httpx.HTTPError
+        If the request fails.
+    """
+    started = time.perf_counter()
+
+    if not LOAD_TEST_STREAM:
+        response = await client.post("/chat", json={"query": query})
+        response.raise_for_status()
+        sample = parse_server_timing(response.headers.get("Server-Timing", ""))
+        sample["total"] = (time.perf_counter() - started) * 1000
+        return sample
+
+    sample = {}
+    async with client.stream("POST", "/chat/stream", json={"query": query}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line == "event: delta" and "first_delta" not in sample:
+                sample["first_delta"] = (time.perf_counter() - started) * 1000
+            elif line == "event: error":
+                raise httpx.HTTPError("The API reported an LLM error mid-stream")
+    sample["total"] = (time.perf_counter() - started) * 1000
+    return sample
+
+
+async def run_load(
+    base_url: str, num_requests: int, concurrency: int, offset: int = 0
+) -> tuple[list[dict[str, float]], int, float]:
+    """
+    Sends requests from `concurrency` concurrent clients.
+
+    Parameters
+    ----------
+    base_url : str
+        The URL of the API.
+    num_requests : int
+        The total number of requests.
+    concurrency : int
+        The number of requests in flight at any time.
+    offset : int, optional
+        Number of the first request, used to keep queries unique, by default 0.
+
+    Returns
+    -------
+    tuple[list[dict[str, float]], int, float]
+        The samples of successful requests, the number of failed requests and
+        the wall-clock duration in seconds.
+    """
+    samples: list[dict[str, float]] = []
+    errors = 0
+    next_request = iter(range(offset, offset + num_requests))
+
+    limits = httpx.Limits(max_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            for i in next_request:
+                try:
+                    samples.append(await send_request(client, make_query(i)))
+                except httpx.HTTPError as e:
+                    logger.warning("Request %d failed: %s", i, e)
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+
+    return samples, errors, duration
+
+
+def summarize(
+    samples: list[dict[str, float]], errors: int, duration: float
+) -> dict[str, Any]:
+    """
+    Computes throughput and latency percentiles of every stage.
+
+    Parameters
+    ----------
+    samples : list[dict[str, float]]
+        The per-request durations in milliseconds.
+    errors : int
+        The number of failed requests.
+    duration : float
+        The wall-clock duration of the run in seconds.
+
+    Returns
+    -------
+    dict[str, Any]
+        'requests', 'errors', 'duration_s', 'rps' and, under 'latency_ms', the
+        count, mean and p50/p95/p99 of every stage.
+    """
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "rps": round(len(samples) / duration, 2) if duration else 0.0,
+        "latency_ms": summarize_latencies(samples),
+    }
+
+
+def main() -> None:
+    """
+    Runs the load test and writes the report to LOAD_TEST_OUTPUT.
+
+    The stub LLM takes its latency and streaming settings from the STUB_LLM_*
+    environment variables (see `benchmarks.stub_llm`); all other variables
+    are passed to the API, so retrieval settings such as HYBRID_SEARCH or
+    RERANK_ENABLED can be benchmarked as well.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    random.seed(LOAD_TEST_SEED)
+    work_dir = tempfile.mkdtemp(prefix="chatbot_load_test_")
+    database_path = os.path.join(work_dir, "chroma_db")
+
+    logger.info(
+        "Building a synthetic collection of %d facts (dim %d) in %s",
+        LOAD_TEST_DOCS,
+        LOAD_TEST_EMBEDDING_DIM,
+        database_path,
+    )
+    started = time.perf_counter()
+    build_synthetic_database(database_path, LOAD_TEST_DOCS, LOAD_TEST_EMBEDDING_DIM)
+    logger.info("Collection built in %.1f s", time.perf_counter() - started)
+
+    python_path = [os.path.join(find_repo_root(), "src"), os.environ.get("PYTHONPATH")]
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, python_path)),
+        "CHROMA_DIR": database_path,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{LOAD_TEST_LLM_PORT}/v1",
+        "OPENROUTER_API_KEY": "stub",
+    }
+    if not LOAD_TEST_CACHE:
+        env["EMBEDDING_CACHE_SIZE"] = "0"
+        env["ANSWER_CACHE_SIZE"] = "0"
+
+    llm_url = f"http://127.0.0.1:{LOAD_TEST_LLM_PORT}"
+    api_url = f"http://127.0.0.1:{LOAD_TEST_API_PORT}"
+    processes = []
+    try:
+        processes.append(
+            start_server("benchmarks.stub_llm:app", LOAD_TEST_LLM_PORT, env)
+        )
+        processes.append(
+            start_server("rag_api.api:app", LOAD_TEST_API_PORT, env, LOAD_TEST_WORKERS)
+        )
+        wait_until_ready(f"{llm_url}/healthz", processes[0], LOAD_TEST_READY_TIMEOUT)
+        wait_until_ready(f"{api_url}/readyz", processes[1], LOAD_TEST_READY_TIMEOUT)
+
+        if LOAD_TEST_WARMUP_REQUESTS:
+            logger.info("Sending %d warm-up requests", LOAD_TEST_WARMUP_REQUESTS)
+            asyncio.run(
+                run_load(api_url, LOAD_TEST_WARMUP_REQUESTS, LOAD_TEST_CONCURRENCY)
+            )
+
+        logger.info(
+            "Sending %d requests with concurrency %d",
+            LOAD_TEST_REQUESTS,
+            LOAD_TEST_CONCURRENCY,
+        )
+        samples, errors, duration = asyncio.run(
+            run_load(
+                api_url,
+                LOAD_TEST_REQUESTS,
+                LOAD_TEST_CONCURRENCY,
+                offset=LOAD_TEST_WARMUP_REQUESTS,
+            )
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "docs": LOAD_TEST_DOCS,
+            "embedding_dim": LOAD_TEST_EMBEDDING_DIM,
+            "requests": LOAD_TEST_REQUESTS,
+            "concurrency": LOAD_TEST_CONCURRENCY,
+            "workers": LOAD_TEST_WORKERS,
+            "stream": LOAD_TEST_STREAM,
+            "cache": LOAD_TEST_CACHE,
+            "stub_llm": {
+                "latency_ms": stub_llm.STUB_LLM_LATENCY_MS,
+                "jitter": stub_llm.STUB_LLM_JITTER,
+                "tokens": stub_llm.STUB_LLM_TOKENS,
+                "token_interval_ms": stub_llm.STUB_LLM_TOKEN_INTERVAL_MS,
+            },
+        },
+        **summarize(samples, errors, duration),
+    }
+
+    write_report(report, LOAD_TEST_OUTPUT)
+
+    logger.info(
+        "%d requests, %d errors, %.2f req/s",
+        report["requests"],
+        report["errors"],
+        report["rps"],
+    )
+    for stage, stats in report["latency_ms"].items():
+        logger.info(
+            "%-12s p50 %8.1f ms  p95 %8.1f ms  p99 %8.1f ms",
+            stage,
+            stats["p50"],
+            stats["p95"],
+            stats["p99"],
+        )
+
+
+if __name__ == "__main__":
+    main()
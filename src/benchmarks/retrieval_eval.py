@@ -0,0 +1,413 @@
+"""
+Retrieval quality and latency benchmark.
+
+Runs every question of a versioned question set through `get_top_k_chunks`
+against the current Chroma database and reports recall@k, MRR and latency
+percentiles of the retrieval stages as JSON:
+
+    PIPELINE_VERSION=2 HYBRID_SEARCH=0 python -m benchmarks.retrieval_eval
+
+The retriever is configured with the same environment variables as the API
+(CHROMA_DIR, EMBEDDER_BACKEND, HYBRID_SEARCH, RERANK_ENABLED, ...), so one run
+evaluates one configuration. With EVAL_BASELINE pointing at an earlier report,
+the differences are added to the report and the questions whose first relevant
+rank changed are listed.
+
+A question set is a JSONL file with one question per line: 'id', 'question',
+'gold_urls' (sources that answer it) and optionally 'gold_facts' (substrings of
+a fact that answers it). A retrieved chunk is relevant if one of its source URLs
+is one of 'gold_urls' or its text contains one of 'gold_facts'.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any
+
+from benchmarks.common import load_report, summarize_latencies, write_report
+from data_ingest.modules.embedder import EMBEDDER_BACKEND
+from pipeline.common import CURRENT_VERSION, get_config
+from rag_api.modules import retrieval
+from utils.paths import find_repo_root, get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVAL_QUESTIONS = os.environ.get(
+    "EVAL_QUESTIONS",
+    os.path.join(
+        find_repo_root(), "src", "benchmarks", "data", "retrieval_questions_v1.jsonl"
+    ),
+)
+EVAL_KS = tuple(int(k) for k in os.environ.get("EVAL_KS", "1,3,5,10").split(","))
+EVAL_RUN_NAME = os.environ.get("EVAL_RUN_NAME", f"v{CURRENT_VERSION}")
+EVAL_OUTPUT = os.environ.get(
+    "EVAL_OUTPUT",
+    get_data_dir(
+        "benchmarks",
+        f"retrieval_{EVAL_RUN_NAME}_{datetime.now():%Y%m%dT%H%M%S}.json",
+    ),
+)
+# report of an earlier run to compare against, empty to skip the comparison
+EVAL_BASELINE = os.environ.get("EVAL_BASELINE", "")
+
+
+def load_questions(path: str) -> list[dict[str, Any]]:
+    """
+    Reads a question set.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSONL file.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        The questions with 'id', 'question', 'gold_urls' and 'gold_facts'.
+
+    Raises
+    ------
+    ValueError
+        If a question has no gold URLs and no gold facts, or an ID repeats.
+    """
+    questions = []
+    seen_ids = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            question = json.loads(line)
+            question.setdefault("gold_urls", [])
+            question.setdefault("gold_facts", [])
+            if not question["gold_urls"] and not question["gold_facts"]:
+                raise ValueError(f"Question '{question['id']}' has no gold answer.")
+            if question["id"] in seen_ids:
+                raise ValueError(f"Question ID '{question['id']}' is not unique.")
+            seen_ids.add(question["id"])
+            questions.append(question)
+    return questions
+
+
+def fingerprint_file(path: str) -> str:
+    """
+    Returns a short hash of a file, identifying the exact question set used.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    str
+        The first 12 hex digits of the SHA-256 of the file.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL for comparison.
+
+    Parameters
+    ----------
+    url : str
+        The URL.
+
+    Returns
+    -------
+    str
+        The URL without the fragment and the trailing slash.
+    """
+    return url.split("#", 1)[0].rstrip("/")
+
+
+def first_relevant_rank(
+    chunks: list[dict[str, Any]], gold_urls: list[str], gold_facts: list[str]
+) -> int | None:
+    """
+    Finds the rank of the first retrieved chunk that answers the question.
+
+    Parameters
+    ----------
+    chunks : list[dict[str, Any]]
+        The retrieved chunks, best first.
+    gold_urls : list[str]
+        Source URLs that answer the question.
+    gold_facts : list[str]
+        Fact substrings that answer the question.
+
+    Returns
+    -------
+    int | None
+        The 1-based rank, or None if no chunk is relevant.
+    """
+    urls = {normalize_url(url) for url in gold_urls}
+    facts = [fact.casefold() for fact in gold_facts]
+
+    for rank, chunk in enumerate(chunks, start=1):
+        # facts merged at ingest time list the URLs of their duplicates too
+        sources = chunk.get("sources") or [chunk.get("source_url", "")]
+        if any(normalize_url(url) in urls for url in sources):
+            return rank
+        text = chunk["text_chunk"].casefold()
+        if any(fact in text for fact in facts):
+            return rank
+    return None
+
+
+def get_retriever_config() -> dict[str, Any]:
+    """
+    Describes the pipeline version, index and retriever being evaluated.
+
+    Returns
+    -------
+    dict[str, Any]
+        The settings that influence retrieval, including the collection size
+        and its HNSW metadata.
+    """
+    collection_manager = retrieval.get_collection_manager()
+    collection = collection_manager.get_collection()
+    if retrieval.EMBEDDER_URL:
+        embedder = retrieval.EMBEDDER_URL
+    else:
+        # CachedEmbedder -> EmbeddingBatcher -> Embedder
+        embedder = retrieval.get_embedder().embedder.embedder.model_name
+
+    return {
+        "pipeline_version": CURRENT_VERSION,
+        "chunking_strategy": get_config()["chunking_strategy"],
+        "index_version": collection_manager.version,
+        "documents": collection.count(),
+        "collection_metadata": {
+            key: value
+            for key, value in (collection.metadata or {}).items()
+            if key.startswith("hnsw:")
+        },
+        "embedder": embedder,
+        "embedder_backend": EMBEDDER_BACKEND,
+        "hybrid_search": retrieval.HYBRID_SEARCH,
+        "hybrid_candidates": retrieval.HYBRID_CANDIDATES,
+        "rrf_k": retrieval.RRF_K,
+        "rerank_enabled": retrieval.RERANK_ENABLED,
+        "rerank_model": retrieval.RERANK_MODEL if retrieval.RERANK_ENABLED else None,
+        "rerank_candidates": retrieval.RERANK_CANDIDATES,
+        "rerank_top_n": retrieval.RERANK_TOP_N,
+    }
+
+
+def evaluate(questions: list[dict[str, Any]], ks: tuple[int, ...]) -> dict[str, Any]:
+    """
+    Retrieves chunks for every question and scores them.
+
+    recall@k is the share of questions with a relevant chunk among the first
+    k results; MRR is the mean reciprocal rank of the first relevant chunk
+    (0 if none is retrieved).
+
+    `get_top_k_chunks` returns no chunks only when retrieval fails (it logs
+    the error instead of raising), so an empty result aborts the run rather
+    than being scored as a miss.
+
+    Parameters
+    ----------
+    questions : list[dict[str, Any]]
+        The question set.
+    ks : tuple[int, ...]
+        The cut-offs to report; the largest one is retrieved.
+
+    Returns
+    -------
+    dict[str, Any]
+        'metrics' with 'recall@k' and 'mrr', 'latency_ms' with the percentiles
+        of every retrieval stage and 'questions' with the rank of the first
+        relevant chunk and the retrieved URLs of every question.
+
+    Raises
+    ------
+    RuntimeError
+        If retrieval returns no chunks for the warm-up query or a question.
+    """
+    top_k = max(ks)
+    # the first query loads the models, which should not count as latency
+    if not retrieval.get_top_k_chunks("rozgrzewka", top_k=top_k):
+        raise RuntimeError(
+            "Retrieval returned no chunks for the warm-up query, see the log above."
+        )
+
+    results = []
+    samples = []
+    for question in questions:
+        timings: dict[str, float] = {}
+        started = time.perf_counter()
+        chunks = retrieval.get_top_k_chunks(
+            question["question"], top_k=top_k, timings=timings
+        )
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        if not chunks:
+            raise RuntimeError(
+                f"Retrieval returned no chunks for question '{question['id']}', "
+                "see the log above."
+            )
+        samples.append({stage.removesuffix("_ms"): ms for stage, ms in timings.items()})
+
+        rank = first_relevant_rank(
+            chunks, question["gold_urls"], question["gold_facts"]
+        )
+        results.append(
+            {
+                "id": question["id"],
+                "rank": rank,
+                "retrieved_urls": [chunk.get("source_url") for chunk in chunks],
+            }
+        )
+
+    metrics = {
+        f"recall@{k}": round(
+            sum(r["rank"] is not None and r["rank"] <= k for r in results)
+            / len(results),
+            4,
+        )
+        for k in sorted(ks)
+    }
+    metrics["mrr"] = round(
+        sum(1 / r["rank"] for r in results if r["rank"] is not None) / len(results),
+        4,
+    )
+
+    return {
+        "metrics": metrics,
+        "latency_ms": summarize_latencies(samples),
+        "questions": results,
+    }
+
+
+def compare_reports(
+    baseline: dict[str, Any], current: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Computes the differences between two reports.
+
+    Parameters
+    ----------
+    baseline : dict[str, Any]
+        The earlier report.
+    current : dict[str, Any]
+        The new report.
+
+    Returns
+    -------
+    dict[str, Any]
+        The baseline name, the metric and p50/p95 latency deltas (current minus
+        baseline), the settings that differ, and the IDs of questions whose
+        first relevant rank improved or regressed.
+    """
+    metrics = {
+        name: round(value - baseline["metrics"][name], 4)
+        for name, value in current["metrics"].items()
+        if name in baseline["metrics"]
+    }
+    latency = {
+        stage: {
+            p: round(stats[p] - baseline["latency_ms"][stage][p], 2)
+            for p in ("p50", "p95")
+        }
+        for stage, stats in current["latency_ms"].items()
+        if stage in baseline["latency_ms"]
+    }
+    config = {
+        key: {"baseline": baseline["config"].get(key), "current": value}
+        for key, value in current["config"].items()
+        if baseline["config"].get(key) != value
+    }
+
+    baseline_ranks = {q["id"]: q["rank"] for q in baseline["questions"]}
+    improved, regressed = [], []
+    for question in current["questions"]:
+        if question["id"] not in baseline_ranks:
+            continue
+        before = baseline_ranks[question["id"]] or float("inf")
+        after = question["rank"] or float("inf")
+        if after < before:
+            improved.append(question["id"])
+        elif after > before:
+            regressed.append(question["id"])
+
+    return {
+        "baseline": baseline["run"],
+        "metrics": metrics,
+        "latency_ms": latency,
+        "config": config,
+        "improved": improved,
+        "regressed": regressed,
+    }
+
+
+def main() -> None:
+    """
+    Evaluates the configured retriever and writes the report to EVAL_OUTPUT.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    questions = load_questions(EVAL_QUESTIONS)
+    logger.info(
+        "Evaluating run '%s' on %d questions from %s",
+        EVAL_RUN_NAME,
+        len(questions),
+        EVAL_QUESTIONS,
+    )
+
+    results = evaluate(questions, EVAL_KS)
+    report = {
+        "run": EVAL_RUN_NAME,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "question_set": {
+            "file": os.path.basename(EVAL_QUESTIONS),
+            "sha256": fingerprint_file(EVAL_QUESTIONS),
+            "questions": len(questions),
+        },
+        "config": get_retriever_config(),
+        **results,
+    }
+
+    if EVAL_BASELINE:
+        baseline = load_report(EVAL_BASELINE)
+        if baseline["question_set"]["sha256"] != report["question_set"]["sha256"]:
+            logger.warning("The baseline was evaluated on a different question set.")
+        report["comparison"] = compare_reports(baseline, report)
+
+    write_report(report, EVAL_OUTPUT)
+
+    for name, value in report["metrics"].items():
+        delta = report.get("comparison", {}).get("metrics", {}).get(name)
+        logger.info(
+            "%-10s %.4f%s", name, value, f" ({delta:+.4f})" if delta is not None else ""
+        )
+    for stage, stats in report["latency_ms"].items():
+        logger.info(
+            "%-10s p50 %7.1f ms  p95 %7.1f ms  p99 %7.1f ms",
+            stage,
+            stats["p50"],
+            stats["p95"],
+            stats["p99"],
+        )
+    if "comparison" in report:
+        logger.info(
+            "Improved: %s; regressed: %s",
+            report["comparison"]["improved"] or "none",
+            report["comparison"]["regressed"] or "none",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+OpenAI-compatible stub LLM for offline benchmarks.
+
+Answers `POST /v1/chat/completions` with a fixed Polish text after a
+configurable delay, with or without streaming, so the API can be load-tested
+without calling OpenRouter:
+
+    STUB_LLM_LATENCY_MS=800 uvicorn benchmarks.stub_llm:app --port 8100
+
+and point the API at it with OPENROUTER_BASE_URL=http://127.0.0.1:8100/v1.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+# time to the first token
+STUB_LLM_LATENCY_MS = float(os.environ.get("STUB_LLM_LATENCY_MS", 500.0))
+# relative random variation of every delay, e.g. 0.2 for +-20%
+STUB_LLM_JITTER = float(os.environ.get("STUB_LLM_JITTER", 0.1))
+STUB_LLM_TOKENS = int(os.environ.get("STUB_LLM_TOKENS", 50))
+STUB_LLM_TOKEN_INTERVAL_MS = float(os.environ.get("STUB_LLM_TOKEN_INTERVAL_MS", 20.0))
+
+ANSWER_WORDS = (
+    "Zgodnie z informacjami z kontekstu dziekanat Wydziału MiNI jest czynny "
+    "w poniedziałki, wtorki, czwartki i piątki w godzinach 11:00-14:00 [S1]."
+).split()
+
+app = FastAPI()
+
+
+def jittered(delay_ms: float) -> float:
+    """
+    Applies the configured random variation to a delay.
+
+    Parameters
+    ----------
+    delay_ms : float
+        The nominal delay in milliseconds.
+
+    Returns
+    -------
+    float
+        The delay in seconds.
+    """
+    factor = 1 + random.uniform(-STUB_LLM_JITTER, STUB_LLM_JITTER)
+    return max(delay_ms * factor, 0.0) / 1000
+
+
+def answer_tokens() -> list[str]:
+    """
+    Returns the pieces of the stub answer, one per simulated token.
+
+    Returns
+    -------
+    list[str]
+        STUB_LLM_TOKENS words (with leading spaces), repeating the template.
+    """
+    return [
+        (" " if i else "") + ANSWER_WORDS[i % len(ANSWER_WORDS)]
+        for i in range(STUB_LLM_TOKENS)
+    ]
+
+
+def completion_chunk(
+    completion_id: str, model: str, delta: dict[str, str], finish_reason: str | None
+) -> str:
+    """
+    Formats one streamed 'chat.completion.chunk' server-sent event.
+
+    Parameters
+    ----------
+    completion_id : str
+        The ID shared by all chunks of the completion.
+    model : str
+        The requested model name.
+    delta : dict[str, str]
+        The incremental message content.
+    finish_reason : str | None
+        'stop' for the last chunk, None otherwise.
+
+    Returns
+    -------
+    str
+        The event encoded in the text/event-stream format.
+    """
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/chat/completions", response_model=None)
+async def chat_completions_endpoint(
+    request: dict[str, Any],
+) -> dict[str, Any] | StreamingResponse:
+    """
+    Simulates a chat completion.
+
+    Parameters
+    ----------
+    request : dict[str, Any]
+        The OpenAI chat completion request; 'model', 'messages', 'stream' and
+        'stream_options' are used.
+
+    Returns
+    -------
+    dict[str, Any] | StreamingResponse
+        A 'chat.completion' object, or a text/event-stream of chunks if
+        'stream' is set.
+    """
+    model = request.get("model", "stub")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    tokens = answer_tokens()
+    prompt_tokens = sum(
+        len(str(message.get("content", ""))) // 4
+        for message in request.get("messages", [])
+    )
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens),
+    }
+
+    if request.get("stream"):
+
+        async def event_stream() -> AsyncIterator[str]:
+            await asyncio.sleep(jittered(STUB_LLM_LATENCY_MS))
+            yield completion_chunk(
+                completion_id, model, {"role": "assistant", "content": ""}, None
+            )
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(jittered(STUB_LLM_TOKEN_INTERVAL_MS))
+                yield completion_chunk(completion_id, model, {"content": token}, None)
+            yield completion_chunk(completion_id, model, {}, "stop")
+            if request.get("stream_options", {}).get("include_usage"):
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(
+        jittered(STUB_LLM_LATENCY_MS)
+        + jittered(STUB_LLM_TOKEN_INTERVAL_MS) * max(len(tokens) - 1, 0)
+    )
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": usage,
+    }
+
+
+@app.get("/healthz")
+def healthz_endpoint() -> dict[str, str]:
+    """
+    Liveness probe used by the load test before sending traffic.
+
+    Returns
+    -------
+    dict[str, str]
+        {'status': 'ok'}.
+    """
+    return {"status": "ok"}
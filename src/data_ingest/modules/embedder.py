@@ -1,12 +1,105 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import logging
+import os
+import platform
+import re
+import unicodedata
+from typing import Any
+
+import numpy as np
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+EMBEDDER_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "torch")
+# dynamically int8-quantized export shipped in the model repository, empty to
+# pick the one matching the CPU
+ONNX_INT8_FILE = os.getenv("EMBEDDER_ONNX_INT8_FILE", "")
+
+
+def get_onnx_int8_file() -> str:
+    """
+    Returns the int8-quantized ONNX export to load.
+
+    The model repository ships one export per instruction set; unless
+    EMBEDDER_ONNX_INT8_FILE is set, the one matching the CPU of this host is used.
+
+    Returns
+    -------
+    str
+        Path of the ONNX file within the model repository.
+    """
+    if ONNX_INT8_FILE:
+        return ONNX_INT8_FILE
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+
+    flags: set[str] = set()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        pass
+
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags:
+        return "onnx/model_qint8_avx512.onnx"
+    if flags and "avx2" not in flags:
+        logger.warning("The CPU lacks AVX2, the int8 ONNX model may run slowly.")
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def get_backend_model_kwargs(backend: str) -> dict[str, Any]:
+    """
+    Returns the SentenceTransformer keyword arguments selecting an inference backend.
+
+    Parameters
+    ----------
+    backend : str
+        One of 'torch' (full precision PyTorch), 'onnx' (ONNX Runtime) or
+        'onnx-int8' (ONNX Runtime with a dynamically int8-quantized model).
+
+    Returns
+    -------
+    dict[str, Any]
+        Keyword arguments passed to the SentenceTransformer constructor.
+
+    Raises
+    ------
+    ValueError
+        If the backend is not supported.
+    """
+    if backend == "torch":
+        return {}
+    if backend == "onnx":
+        return {"backend": "onnx"}
+    if backend == "onnx-int8":
+        return {"backend": "onnx", "model_kwargs": {"file_name": get_onnx_int8_file()}}
+
+    raise ValueError(
+        f"Unknown embedder backend '{backend}', expected one of {EMBEDDER_BACKENDS}."
+    )
 
 
 class Embedder:
     """
     A wrapper class for generating embeddings using HuggingFace models.
+
+    The inference backend is pluggable (see `get_backend_model_kwargs`); all
+    backends expose the same API and produce vectors in the same space, so an
+    index built with one backend can be queried with another.
     """
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = EMBEDDER_BACKEND,
+    ):
         """
         Initializes the Embedder with a specific HuggingFace model.
 
@@ -15,9 +108,19 @@ class Embedder:
         model_name : str, optional
             The name or path of the HuggingFace model to use,
             by default "sentence-transformers/all-MiniLM-L6-v2".
+        backend : str, optional
+            The inference backend ('torch', 'onnx' or 'onnx-int8'),
+            by default the EMBEDDER_BACKEND environment variable or 'torch'.
         """
         self.model_name = model_name
-        self.embedder = HuggingFaceEmbeddings(model_name=model_name)
+        self.backend = backend
+        # imported here because it pulls in torch, which takes seconds
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        logger.info("Loading embedder %s with %s backend.", model_name, backend)
+        self.embedder = HuggingFaceEmbeddings(
+            model_name=model_name, model_kwargs=get_backend_model_kwargs(backend)
+        )
 
     def generate_embedding(self, text: str) -> list[float]:
         """
@@ -50,3 +153,206 @@ class Embedder:
             A list of vectors, where each vector corresponds to a text in the input list.
         """
         return self.embedder.embed_documents(texts)
+
+
+def compare_backends(
+    texts: list[str],
+    backend: str,
+    reference_backend: str = "torch",
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> dict[str, float]:
+    """
+    Measures the cosine drift of a backend against a reference backend.
+
+    Parameters
+    ----------
+    texts : list[str]
+        Sample texts embedded by both backends.
+    backend : str
+        The backend under test.
+    reference_backend : str, optional
+        The backend treated as ground truth, by default "torch".
+    model_name : str, optional
+        The model used by both backends,
+        by default "sentence-transformers/all-MiniLM-L6-v2".
+
+    Returns
+    -------
+    dict[str, float]
+        Mean and minimum cosine similarity between paired vectors, and the
+        maximum drift (1 - similarity).
+    """
+    reference = np.asarray(
+        Embedder(model_name, reference_backend).generate_embeddings(texts)
+    )
+    candidate = np.asarray(Embedder(model_name, backend).generate_embeddings(texts))
+
+    similarities = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+
+    return {
+        "mean_cosine": float(similarities.mean()),
+        "min_cosine": float(similarities.min()),
+        "max_drift": float(1 - similarities.min()),
+    }
+
+
+def main() -> None:
+    """
+    Prints the cosine drift of every non-reference backend against PyTorch.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    texts = [
+        "Godziny otwarcia dziekanatu",
+        "Kto jest dziekanem Wydziału MiNI?",
+        "Dziekanem Wydziału MiNI jest prof. dr hab. Grzegorz Świątek.",
+        "Kierunek Inżynieria i Analiza Danych jest prowadzony na studiach I stopnia.",
+        "Data Science is a master's programme taught in English.",
+        "Sala 301 znajduje się w gmachu MiNI przy ul. Koszykowej 75.",
+    ]
+
+    for backend in EMBEDDER_BACKENDS:
+        if backend == "torch":
+            continue
+        report = compare_backends(texts, backend)
+        logger.info(
+            "%s vs torch: mean cosine %.5f, min cosine %.5f, max drift %.5f",
+            backend,
+            report["mean_cosine"],
+            report["min_cosine"],
+            report["max_drift"],
+        )
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a query so that trivially different spellings share one cache key.
+
+    Applies Unicode NFC (so composed and decomposed Polish diacritics compare
+    equal), case folding and whitespace collapsing.
+
+    Parameters
+    ----------
+    text : str
+        The raw query.
+
+    Returns
+    -------
+    str
+        The normalized query.
+    """
+    text = unicodedata.normalize("NFC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedder with an LRU + TTL cache keyed on the normalized query.
+
+    The normalized form only serves as the cache key; the caller's text is
+    what gets embedded, so cased models see the original input.
+
+    Exposes the same `generate_embedding` / `generate_embeddings` API as
+    `Embedder`, so it can be used as a drop-in replacement.
+    """
+
+    def __init__(self, embedder: Any, max_size: int = 1024, ttl: float = 3600.0):
+        """
+        Initializes the cache in front of the given embedder.
+
+        Parameters
+        ----------
+        embedder : Any
+            Any object exposing `generate_embedding` and `generate_embeddings`.
+        max_size : int, optional
+            Maximum number of cached embeddings, by default 1024.
+        ttl : float, optional
+            Time to live of a cached embedding in seconds, by default 3600.0.
+        """
+        self.embedder = embedder
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def generate_embedding(self, text: str) -> list[float]:
+        """
+        Returns the cached embedding of a text or computes and caches it.
+
+        Parameters
+        ----------
+        text : str
+            The input text string to be embedded.
+
+        Returns
+        -------
+        list[float]
+            A list of floats representing the vector embedding.
+        """
+        key = normalize_query(text)
+        embedding = self.cache.get(key)
+        if embedding is None:
+            embedding = self.embedder.generate_embedding(text)
+            self.cache.set(key, embedding)
+        return embedding
+
+    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Returns embeddings for a list of texts, computing only the uncached ones.
+
+        Parameters
+        ----------
+        texts : list[str]
+            A list of text strings to be embedded.
+
+        Returns
+        -------
+        list[list[float]]
+            A list of vectors, where each vector corresponds to a text in the input list.
+        """
+        keys = [normalize_query(text) for text in texts]
+        embeddings = [self.cache.get(key) for key in keys]
+
+        # the first text of every uncached key is embedded
+        missing: dict[str, str] = {}
+        for key, text, emb in zip(keys, texts, embeddings, strict=True):
+            if emb is None:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(
+                zip(
+                    missing,
+                    self.embedder.generate_embeddings(list(missing.values())),
+                    strict=True,
+                )
+            )
+            for key, embedding in computed.items():
+                self.cache.set(key, embedding)
+            embeddings = [
+                emb if emb is not None else computed[key]
+                for key, emb in zip(keys, embeddings, strict=True)
+            ]
+
+        return embeddings
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit/miss counters of the cache.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary with 'size', 'hits', 'misses' and 'hit_rate'.
+        """
+        return self.cache.stats()
+
+
+if __name__ == "__main__":
+    main()
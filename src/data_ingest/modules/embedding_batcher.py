@@ -0,0 +1,193 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Groups concurrent embedding requests into batched forward passes.
+
+    Callers from many threads submit single texts; worker threads collect the
+    texts that arrive within `max_wait_ms` (or until `max_batch_size` is reached),
+    embed them with a single `generate_embeddings` call and hand the vectors back
+    to the waiting callers. Exposes the same API as `Embedder`.
+    """
+
+    def __init__(
+        self,
+        embedder: Any,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        num_workers: int = 1,
+    ):
+        """
+        Initializes the batcher and starts its worker threads.
+
+        Parameters
+        ----------
+        embedder : Any
+            Any object exposing `generate_embeddings`.
+        max_batch_size : int, optional
+            Maximum number of texts embedded in one forward pass, by default 32.
+        max_wait_ms : float, optional
+            How long a batch waits for more texts after the first one arrives,
+            by default 2.0.
+        num_workers : int, optional
+            Number of threads running forward passes in parallel, by default 1.
+        """
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.num_workers = num_workers
+
+        self._queue: queue.Queue[tuple[str, Future] | None] = queue.Queue()
+        self._workers = [
+            threading.Thread(
+                target=self._run, name=f"embedding-batcher-{i}", daemon=True
+            )
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def generate_embedding(self, text: str) -> list[float]:
+        """
+        Embeds a single text as part of the next batch.
+
+        Parameters
+        ----------
+        text : str
+            The input text string to be embedded.
+
+        Returns
+        -------
+        list[float]
+            A list of floats representing the vector embedding.
+        """
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts.
+
+        Lists that already fill a batch are embedded directly; smaller ones are
+        merged with concurrent requests.
+
+        Parameters
+        ----------
+        texts : list[str]
+            A list of text strings to be embedded.
+
+        Returns
+        -------
+        list[list[float]]
+            A list of vectors, where each vector corresponds to a text in the input list.
+        """
+        if len(texts) >= self.max_batch_size:
+            return self.embedder.generate_embeddings(texts)
+
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """
+        Stops the worker threads after the queued requests are processed.
+        """
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _collect_batch(self, first: tuple[str, Future]) -> list[tuple[str, Future]]:
+        """
+        Collects requests that arrive shortly after the first one.
+
+        Parameters
+        ----------
+        first : tuple[str, Future]
+            The request that opened the batch.
+
+        Returns
+        -------
+        list[tuple[str, Future]]
+            Up to `max_batch_size` requests.
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+
+            if item is None:
+                # keep the shutdown signal for this worker's next loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self) -> None:
+        """
+        Worker loop: collects batches and resolves their futures.
+
+        A failure anywhere in the handling of a batch is passed to its futures,
+        so no caller waits forever and the worker keeps serving later batches.
+        """
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            try:
+                batch = self._collect_batch(first)
+                self._embed_batch(batch)
+            except Exception as e:
+                logger.error("Batched embedding of %d texts failed: %s", len(batch), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _embed_batch(self, batch: list[tuple[str, Future]]) -> None:
+        """
+        Embeds a batch with one call and resolves the futures of its requests.
+
+        Parameters
+        ----------
+        batch : list[tuple[str, Future]]
+            The requests of the batch.
+
+        Raises
+        ------
+        ValueError
+            If the embedder returned a different number of embeddings.
+        """
+        texts = [text for text, _ in batch]
+        embeddings = self.embedder.generate_embeddings(texts)
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings for a batch of {len(texts)} texts"
+            )
+
+        logger.debug("Embedded a batch of %d texts.", len(texts))
+        for (_, future), embedding in zip(batch, embeddings, strict=True):
+            future.set_result(embedding)
@@ -0,0 +1,373 @@
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_FILE = "bm25_index.json"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits a text into lowercase word tokens for lexical search.
+
+    No stemming is applied, so proper nouns, course codes and room numbers
+    are matched exactly (e.g. 'MAT1234' and '301' stay single tokens).
+
+    Parameters
+    ----------
+    text : str
+        The text to tokenize.
+
+    Returns
+    -------
+    list[str]
+        The tokens in order of appearance.
+    """
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def get_fact_sources(metadata: dict[str, Any]) -> list[str]:
+    """
+    Returns every source URL of a stored fact.
+
+    A fact that absorbed near-duplicates at ingest time lists all their
+    sources in the 'sources' metadata field, one per line; other facts only
+    have their 'url'.
+
+    Parameters
+    ----------
+    metadata : dict[str, Any]
+        The Chroma metadata of the fact.
+
+    Returns
+    -------
+    list[str]
+        The source URLs, the fact's own URL first.
+    """
+    sources = metadata.get("sources")
+    if sources:
+        return sources.split("\n")
+    return [metadata.get("url", "Unknown Source")]
+
+
+def get_lexical_index_path(path_to_database: str) -> str:
+    """
+    Returns the path of the BM25 index stored next to the Chroma database.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    str
+        Path of the index file.
+    """
+    return os.path.join(path_to_database, LEXICAL_INDEX_FILE)
+
+
+class BM25Index:
+    """
+    In-memory inverted index over facts with Okapi BM25 scoring.
+
+    The postings of every token hold the indices of the documents it occurs in
+    together with their precomputed BM25 term weights, so a query only sums a
+    few arrays and selects the best documents.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        documents: list[str],
+        urls: list[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+        sources: list[list[str]] | None = None,
+    ):
+        """
+        Builds the index from a list of documents.
+
+        Parameters
+        ----------
+        ids : list[str]
+            Document IDs, the same as in the Chroma collection.
+        documents : list[str]
+            Document texts.
+        urls : list[str]
+            Source URLs of the documents.
+        k1 : float, optional
+            BM25 term frequency saturation, by default 1.5.
+        b : float, optional
+            BM25 document length normalization, by default 0.75.
+        sources : list[list[str]] | None, optional
+            All source URLs of every document, by default only its URL.
+        """
+        self.ids = ids
+        self.documents = documents
+        self.urls = urls
+        self.sources = sources if sources is not None else [[url] for url in urls]
+        self.k1 = k1
+        self.b = b
+
+        term_counts = [Counter(tokenize(doc)) for doc in documents]
+        doc_lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if len(documents) else 0.0
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for doc_index, counts in enumerate(term_counts):
+            for token, tf in counts.items():
+                doc_indices, tfs = postings.setdefault(token, ([], []))
+                doc_indices.append(doc_index)
+                tfs.append(tf)
+
+        num_docs = len(documents)
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for token, (doc_indices, tfs) in postings.items():
+            doc_indices = np.array(doc_indices, dtype=np.int32)
+            tfs = np.array(tfs, dtype=np.float32)
+            idf = np.log(
+                1 + (num_docs - len(doc_indices) + 0.5) / (len(doc_indices) + 0.5)
+            )
+            norm = k1 * (1 - b + b * doc_lengths[doc_indices] / avg_length)
+            weights = idf * tfs * (k1 + 1) / (tfs + norm)
+            self._postings[token] = (doc_indices, weights.astype(np.float32))
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed documents.
+
+        Returns
+        -------
+        int
+            The number of documents.
+        """
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int = 5) -> list[dict[str, Any]]:
+        """
+        Returns the documents with the highest BM25 score for a query.
+
+        Parameters
+        ----------
+        query : str
+            The user's search query.
+        top_k : int, optional
+            The number of results, by default 5.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Results ordered by score, each with 'id', 'text_chunk',
+            'source_url', 'sources' and 'score'. Documents sharing no token with the
+            query are never returned.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if posting is not None:
+                doc_indices, weights = posting
+                scores[doc_indices] += weights
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        return [
+            {
+                "id": self.ids[i],
+                "text_chunk": self.documents[i],
+                "source_url": self.urls[i],
+                "sources": self.sources[i],
+                "score": float(scores[i]),
+            }
+            for i in matched
+        ]
+
+    def save(self, path: str) -> None:
+        """
+        Writes the indexed documents to disk atomically.
+
+        Only the documents and BM25 parameters are stored; the postings are
+        rebuilt on load, which keeps the file small and format-independent.
+
+        Parameters
+        ----------
+        path : str
+            Path of the index file.
+
+        Returns
+        -------
+        None
+        """
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "documents": self.documents,
+            "urls": self.urls,
+            "sources": self.sources,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index | None":
+        """
+        Loads an index written by `save`.
+
+        Parameters
+        ----------
+        path : str
+            Path of the index file.
+
+        Returns
+        -------
+        BM25Index | None
+            The index, or None if the file does not exist.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        return cls(
+            data["ids"],
+            data["documents"],
+            data["urls"],
+            data["k1"],
+            data["b"],
+            # indexes written before sources were stored only have the URLs
+            sources=data.get("sources"),
+        )
+
+    @classmethod
+    def from_collection(
+        cls, collection: "Collection", batch_size: int = 5000
+    ) -> "BM25Index":
+        """
+        Builds an index over every document of a Chroma collection.
+
+        Parameters
+        ----------
+        collection : chromadb.api.models.Collection.Collection
+            The collection to index.
+        batch_size : int, optional
+            Number of documents fetched per request, by default 5000.
+
+        Returns
+        -------
+        BM25Index
+            The index over the collection.
+        """
+        ids, documents, urls, sources = [], [], [], []
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            urls.extend(meta.get("url", "Unknown Source") for meta in page["metadatas"])
+            sources.extend(get_fact_sources(meta) for meta in page["metadatas"])
+            offset += len(page["ids"])
+
+        return cls(ids, documents, urls, sources=sources)
+
+
+def build_lexical_index(collection: "Collection", path_to_database: str) -> int:
+    """
+    Builds the BM25 index of a collection and stores it next to the database.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The collection to index.
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    int
+        The number of indexed documents.
+    """
+    index = BM25Index.from_collection(collection)
+    index.save(get_lexical_index_path(path_to_database))
+    return len(index)
+
+
+class LexicalIndexManager:
+    """
+    Process-wide holder of the BM25 index of a database.
+
+    The index is loaded lazily and reloaded whenever the caller reports a
+    different index version, so it stays in sync with the Chroma collection
+    opened by CollectionManager.
+    """
+
+    def __init__(self, path_to_database: str):
+        """
+        Initializes the manager without loading the index.
+
+        Parameters
+        ----------
+        path_to_database : str
+            The local file path to the persistent Chroma database.
+        """
+        self.path_to_database = path_to_database
+
+        self._lock = threading.Lock()
+        self._index: BM25Index | None = None
+        self._version: str | None = None
+        self._loaded = False
+
+    def get_index(self, version: str | None) -> BM25Index | None:
+        """
+        Returns the index matching the given index version.
+
+        Parameters
+        ----------
+        version : str | None
+            The index version of the collection currently in use.
+
+        Returns
+        -------
+        BM25Index | None
+            The index, or None if none was built for the database.
+        """
+        if self._loaded and version == self._version:
+            return self._index
+
+        with self._lock:
+            if not self._loaded or version != self._version:
+                path = get_lexical_index_path(self.path_to_database)
+                logger.info(
+                    "Loading BM25 index from %s (index version: %s)", path, version
+                )
+                self._index = BM25Index.load(path)
+                self._version = version
+                self._loaded = True
+
+                if self._index is None:
+                    logger.warning("No BM25 index found at %s", path)
+
+            return self._index
@@ -0,0 +1,95 @@
+import logging
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteEmbedder:
+    """
+    Client of the embedding service (see `rag_api.embedding_service`).
+
+    Lets many API worker processes share one loaded model: texts are sent to
+    the service over a Unix socket or HTTP and the vectors come back. Exposes
+    the same `generate_embedding` / `generate_embeddings` API as `Embedder`.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        """
+        Initializes the client; no request is made until the first embedding.
+
+        Parameters
+        ----------
+        url : str
+            Address of the service: 'unix:///path/to/socket' or 'http://host:port'.
+        timeout : float, optional
+            Timeout of a single request in seconds, by default 10.0.
+        """
+        self.url = url
+
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            transport = httpx.HTTPTransport(uds=parsed.path, retries=2)
+            base_url = "http://embedder"
+        else:
+            transport = httpx.HTTPTransport(retries=2)
+            base_url = url.rstrip("/")
+
+        self._client = httpx.Client(
+            base_url=base_url, transport=transport, timeout=timeout
+        )
+
+    def generate_embedding(self, text: str) -> list[float]:
+        """
+        Generates a vector embedding for a single text chunk.
+
+        Parameters
+        ----------
+        text : str
+            The input text string to be embedded.
+
+        Returns
+        -------
+        list[float]
+            A list of floats representing the vector embedding.
+        """
+        return self.generate_embeddings([text])[0]
+
+    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generates vector embeddings for a list of text chunks.
+
+        Parameters
+        ----------
+        texts : list[str]
+            A list of text strings to be embedded.
+
+        Returns
+        -------
+        list[list[float]]
+            A list of vectors, where each vector corresponds to a text in the input list.
+
+        Raises
+        ------
+        httpx.HTTPError
+            If the service is unreachable or returns an error.
+        """
+        response = self._client.post("/embed", json={"texts": texts})
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def is_ready(self) -> bool:
+        """
+        Tells whether the service has loaded its model.
+
+        Returns
+        -------
+        bool
+            True if the service answered its readiness probe.
+        """
+        try:
+            return self._client.get("/readyz").status_code == 200
+        except httpx.HTTPError as e:
+            logger.debug("Embedding service at %s is not reachable: %s", self.url, e)
+            return False
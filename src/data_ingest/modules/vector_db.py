@@ -1,18 +1,163 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
 from datetime import datetime
 
 import chromadb
+from chromadb.api import ClientAPI
+from chromadb.api.client import SharedSystemClient
 from chromadb.api.models.Collection import Collection
 
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "mini_docs"
+INDEX_VERSION_FILE = "index_version"
+
+
+def get_chroma_client(path_to_database: str) -> ClientAPI:
+    """
+    Creates a Chroma client for the given database path.
+
+    Readers and writers must use the same settings, otherwise Chroma refuses
+    to open a second client for the same path within one process.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    chromadb.api.ClientAPI
+        The Chroma client.
+    """
+    # for use chroma locally, once we got docker set switch PersistentClient() -> HttpClient()
+    settings = chromadb.config.Settings(anonymized_telemetry=False)
+    return chromadb.PersistentClient(path=path_to_database, settings=settings)
+
+
+def make_fact_id(text_chunk: str, source_url: str) -> str:
+    """
+    Derives a deterministic document ID from the source URL and the text.
+
+    The same fact from the same source always gets the same ID, so re-ingesting
+    it overwrites the existing record instead of adding a duplicate.
+
+    Parameters
+    ----------
+    text_chunk : str
+        The document text.
+    source_url : str
+        The source URL of the document.
+
+    Returns
+    -------
+    str
+        A hex digest identifying the document.
+    """
+    return hashlib.sha256(f"{source_url}\n{text_chunk}".encode()).hexdigest()
+
+
+def get_or_create_collection(path_to_database: str) -> Collection:
+    """
+    Opens the 'mini_docs' collection for writing, creating it if needed.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    chromadb.api.models.Collection.Collection
+        The ChromaDB collection object named 'mini_docs'.
+    """
+    chroma_client = get_chroma_client(path_to_database)
+
+    return chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata={
+            "description": "Database with docs scrapped from mini website",
+            "created": str(datetime.now()),
+            "hnsw:space": "cosine",
+        },
+    )
+
+
+def get_existing_ids(collection: Collection, ids: list[str]) -> set[str]:
+    """
+    Returns which of the given IDs are already stored in the collection.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The collection to check.
+    ids : list[str]
+        Candidate document IDs.
+
+    Returns
+    -------
+    set[str]
+        The subset of IDs present in the collection.
+    """
+    if not ids:
+        return set()
+    return set(collection.get(ids=ids, include=[])["ids"])
+
+
+def delete_stale_documents(
+    collection: Collection, keep_ids: set[str], batch_size: int = 5000
+) -> int:
+    """
+    Deletes every document whose ID is not in `keep_ids`.
+
+    Used after a full ingest run to remove facts that their source no longer produces.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The collection to clean up.
+    keep_ids : set[str]
+        IDs produced by the current run.
+    batch_size : int, optional
+        Number of IDs fetched and deleted per request, by default 5000.
+
+    Returns
+    -------
+    int
+        The number of deleted documents.
+    """
+    stale_ids = []
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=batch_size, offset=offset)["ids"]
+        if not page:
+            break
+        stale_ids.extend(doc_id for doc_id in page if doc_id not in keep_ids)
+        offset += len(page)
+
+    for i in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[i : i + batch_size])
+
+    return len(stale_ids)
+
 
 def save_to_vector_db(
     text_chunk: str | list[str],
     embedding: list[float] | list[list[float]],
     source_url: str | list[str],
     path_to_database: str,
+    upsert: bool = True,
+    sources: list[list[str]] | None = None,
 ) -> None:
     """
     Saves text chunks, embeddings, and URLs to the vector database.
 
+    Document IDs are derived from the source URL and text (see `make_fact_id`).
+
     Parameters
     ----------
     text_chunk : str | list[str]
@@ -23,6 +168,12 @@ def save_to_vector_db(
         The source URLs for the documents. Can be a single URL string or a list of strings.
     path_to_database : str
         The local file path to the persistent Chroma database.
+    upsert : bool, optional
+        If True, existing documents with the same ID are overwritten; if False,
+        Chroma's add semantics are used. By default True.
+    sources : list[list[str]] | None, optional
+        All source URLs of every document (e.g. merged from duplicates), stored
+        one per line in the 'sources' metadata field. By default None.
 
     Returns
     -------
@@ -37,19 +188,13 @@ def save_to_vector_db(
     if not isinstance(source_url, list):
         source_url = [source_url]
 
-    settings = chromadb.config.Settings(anonymized_telemetry=False)
-    chroma_client = chromadb.PersistentClient(path=path_to_database, settings=settings)
+    metadatas = [{"url": url} for url in source_url]
+    if sources is not None:
+        for metadata, urls in zip(metadatas, sources, strict=True):
+            metadata["sources"] = "\n".join(urls)
 
-    collection = chroma_client.get_or_create_collection(
-        name="mini_docs",
-        metadata={
-            "description": "Database with docs scrapped from mini website",
-            "created": str(datetime.now()),
-            "hnsw:space": "cosine",
-        },
-    )
-
-    number_of_docs = collection.count()
+    collection = get_or_create_collection(path_to_database)
+    write = collection.upsert if upsert else collection.add
 
     batch_size = 5000
     total_docs = len(text_chunk)
@@ -58,12 +203,16 @@ def save_to_vector_db(
         batch_texts = text_chunk[i : i + batch_size]
         batch_embeddings = embedding[i : i + batch_size]
         batch_urls = source_url[i : i + batch_size]
+        batch_metadatas = metadatas[i : i + batch_size]
 
-        collection.add(
+        write(
             documents=batch_texts,
             embeddings=batch_embeddings,
-            metadatas=[{"url": url} for url in batch_urls],
-            ids=[f"ids_{number_of_docs + i + j + 1}" for j in range(len(batch_texts))],
+            metadatas=batch_metadatas,
+            ids=[
+                make_fact_id(text, url)
+                for text, url in zip(batch_texts, batch_urls, strict=True)
+            ],
         )
 
 
@@ -81,9 +230,223 @@ def load_vector_db(path_to_database: str) -> Collection:
     chromadb.api.models.Collection.Collection
         The ChromaDB collection object named 'mini_docs'.
     """
-    # for use chroma locally, once we got docker set switch PersistentClient() -> HttpClient()
-    chroma_client = chromadb.PersistentClient(path=path_to_database)
+    chroma_client = get_chroma_client(path_to_database)
 
-    collection = chroma_client.get_collection(name="mini_docs")
+    collection = chroma_client.get_collection(name=COLLECTION_NAME)
 
     return collection
+
+
+def publish_index_version(path_to_database: str) -> str:
+    """
+    Marks the database as containing a new index version.
+
+    Readers (see CollectionManager) compare this marker with the version
+    they have loaded and reopen the collection when it changes.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    str
+        The newly published version identifier.
+    """
+    version = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    os.makedirs(path_to_database, exist_ok=True)
+    marker_path = os.path.join(path_to_database, INDEX_VERSION_FILE)
+    tmp_path = f"{marker_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    # atomic on POSIX, so readers never see a half-written marker
+    os.replace(tmp_path, marker_path)
+
+    return version
+
+
+def read_index_version(path_to_database: str) -> str | None:
+    """
+    Reads the index version marker published by the ingest pipeline.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    str | None
+        The current version identifier, or None if no version was published yet.
+    """
+    marker_path = os.path.join(path_to_database, INDEX_VERSION_FILE)
+    try:
+        with open(marker_path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class CollectionManager:
+    """
+    Process-wide holder of a long-lived Chroma collection handle.
+
+    The collection is opened once and shared between threads. Every
+    `reload_check_interval` seconds the index version marker is checked and,
+    if the ingest pipeline published a new index, the collection is reopened.
+    The Chroma system of the previous index is stopped `retire_after` seconds
+    later, once readers have moved over to the new collection.
+    """
+
+    def __init__(
+        self,
+        path_to_database: str,
+        reload_check_interval: float = 5.0,
+        retire_after: float = 60.0,
+    ):
+        """
+        Initializes the manager without opening the collection.
+
+        Parameters
+        ----------
+        path_to_database : str
+            The local file path to the persistent Chroma database.
+        reload_check_interval : float, optional
+            Minimum number of seconds between checks of the index version marker,
+            by default 5.0.
+        retire_after : float, optional
+            Seconds after a reload at which the previous Chroma system is
+            stopped, by default 60.0.
+        """
+        self.path_to_database = path_to_database
+        self.reload_check_interval = reload_check_interval
+        self.retire_after = retire_after
+
+        self._lock = threading.Lock()
+        self._client: ClientAPI | None = None
+        self._collection: Collection | None = None
+        self._version: str | None = None
+        self._last_check = 0.0
+
+    @property
+    def version(self) -> str | None:
+        """
+        The index version of the currently loaded collection.
+
+        Returns
+        -------
+        str | None
+            The version identifier, or None if nothing was published or loaded.
+        """
+        return self._version
+
+    def get_collection(self) -> Collection:
+        """
+        Returns the shared collection, reopening it if a new index was published.
+
+        Returns
+        -------
+        chromadb.api.models.Collection.Collection
+            The ChromaDB collection object named 'mini_docs'.
+        """
+        collection = self._collection
+        if (
+            collection is not None
+            and time.monotonic() - self._last_check < self.reload_check_interval
+        ):
+            return collection
+
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._collection is not None
+                and now - self._last_check < self.reload_check_interval
+            ):
+                return self._collection
+
+            version = read_index_version(self.path_to_database)
+            if self._collection is None or version != self._version:
+                self._open(version)
+            self._last_check = now
+
+            return self._collection
+
+    def reload(self) -> Collection:
+        """
+        Forces the collection to be reopened.
+
+        Returns
+        -------
+        chromadb.api.models.Collection.Collection
+            The freshly opened collection.
+        """
+        with self._lock:
+            self._open(read_index_version(self.path_to_database))
+            self._last_check = time.monotonic()
+            return self._collection
+
+    def _open(self, version: str | None) -> None:
+        """
+        Opens the collection from disk. Must be called with the lock held.
+
+        Parameters
+        ----------
+        version : str | None
+            The index version that is being loaded.
+        """
+        retired = None
+        if self._client is not None:
+            # Chroma caches one system per path, which would keep serving the
+            # old segments; evict only this path's system so the new index is
+            # read from disk, and keep it running for in-flight readers.
+            identifier = self._client._identifier
+            with SharedSystemClient._refcount_lock:
+                retired = SharedSystemClient._identifier_to_system.pop(identifier, None)
+                SharedSystemClient._identifier_to_refcount.pop(identifier, None)
+
+        logger.info(
+            "Opening collection '%s' from %s (index version: %s)",
+            COLLECTION_NAME,
+            self.path_to_database,
+            version,
+        )
+        self._client = get_chroma_client(self.path_to_database)
+        self._collection = self._client.get_collection(name=COLLECTION_NAME)
+        self._version = version
+
+        if retired is not None:
+            timer = threading.Timer(self.retire_after, retired.stop)
+            timer.daemon = True
+            timer.start()
+
+
+_managers: dict[str, CollectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_collection_manager(
+    path_to_database: str, reload_check_interval: float = 5.0
+) -> CollectionManager:
+    """
+    Returns the process-wide CollectionManager for the given database path.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+    reload_check_interval : float, optional
+        Passed to the manager when it is created, by default 5.0.
+
+    Returns
+    -------
+    CollectionManager
+        The shared manager for this path.
+    """
+    with _managers_lock:
+        manager = _managers.get(path_to_database)
+        if manager is None:
+            manager = CollectionManager(path_to_database, reload_check_interval)
+            _managers[path_to_database] = manager
+        return manager
@@ -1,14 +1,93 @@
+import json
 import logging
 import os
+from collections.abc import Iterator
+from typing import Any
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from utils import tracing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
 
 API_URL = os.getenv("API_URL", "http://api:8000/chat")
+API_STREAM_URL = os.getenv("API_STREAM_URL", f"{API_URL}/stream")
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 3.05))
+# longest wait for the next piece of the answer, not for the whole answer
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", 90.0))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 10))
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """
+    Returns the HTTP session shared by all users and reruns of the app.
+
+    Its connection pool keeps connections to the API alive, so a message does
+    not pay for a new TCP connection.
+
+    Returns
+    -------
+    requests.Session
+        The session, with up to API_POOL_SIZE pooled connections per host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def iter_events(response: requests.Response) -> Iterator[tuple[str, dict[str, Any]]]:
+    """
+    Parses the server-sent events of a streamed API response as they arrive.
+
+    Parameters
+    ----------
+    response : requests.Response
+        The response of a request sent with `stream=True`.
+
+    Yields
+    ------
+    tuple[str, dict[str, Any]]
+        The event name ('sources', 'delta', 'error' or 'done') and its data.
+    """
+    response.encoding = "utf-8"
+    event, data = "message", []
+    # chunk_size=None hands over every piece as soon as it is received
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line.startswith("event:"):
+            event = line.removeprefix("event:").strip()
+        elif line.startswith("data:"):
+            data.append(line.removeprefix("data:").strip())
+        elif not line and data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+
+def format_sources(sources: list[str]) -> str:
+    """
+    Formats the sources of an answer as a Markdown list.
+
+    Parameters
+    ----------
+    sources : list[str]
+        The source URLs, possibly repeated.
+
+    Returns
+    -------
+    str
+        The list under a 'Źródła' heading, or an empty string.
+    """
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        return ""
+    return "\n\n**Źródła:**\n" + "\n".join([f"- {s}" for s in sources])
 
 
 def main() -> None:
@@ -16,7 +95,8 @@ def main() -> None:
     Runs the Streamlit chat application.
 
     Initializes the session state, renders chat history, and handles
-    user input by querying the backend API.
+    user input by streaming the answer from the backend API: the sources are
+    shown once retrieval finishes and the answer grows token by token.
 
     Parameters
     ----------
@@ -26,6 +106,7 @@ def main() -> None:
     -------
     None
     """
+    tracing.setup_tracing("frontend")
     st.set_page_config(page_title="Chatbot MiNI", page_icon="🎓")
     st.title("Chatbot Wydziału MiNI PW")
 
@@ -42,31 +123,52 @@ def main() -> None:
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Szukam informacji..."):
-                try:
-                    response = requests.post(API_URL, json={"query": prompt})
-                    if response.status_code == 200:
-                        data = response.json()
-                        answer = data.get("answer", "Błąd braku odpowiedzi.")
-                        sources = list(set(data.get("sources", [])))
-
-                        full_response = answer
-                        if sources:
-                            full_response += "\n\n**Źródła:**\n" + "\n".join(
-                                [f"- {s}" for s in sources]
-                            )
-
-                        st.markdown(full_response)
-                        st.session_state.messages.append(
-                            {"role": "assistant", "content": full_response}
-                        )
-                    else:
+            answer_placeholder = st.empty()
+            sources_placeholder = st.empty()
+            answer_placeholder.markdown("_Szukam informacji..._")
+
+            answer, sources = "", ""
+            try:
+                # the API continues this trace through 'traceparent'
+                with (
+                    tracer.start_as_current_span("chat_message"),
+                    get_session().post(
+                        API_STREAM_URL,
+                        json={"query": prompt},
+                        headers=tracing.inject_context(),
+                        stream=True,
+                        timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT),
+                    ) as response,
+                ):
+                    if response.status_code != 200:
                         error_msg = f"Błąd API: {response.status_code}"
+                        answer_placeholder.empty()
                         st.error(error_msg)
                         logger.error(error_msg)
-                except Exception as e:
-                    st.error(f"Nie udało się połączyć z chatbotem. Błąd: {e}")
-                    logger.error(f"Connection error: {e}")
+                        return
+
+                    for event, data in iter_events(response):
+                        if event == "sources":
+                            sources = format_sources(data["sources"])
+                            sources_placeholder.markdown(sources)
+                            answer_placeholder.markdown("_Generuję odpowiedź..._")
+                        elif event == "delta":
+                            answer += data["text"]
+                            answer_placeholder.markdown(answer + "▌")
+                        elif event == "error":
+                            st.error(data["detail"])
+                            logger.error(f"API stream error: {data['detail']}")
+                        elif event == "done":
+                            break
+            except Exception as e:
+                st.error(f"Nie udało się połączyć z chatbotem. Błąd: {e}")
+                logger.error(f"Connection error: {e}")
+
+            answer_placeholder.markdown(answer)
+            if answer:
+                st.session_state.messages.append(
+                    {"role": "assistant", "content": answer + sources}
+                )
 
 
 if __name__ == "__main__":
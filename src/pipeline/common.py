@@ -1,3 +1,4 @@
+import functools
 import logging
 import os
 from typing import Any
@@ -12,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 CURRENT_VERSION = int(os.getenv("PIPELINE_VERSION", 1))
 MODEL_WORKER = os.getenv("MODEL_NAME", "openai/gpt-4o-mini")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120.0))
 
 
 PIPELINE_CONFIG = {
@@ -55,9 +58,15 @@ def get_config() -> dict[str, Any]:
     return PIPELINE_CONFIG.get(CURRENT_VERSION, PIPELINE_CONFIG[1])
 
 
+@functools.cache
 def get_llm_client() -> OpenAI:
     """
-    Initializes and returns an OpenAI client for OpenRouter API.
+    Returns the shared OpenAI client for OpenRouter API.
+
+    The client is created once and reused, so its HTTP connection pool is
+    shared by all callers and threads. The base URL can be pointed at a local
+    OpenAI-compatible server with LLM_BASE_URL. The SDK's own retries are
+    disabled; callers apply their own retry policy.
 
     Parameters
     ----------
@@ -73,8 +82,10 @@ def get_llm_client() -> OpenAI:
         logger.warning("OPENROUTER_API_KEY not found in environment variables.")
 
     client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=LLM_BASE_URL,
         api_key=openrouter_api_key,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
     )
 
     return client
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any
+
+from pipeline.common import logger
+
+STATE_PATH = os.getenv("CRAWL_STATE_PATH", "src/data/crawl_state.json")
+CHECKPOINT_PATH = os.getenv("CRAWL_CHECKPOINT_PATH", "src/data/crawl_checkpoint.json")
+
+HOUR = 3600.0
+MIN_INTERVAL_HOURS = float(os.getenv("CRAWL_MIN_INTERVAL_HOURS", 24))
+MAX_INTERVAL_HOURS = float(os.getenv("CRAWL_MAX_INTERVAL_HOURS", 24 * 60))
+
+
+class CrawlState:
+    """
+    Persistent record of what was scraped, when, and whether it changed.
+
+    For every URL the store keeps the hash of the cleaned content, when it was
+    last fetched and last changed, and an adaptive revisit interval: the
+    interval is halved whenever a fetch finds new content and doubled whenever
+    it finds the page unchanged (bounded by CRAWL_MIN_INTERVAL_HOURS and
+    CRAWL_MAX_INTERVAL_HOURS), so it follows each page's observed change
+    frequency. Changed pages are marked dirty until the next stage consumes them.
+    """
+
+    def __init__(
+        self,
+        path: str = STATE_PATH,
+        min_interval_hours: float = MIN_INTERVAL_HOURS,
+        max_interval_hours: float = MAX_INTERVAL_HOURS,
+    ):
+        """
+        Loads the state from disk, or starts empty if there is none.
+
+        Parameters
+        ----------
+        path : str, optional
+            Path of the JSON state file, by default STATE_PATH.
+        min_interval_hours : float, optional
+            Shortest revisit interval, by default CRAWL_MIN_INTERVAL_HOURS.
+        max_interval_hours : float, optional
+            Longest revisit interval, by default CRAWL_MAX_INTERVAL_HOURS.
+        """
+        self.path = path
+        self.min_interval = min_interval_hours * HOUR
+        self.max_interval = max_interval_hours * HOUR
+
+        self._lock = threading.Lock()
+        self._pages: dict[str, dict[str, Any]] = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._pages = json.load(f)
+
+    def is_due(self, url: str, now: float | None = None) -> bool:
+        """
+        Tells whether a URL should be fetched again.
+
+        Parameters
+        ----------
+        url : str
+            The page URL.
+        now : float | None, optional
+            The current UNIX time, by default time.time().
+
+        Returns
+        -------
+        bool
+            True if the page was never fetched or its revisit interval elapsed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._pages.get(url)
+            if entry is None:
+                return True
+            return now >= entry["last_fetched"] + entry["interval"]
+
+    def record(
+        self, url: str, text: str, file_name: str, now: float | None = None
+    ) -> bool:
+        """
+        Records a fetch and updates the revisit interval of the page.
+
+        Parameters
+        ----------
+        url : str
+            The page URL.
+        text : str
+            The cleaned page content.
+        file_name : str
+            Name of the file the page is stored in.
+        now : float | None, optional
+            The current UNIX time, by default time.time().
+
+        Returns
+        -------
+        bool
+            True if the page is new or its content changed.
+        """
+        now = time.time() if now is None else now
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            entry = self._pages.get(url)
+
+            if entry is None:
+                self._pages[url] = {
+                    "content_hash": content_hash,
+                    "file": file_name,
+                    "first_seen": now,
+                    "last_fetched": now,
+                    "last_changed": now,
+                    "interval": self.min_interval,
+                    "fetches": 1,
+                    "changes": 1,
+                    "dirty": True,
+                }
+                return True
+
+            changed = entry["content_hash"] != content_hash
+            entry["last_fetched"] = now
+            entry["fetches"] += 1
+            entry["file"] = file_name
+
+            if changed:
+                entry["content_hash"] = content_hash
+                entry["last_changed"] = now
+                entry["changes"] += 1
+                entry["dirty"] = True
+                entry["interval"] = max(self.min_interval, entry["interval"] / 2)
+            else:
+                entry["interval"] = min(self.max_interval, entry["interval"] * 2)
+
+            return changed
+
+    def clean_files(self) -> set[str]:
+        """
+        Returns the scraped files whose content was already consumed downstream.
+
+        Files not listed here (dirty or unknown to the store) must be processed.
+
+        Returns
+        -------
+        set[str]
+            Names of the clean files.
+        """
+        with self._lock:
+            return {
+                entry["file"] for entry in self._pages.values() if not entry["dirty"]
+            }
+
+    def clear_dirty(self, file_names: set[str]) -> None:
+        """
+        Marks the given files as consumed by the next stage.
+
+        Parameters
+        ----------
+        file_names : set[str]
+            Names of the processed files.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            for entry in self._pages.values():
+                if entry["file"] in file_names:
+                    entry["dirty"] = False
+
+    def save(self) -> None:
+        """
+        Writes the state to disk atomically.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._pages, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+        logger.info(f"Saved crawl state of {len(self._pages)} pages to {self.path}")
+
+
+class CrawlCheckpoint:
+    """
+    Persistent progress of running site crawls, used to resume interrupted ones.
+
+    For every crawl root the checkpoint keeps the Firecrawl job ID and the
+    number of result pages already consumed. It is rewritten atomically after
+    every update, so a crash loses at most the batch being processed.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        """
+        Loads the checkpoint from disk, or starts empty if there is none.
+
+        Parameters
+        ----------
+        path : str, optional
+            Path of the JSON checkpoint file, by default CHECKPOINT_PATH.
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._crawls: dict[str, dict[str, Any]] = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._crawls = json.load(f)
+
+    def get(self, root: str) -> dict[str, Any] | None:
+        """
+        Returns the progress of an unfinished crawl.
+
+        Parameters
+        ----------
+        root : str
+            The root URL of the crawl.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            A dictionary with 'job_id' and 'consumed', or None if there is
+            no unfinished crawl of the root.
+        """
+        with self._lock:
+            entry = self._crawls.get(root)
+            return dict(entry) if entry is not None else None
+
+    def update(self, root: str, job_id: str, consumed: int) -> None:
+        """
+        Records the progress of a crawl and writes the checkpoint.
+
+        Parameters
+        ----------
+        root : str
+            The root URL of the crawl.
+        job_id : str
+            The Firecrawl crawl job ID.
+        consumed : int
+            Number of result pages already processed.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self._crawls[root] = {"job_id": job_id, "consumed": consumed}
+            self._write()
+
+    def remove(self, root: str) -> None:
+        """
+        Forgets a finished crawl and writes the checkpoint.
+
+        Parameters
+        ----------
+        root : str
+            The root URL of the crawl.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            if self._crawls.pop(root, None) is not None:
+                self._write()
+
+    def _write(self) -> None:
+        """
+        Writes the checkpoint to disk atomically; the caller holds the lock.
+
+        Returns
+        -------
+        None
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._crawls, f, indent=2)
+        os.replace(tmp_path, self.path)
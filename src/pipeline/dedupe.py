@@ -0,0 +1,285 @@
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+from chromadb.api.models.Collection import Collection
+from datasketch import MinHash, MinHashLSH
+
+from data_ingest.modules.lexical_index import get_fact_sources
+from pipeline.common import logger
+
+ALIASES_FILE = "fact_aliases.json"
+
+SHINGLE_SIZE = 5
+WHITESPACE_PATTERN = re.compile(r"\s+")
+NUMBER_PATTERN = re.compile(r"\w*\d\w*")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[bytes]:
+    """
+    Returns the character shingles of a normalized text.
+
+    Character n-grams are robust to the inflection of Polish words, so facts
+    differing only in word forms still share most of their shingles.
+
+    Parameters
+    ----------
+    text : str
+        The fact text.
+    size : int, optional
+        Length of a shingle, by default 5.
+
+    Returns
+    -------
+    set[bytes]
+        The UTF-8 encoded shingles.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    if len(text) <= size:
+        return {text.encode("utf-8")}
+    return {text[i : i + size].encode("utf-8") for i in range(len(text) - size + 1)}
+
+
+def numeric_tokens(text: str) -> frozenset[str]:
+    """
+    Returns the tokens of a text that contain digits.
+
+    Parameters
+    ----------
+    text : str
+        The fact text.
+
+    Returns
+    -------
+    frozenset[str]
+        Numbers, dates, room numbers and course codes found in the text.
+    """
+    return frozenset(NUMBER_PATTERN.findall(text.casefold()))
+
+
+class LexicalDeduplicator:
+    """
+    Streaming detection of near-duplicate facts with MinHash LSH.
+
+    Facts are checked in order; a fact whose estimated Jaccard similarity to
+    an earlier kept fact reaches `threshold` is a duplicate of it. Facts that
+    differ in any number (e.g. 'Sala 304' and 'Sala 308') are never merged.
+    Only the MinHash signatures and numeric tokens of the last `window` kept
+    facts are indexed, so memory use does not grow with the corpus; duplicates
+    further apart than the window are not detected.
+    """
+
+    def __init__(
+        self, threshold: float = 0.8, num_perm: int = 128, window: int = 100_000
+    ):
+        """
+        Initializes an empty index.
+
+        Parameters
+        ----------
+        threshold : float, optional
+            Jaccard similarity above which facts are duplicates, by default 0.8.
+        num_perm : int, optional
+            Number of MinHash permutations, by default 128.
+        window : int, optional
+            Number of most recently kept facts that are indexed,
+            by default 100 000.
+        """
+        self.num_perm = num_perm
+        self.window = window
+
+        self._lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+        # key -> (insertion number, numeric tokens), oldest first
+        self._kept: dict[str, tuple[int, frozenset[str]]] = {}
+        self._inserted = 0
+
+    def check(self, key: str, text: str) -> str | None:
+        """
+        Checks a fact against the indexed facts and indexes it if it is kept.
+
+        Parameters
+        ----------
+        key : str
+            The fact ID.
+        text : str
+            The fact text.
+
+        Returns
+        -------
+        str | None
+            The ID of the earliest indexed fact it duplicates, or None if the
+            fact is kept (or was already checked under the same ID).
+        """
+        if key in self._kept:
+            return None
+
+        minhash = MinHash(num_perm=self.num_perm)
+        minhash.update_batch(list(shingles(text)))
+        text_numbers = numeric_tokens(text)
+
+        candidates = [
+            candidate
+            for candidate in self._lsh.query(minhash)
+            if self._kept[candidate][1] == text_numbers
+        ]
+        if candidates:
+            return min(candidates, key=lambda candidate: self._kept[candidate][0])
+
+        self._lsh.insert(key, minhash)
+        self._kept[key] = (self._inserted, text_numbers)
+        self._inserted += 1
+
+        if len(self._kept) > self.window:
+            oldest = next(iter(self._kept))
+            self._lsh.remove(oldest)
+            del self._kept[oldest]
+        return None
+
+
+def find_paraphrases(
+    collection: Collection,
+    embeddings: list[list[float]],
+    threshold: float = 0.95,
+    stored_ids: set[str] | None = None,
+) -> dict[int, int | str]:
+    """
+    Finds new facts whose embedding is nearly identical to another fact.
+
+    Every embedding is compared with its nearest neighbour in the collection
+    and with the earlier embeddings of the same batch.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The collection with the already stored facts (cosine space).
+    embeddings : list[list[float]]
+        Embeddings of the new facts.
+    threshold : float, optional
+        Cosine similarity above which facts are paraphrases, by default 0.95.
+    stored_ids : set[str] | None, optional
+        IDs of the stored facts that may be repeated, by default None (all of
+        them). Restricting them keeps stale facts, which are about to be
+        deleted, from absorbing new ones.
+
+    Returns
+    -------
+    dict[int, int | str]
+        For every paraphrase, the ID of the stored fact it repeats, or the
+        batch index of the earlier new fact it repeats.
+    """
+    if not embeddings:
+        return {}
+
+    paraphrase_of: dict[int, int | str] = {}
+
+    if stored_ids or (stored_ids is None and collection.count()):
+        neighbours = collection.query(
+            query_embeddings=embeddings,
+            ids=list(stored_ids) if stored_ids is not None else None,
+            n_results=1,
+            include=["distances"],
+        )
+        for i, (ids, distances) in enumerate(
+            zip(neighbours["ids"], neighbours["distances"], strict=True)
+        ):
+            if ids and 1 - distances[0] >= threshold:
+                paraphrase_of[i] = ids[0]
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+
+    for i in range(1, len(vectors)):
+        if i in paraphrase_of:
+            continue
+        for j in np.flatnonzero(similarity[i, :i] >= threshold):
+            if int(j) not in paraphrase_of:
+                paraphrase_of[i] = int(j)
+                break
+
+    return paraphrase_of
+
+
+def load_aliases(path_to_database: str) -> dict[str, str]:
+    """
+    Loads the IDs of facts dropped as paraphrases and the IDs they repeat.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+
+    Returns
+    -------
+    dict[str, str]
+        Mapping of a dropped fact ID to the ID of the stored fact.
+    """
+    path = os.path.join(path_to_database, ALIASES_FILE)
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_aliases(path_to_database: str, aliases: dict[str, str]) -> None:
+    """
+    Writes the paraphrase aliases next to the database atomically.
+
+    Parameters
+    ----------
+    path_to_database : str
+        The local file path to the persistent Chroma database.
+    aliases : dict[str, str]
+        Mapping of a dropped fact ID to the ID of the stored fact.
+
+    Returns
+    -------
+    None
+    """
+    path = os.path.join(path_to_database, ALIASES_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(aliases, f)
+    os.replace(tmp_path, path)
+
+
+def merge_sources(collection: Collection, new_sources: dict[str, set[str]]) -> int:
+    """
+    Adds source URLs of dropped paraphrases to the facts they repeat.
+
+    The merged URLs are stored in the 'sources' metadata field, one per line,
+    next to the original 'url'.
+
+    Parameters
+    ----------
+    collection : chromadb.api.models.Collection.Collection
+        The collection with the stored facts.
+    new_sources : dict[str, set[str]]
+        Source URLs to add, by fact ID.
+
+    Returns
+    -------
+    int
+        The number of updated facts.
+    """
+    if not new_sources:
+        return 0
+
+    stored = collection.get(ids=list(new_sources), include=["metadatas"])
+    ids, metadatas = [], []
+    for fact_id, metadata in zip(stored["ids"], stored["metadatas"], strict=True):
+        current = get_fact_sources(metadata)
+        added = sorted(new_sources[fact_id] - set(current))
+        if added:
+            ids.append(fact_id)
+            metadatas.append({**metadata, "sources": "\n".join(current + added)})
+
+    if ids:
+        collection.update(ids=ids, metadatas=metadatas)
+
+    logger.debug(f"Merged paraphrase sources into {len(ids)} facts")
+    return len(ids)
@@ -1,5 +1,10 @@
 import json
 import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from openai import APIConnectionError, APIStatusError, RateLimitError
 
 from pipeline.common import (
     CURRENT_VERSION,
@@ -8,11 +13,25 @@ from pipeline.common import (
     get_llm_client,
     logger,
 )
+from pipeline.crawl_state import CrawlState
+from pipeline.extraction_cache import ExtractionCache
+from utils.rate_limit import TokenBucket, backoff_delay
 
 config = get_config()
 
 INPUT_DIR = "src/data/processed_text"
 OUTPUT_DIR = "src/data/facts"
+SCRAPED_DIR = "src/data/scraped_raw"
+
+CHUNK_SIZE = 15000
+TEMPERATURE = 0.1
+MAX_CONCURRENCY = int(os.getenv("EXTRACT_MAX_CONCURRENCY", 8))
+RATE_LIMIT = float(os.getenv("EXTRACT_RATE_LIMIT", 5.0))  # requests per second
+MAX_RETRIES = int(os.getenv("EXTRACT_MAX_RETRIES", 5))
+CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "src/data/extraction_cache")
+CACHE_MAX_AGE_DAYS = float(os.getenv("EXTRACT_CACHE_MAX_AGE_DAYS", 30))
+
+rate_limiter = TokenBucket(RATE_LIMIT, capacity=MAX_CONCURRENCY)
 
 SYSTEM_PROMPT = """
     Jesteś inteligentnym asystentem z Wydziału MiNI PW, który pomaga wyodrębniać fakty z różnych dokumentów.
@@ -27,13 +46,236 @@ SYSTEM_PROMPT = """
     W zależności od dokumentu, liczby faktów mogą się bardzo różnić.
 """
 
+extraction_cache = ExtractionCache(CACHE_DIR, MODEL_WORKER, SYSTEM_PROMPT, TEMPERATURE)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Tells whether a failed LLM request is worth retrying.
+
+    Parameters
+    ----------
+    error : Exception
+        The exception raised by the OpenAI client.
+
+    Returns
+    -------
+    bool
+        True for rate limiting (429), server errors (5xx), timeouts and
+        connection errors.
+    """
+    if isinstance(error, RateLimitError | APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def retry_after(error: Exception) -> float | None:
+    """
+    Reads the Retry-After header of a failed response, if present.
+
+    Parameters
+    ----------
+    error : Exception
+        The exception raised by the OpenAI client.
+
+    Returns
+    -------
+    float | None
+        The number of seconds the server asked to wait, or None.
+    """
+    if not isinstance(error, APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def request_facts(chunk: str) -> str:
+    """
+    Sends one chunk to the LLM, honouring the rate limit and retrying transient errors.
+
+    Parameters
+    ----------
+    chunk : str
+        The text chunk to extract facts from.
+
+    Returns
+    -------
+    str
+        The raw content of the LLM response.
+
+    Raises
+    ------
+    openai.OpenAIError
+        If the request fails with a non-retryable error or retries are exhausted.
+    """
+    client = get_llm_client()
+
+    attempt = 0
+    while True:
+        rate_limiter.acquire()
+        try:
+            response = client.chat.completions.create(
+                model=MODEL_WORKER,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Tekst:\n{chunk}"},
+                ],
+                temperature=TEMPERATURE,
+            )
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            if attempt >= MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = retry_after(e) or backoff_delay(attempt)
+            attempt += 1
+            logger.warning(
+                f"LLM request failed ({e.__class__.__name__}), "
+                f"retry {attempt}/{MAX_RETRIES} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def parse_facts(content: str, filename: str) -> list[str] | None:
+    """
+    Parses the JSON list of facts returned by the LLM.
+
+    Parameters
+    ----------
+    content : str
+        The raw content of the LLM response.
+    filename : str
+        The name of the file being processed (used for error logging).
+
+    Returns
+    -------
+    list[str] | None
+        The parsed facts, or None if the response is not a JSON list.
+    """
+    if content.startswith("```"):
+        content = content.replace("```json", "").replace("```", "")
+
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, list):
+            return parsed
+    except json.JSONDecodeError:
+        logger.error(f"Error processing: {filename}")
+
+    return None
+
+
+def extract_chunk_facts(chunk: str, filename: str) -> list[str]:
+    """
+    Extracts facts from a single text chunk, using the extraction cache if possible.
+
+    Only successfully parsed responses are cached.
+
+    Parameters
+    ----------
+    chunk : str
+        The text chunk to extract facts from.
+    filename : str
+        The name of the file being processed (used for error logging).
+
+    Returns
+    -------
+    list[str]
+        The facts found in the chunk.
+    """
+    facts = extraction_cache.get(chunk)
+    if facts is not None:
+        return facts
+
+    facts = parse_facts(request_facts(chunk), filename)
+    if facts is None:
+        return []
+
+    extraction_cache.set(chunk, facts)
+    return facts
+
+
+def split_into_chunks(text: str) -> list[str]:
+    """
+    Splits a text into the chunks sent to the LLM.
+
+    Parameters
+    ----------
+    text : str
+        The raw input text.
+
+    Returns
+    -------
+    list[str]
+        Consecutive pieces of at most CHUNK_SIZE characters.
+    """
+    return [text[i : i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+
+
+def submit_extraction(
+    executor: ThreadPoolExecutor, text: str, filename: str
+) -> list[Future]:
+    """
+    Schedules fact extraction for every chunk of a text.
+
+    Parameters
+    ----------
+    executor : ThreadPoolExecutor
+        The pool running LLM requests.
+    text : str
+        The raw input text from which to extract facts.
+    filename : str
+        The name of the file being processed (used for error logging).
 
-def extract_facts_list(text: str, filename: str) -> list[str]:
+    Returns
+    -------
+    list[Future]
+        One future per chunk, in text order.
+    """
+    return [
+        executor.submit(extract_chunk_facts, chunk, filename)
+        for chunk in split_into_chunks(text)
+    ]
+
+
+def collect_facts(futures: list[Future], filename: str) -> list[str]:
+    """
+    Waits for the chunk futures of one file and joins their facts in order.
+
+    Parameters
+    ----------
+    futures : list[Future]
+        Futures returned by `submit_extraction`.
+    filename : str
+        The name of the file being processed (used for error logging).
+
+    Returns
+    -------
+    list[str]
+        The facts of the whole file, or an empty list if any request failed.
+    """
+    raw_facts_strings = []
+    try:
+        for future in futures:
+            raw_facts_strings.extend(future.result())
+    except Exception as e:
+        logger.error(f"Error API for {filename}: {e}")
+        return []
+
+    return raw_facts_strings
+
+
+def extract_facts_list(
+    text: str, filename: str, executor: ThreadPoolExecutor | None = None
+) -> list[str]:
     """
     Decides whether to use LLM or return raw text based on config.
 
     With LLM, it retrieves a list of fact strings from the provided text using the LLM client.
     Each fact is expected to be a complete sentence extracted from the text.
+    Chunks of the text are sent concurrently.
 
     Parameters
     ----------
@@ -41,6 +283,8 @@ def extract_facts_list(text: str, filename: str) -> list[str]:
         The raw input text from which to extract facts.
     filename : str
         The name of the file being processed (used for error logging).
+    executor : ThreadPoolExecutor | None, optional
+        The pool running LLM requests, by default a temporary one.
 
     Returns
     -------
@@ -50,42 +294,90 @@ def extract_facts_list(text: str, filename: str) -> list[str]:
     if not config["use_llm_for_facts"]:
         return [text.strip()]
 
-    client = get_llm_client()
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as own_executor:
+            return collect_facts(
+                submit_extraction(own_executor, text, filename), filename
+            )
 
-    try:
-        chunk_size = 15000
-        text_chunks = [
-            text[i : i + chunk_size] for i in range(0, len(text), chunk_size)
-        ]
+    return collect_facts(submit_extraction(executor, text, filename), filename)
 
-        raw_facts_strings = []
 
-        for chunk in text_chunks:
-            response = client.chat.completions.create(
-                model=MODEL_WORKER,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"Tekst:\n{chunk}"},
-                ],
-                temperature=0.1,
-            )
-            content = response.choices[0].message.content.strip()
+def find_source_url(txt_file: str) -> str:
+    """
+    Looks up the source URL of a text file in its metadata JSON.
 
-            if content.startswith("```"):
-                content = content.replace("```json", "").replace("```", "")
+    Parameters
+    ----------
+    txt_file : str
+        The name of the text file.
 
-            try:
-                parsed = json.loads(content)
-                if isinstance(parsed, list):
-                    raw_facts_strings.extend(parsed)
-            except json.JSONDecodeError:
-                logger.error(f"Error processing: {filename}")
+    Returns
+    -------
+    str
+        The source URL, or the file name if no metadata exists.
+    """
+    base_name = os.path.splitext(txt_file)[0]
 
-        return raw_facts_strings
+    # Logic: Look for metadata JSON in INPUT_DIR regardless of source folder
+    meta_path = os.path.join(INPUT_DIR, f"{txt_file.replace('.txt', '.json')}")
+    if not os.path.exists(meta_path):
+        meta_path = os.path.join(INPUT_DIR, f"{base_name}.json")
 
-    except Exception as e:
-        logger.error(f"Error API for {filename}: {e}")
-        return []
+    source_url = txt_file
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+            source_url = meta.get("source_url", txt_file)
+
+    return source_url
+
+
+def facts_path(txt_file: str) -> str:
+    """
+    Returns the path of the facts JSON produced from a text file.
+
+    Parameters
+    ----------
+    txt_file : str
+        The name of the text file.
+
+    Returns
+    -------
+    str
+        The output path in OUTPUT_DIR.
+    """
+    base_name = os.path.splitext(txt_file)[0]
+    return os.path.join(OUTPUT_DIR, f"{base_name}_facts.json")
+
+
+def save_facts(txt_file: str, source_url: str, content_list: list[str]) -> None:
+    """
+    Writes the facts of one file to OUTPUT_DIR.
+
+    Parameters
+    ----------
+    txt_file : str
+        The name of the processed text file.
+    source_url : str
+        The source URL stored with every fact.
+    content_list : list[str]
+        The extracted facts.
+
+    Returns
+    -------
+    None
+    """
+    if not content_list:
+        return
+
+    structured_output = [{"source": source_url, "fact": item} for item in content_list]
+
+    out_path = facts_path(txt_file)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(structured_output, f, indent=2, ensure_ascii=False)
+
+    logger.info(f"Saved {len(structured_output)} items to {out_path}")
 
 
 def main() -> None:
@@ -95,6 +387,15 @@ def main() -> None:
     Processes all .txt files in the input folders, extracts facts using the LLM (if configured),
     and saves them in the output directory with associated source URLs.
 
+    LLM requests for all files share one client and run concurrently, limited
+    to EXTRACT_MAX_CONCURRENCY in-flight requests and EXTRACT_RATE_LIMIT
+    requests per second. Files are still written one by one in input order.
+    Chunks whose text, prompt, model and temperature are unchanged are served
+    from the on-disk extraction cache; entries unused for
+    EXTRACT_CACHE_MAX_AGE_DAYS are pruned at the end. Scraped pages that the
+    crawl state store reports as unchanged since their facts were extracted
+    are skipped entirely.
+
     Parameters
     ----------
     None
@@ -105,53 +406,88 @@ def main() -> None:
     """
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    input_folders = ["src/data/scraped_raw", "src/data/processed_text"]
+    input_folders = [SCRAPED_DIR, "src/data/processed_text"]
 
     mode_info = (
         "LLM extraction" if config["use_llm_for_facts"] else "Raw text passthrough"
     )
     logger.info(f"Starting extraction. Version: {CURRENT_VERSION} | Mode: {mode_info}")
 
-    for folder in input_folders:
-
-        if not os.path.exists(folder):
-            logger.warning(f"Input folder does not exist: {folder}")
-            continue
-
-        files = [f for f in os.listdir(folder) if f.endswith(".txt")]
-
-        for txt_file in files:
-            base_name = os.path.splitext(txt_file)[0]
-            txt_path = os.path.join(folder, txt_file)
-
-            # Logic: Look for metadata JSON in INPUT_DIR regardless of source folder
-            meta_path = os.path.join(INPUT_DIR, f"{txt_file.replace('.txt', '.json')}")
-            if not os.path.exists(meta_path):
-                meta_path = os.path.join(INPUT_DIR, f"{base_name}.json")
-
-            source_url = txt_file
-            if os.path.exists(meta_path):
-                with open(meta_path, encoding="utf-8") as f:
-                    meta = json.load(f)
-                    source_url = meta.get("source_url", txt_file)
-
-            logger.info(f"Processing: {txt_file} (Source: {source_url})")
-
-            with open(txt_path, encoding="utf-8") as f:
-                text_content = f.read()
-
-            content_list = extract_facts_list(text_content, txt_file)
-
-            if content_list:
-                structured_output = [
-                    {"source": source_url, "fact": item} for item in content_list
-                ]
-
-                out_path = os.path.join(OUTPUT_DIR, f"{base_name}_facts.json")
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(structured_output, f, indent=2, ensure_ascii=False)
-
-                logger.info(f"Saved {len(structured_output)} items to {out_path}")
+    crawl_state = CrawlState()
+    clean_files = crawl_state.clean_files()
+    processed_scraped: set[str] = set()
+
+    # bounds the number of files whose text is held in memory at once
+    max_pending_files = MAX_CONCURRENCY * 4
+    pending: deque[tuple[str, str, str, list[Future] | list[str]]] = deque()
+
+    def finish_oldest() -> None:
+        """Waits for the oldest pending file and writes its facts."""
+        folder, txt_file, source_url, work = pending.popleft()
+        if config["use_llm_for_facts"]:
+            work = collect_facts(work, txt_file)
+        save_facts(txt_file, source_url, work)
+        if folder == SCRAPED_DIR and work:
+            processed_scraped.add(txt_file)
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        for folder in input_folders:
+
+            if not os.path.exists(folder):
+                logger.warning(f"Input folder does not exist: {folder}")
+                continue
+
+            files = [f for f in os.listdir(folder) if f.endswith(".txt")]
+
+            for txt_file in files:
+                if (
+                    folder == SCRAPED_DIR
+                    and txt_file in clean_files
+                    and os.path.exists(facts_path(txt_file))
+                ):
+                    logger.info(f"Skipping unchanged page: {txt_file}")
+                    if config["use_llm_for_facts"]:
+                        # its cache entries are still valid, keep them from being pruned
+                        with open(
+                            os.path.join(folder, txt_file), encoding="utf-8"
+                        ) as f:
+                            for chunk in split_into_chunks(f.read()):
+                                extraction_cache.touch(chunk)
+                    continue
+
+                txt_path = os.path.join(folder, txt_file)
+                source_url = find_source_url(txt_file)
+
+                logger.info(f"Processing: {txt_file} (Source: {source_url})")
+
+                with open(txt_path, encoding="utf-8") as f:
+                    text_content = f.read()
+
+                if config["use_llm_for_facts"]:
+                    work = submit_extraction(executor, text_content, txt_file)
+                else:
+                    work = extract_facts_list(text_content, txt_file)
+
+                pending.append((folder, txt_file, source_url, work))
+                if len(pending) >= max_pending_files:
+                    finish_oldest()
+
+        while pending:
+            finish_oldest()
+
+    if processed_scraped:
+        crawl_state.clear_dirty(processed_scraped)
+        crawl_state.save()
+
+    if config["use_llm_for_facts"]:
+        stats = extraction_cache.stats()
+        logger.info(
+            f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"(hit rate {stats['hit_rate']:.1%})."
+        )
+        if CACHE_MAX_AGE_DAYS > 0:
+            removed = extraction_cache.prune(CACHE_MAX_AGE_DAYS)
+            logger.info(f"Pruned {removed} stale extraction cache entries.")
 
 
 if __name__ == "__main__":
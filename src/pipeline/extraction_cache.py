@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any
+
+
+def hash_text(text: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a text.
+
+    Parameters
+    ----------
+    text : str
+        The text to hash.
+
+    Returns
+    -------
+    str
+        The hex digest.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    On-disk cache of parsed LLM fact lists.
+
+    Entries are keyed by (chunk text hash, system prompt hash, model name,
+    temperature), so changing any of them results in a miss. Every entry is a
+    small JSON file; a hit (or a `touch` of an entry that is still valid but
+    was not read) refreshes its modification time, which `prune` uses to drop
+    entries that have not been needed for a while.
+    """
+
+    def __init__(self, cache_dir: str, model: str, prompt: str, temperature: float):
+        """
+        Initializes the cache for one extraction configuration.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory where entries are stored.
+        model : str
+            Name of the LLM used for extraction.
+        prompt : str
+            The system prompt used for extraction.
+        temperature : float
+            The sampling temperature used for extraction.
+        """
+        self.cache_dir = cache_dir
+        self.model = model
+        self.prompt_hash = hash_text(prompt)
+        self.temperature = temperature
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    def key(self, chunk: str) -> str:
+        """
+        Computes the cache key of a text chunk.
+
+        Parameters
+        ----------
+        chunk : str
+            The text chunk sent to the LLM.
+
+        Returns
+        -------
+        str
+            The cache key.
+        """
+        parts = [hash_text(chunk), self.prompt_hash, self.model, self.temperature]
+        return hash_text(json.dumps(parts))
+
+    def _path(self, key: str) -> str:
+        """
+        Returns the file path of an entry.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        Returns
+        -------
+        str
+            Path of the entry file, sharded by the first two key characters.
+        """
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, chunk: str) -> list[str] | None:
+        """
+        Returns the cached facts of a chunk.
+
+        Parameters
+        ----------
+        chunk : str
+            The text chunk sent to the LLM.
+
+        Returns
+        -------
+        list[str] | None
+            The cached facts, or None on a miss.
+        """
+        path = self._path(self.key(chunk))
+        try:
+            with open(path, encoding="utf-8") as f:
+                facts = json.load(f)["facts"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return facts
+
+    def set(self, chunk: str, facts: list[str]) -> None:
+        """
+        Stores the parsed facts of a chunk.
+
+        Parameters
+        ----------
+        chunk : str
+            The text chunk sent to the LLM.
+        facts : list[str]
+            The parsed facts.
+
+        Returns
+        -------
+        None
+        """
+        path = self._path(self.key(chunk))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {"model": self.model, "temperature": self.temperature, "facts": facts}
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def touch(self, chunk: str) -> bool:
+        """
+        Marks the entry of a chunk as still needed without reading it.
+
+        Parameters
+        ----------
+        chunk : str
+            The text chunk sent to the LLM.
+
+        Returns
+        -------
+        bool
+            True if the chunk has an entry.
+        """
+        try:
+            os.utime(self._path(self.key(chunk)))
+        except OSError:
+            return False
+        return True
+
+    def prune(self, max_age_days: float) -> int:
+        """
+        Deletes entries that have not been read or written for `max_age_days`.
+
+        Parameters
+        ----------
+        max_age_days : float
+            Maximum age of an entry in days.
+
+        Returns
+        -------
+        int
+            The number of deleted entries.
+        """
+        cutoff = time.time() - max_age_days * 24 * 3600
+        removed = 0
+
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit/miss counters of the current run.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary with 'hits', 'misses' and 'hit_rate'.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
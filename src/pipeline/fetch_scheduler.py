@@ -0,0 +1,164 @@
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from urllib.parse import urlparse
+
+from pipeline.common import logger
+from utils.rate_limit import TokenBucket, backoff_delay
+
+
+class FetchScheduler:
+    """
+    Runs fetches concurrently while staying polite towards every host.
+
+    At most `max_workers` fetches run at once in total and at most
+    `per_host_concurrency` per host; each host additionally gets its own token
+    bucket allowing `per_host_rate` requests per second. Failed fetches are
+    retried with exponential backoff. Results are handed to a callback as soon
+    as each fetch finishes.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host_concurrency: int = 2,
+        per_host_rate: float = 1.0,
+        max_retries: int = 3,
+        backoff_base: float = 2.0,
+    ):
+        """
+        Initializes the scheduler.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Total number of concurrent fetches, by default 8.
+        per_host_concurrency : int, optional
+            Maximum number of concurrent fetches per host, by default 2.
+        per_host_rate : float, optional
+            Maximum number of requests per second per host, by default 1.0.
+        max_retries : int, optional
+            Number of retries after a failed fetch, by default 3.
+        backoff_base : float, optional
+            Scale of the exponential backoff in seconds, by default 2.0.
+        """
+        self.max_workers = max_workers
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+        self._hosts_lock = threading.Lock()
+        self._host_slots: dict[str, threading.Semaphore] = {}
+        self._host_buckets: dict[str, TokenBucket] = {}
+
+    def _host_limits(self, url: str) -> tuple[threading.Semaphore, TokenBucket]:
+        """
+        Returns the concurrency slots and rate limiter of the URL's host.
+
+        Parameters
+        ----------
+        url : str
+            The URL to be fetched.
+
+        Returns
+        -------
+        tuple[threading.Semaphore, TokenBucket]
+            The per-host semaphore and token bucket.
+        """
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host_concurrency)
+                self._host_buckets[host] = TokenBucket(self.per_host_rate)
+            return self._host_slots[host], self._host_buckets[host]
+
+    def _fetch_with_retry(self, url: str, fetch: Callable[[str], Any]) -> Any:
+        """
+        Fetches a URL within its host limits, retrying on failure.
+
+        Parameters
+        ----------
+        url : str
+            The URL to fetch.
+        fetch : Callable[[str], Any]
+            The function performing the fetch.
+
+        Returns
+        -------
+        Any
+            The result of `fetch`.
+
+        Raises
+        ------
+        Exception
+            The last error if all attempts failed.
+        """
+        slots, bucket = self._host_limits(url)
+
+        attempt = 0
+        while True:
+            with slots:
+                bucket.acquire()
+                try:
+                    return fetch(url)
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    error = e
+
+            # back off without holding the host slot
+            delay = backoff_delay(attempt, base=self.backoff_base)
+            attempt += 1
+            logger.warning(
+                f"Fetching {url} failed ({error}), "
+                f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def run(
+        self,
+        urls: Iterable[str],
+        fetch: Callable[[str], Any],
+        on_result: Callable[[str, Any], None],
+    ) -> dict[str, int]:
+        """
+        Fetches all URLs and calls `on_result` for each one as soon as it finishes.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+            The URLs to fetch.
+        fetch : Callable[[str], Any]
+            The function performing a single fetch.
+        on_result : Callable[[str, Any], None]
+            Called from a worker thread with the URL and the fetch result.
+
+        Returns
+        -------
+        dict[str, int]
+            Counts of 'succeeded' and 'failed' URLs.
+        """
+        counts = {"succeeded": 0, "failed": 0}
+        counts_lock = threading.Lock()
+
+        def task(url: str) -> None:
+            """Fetches one URL and reports the outcome."""
+            try:
+                result = self._fetch_with_retry(url, fetch)
+                on_result(url, result)
+            except Exception as e:
+                logger.warning(f"Couldn't get content from {url}. Error: {e}")
+                outcome = "failed"
+            else:
+                outcome = "succeeded"
+
+            with counts_lock:
+                counts[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(task, urls))
+
+        return counts
@@ -0,0 +1,234 @@
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from urllib.parse import parse_qs, urljoin, urlparse
+
+HEADNOTE_MARKER = "![](https://ww2.mini.pw.edu.pl/wp-content/uploads/WMiNI-01.png)"
+FOOTNOTE_MARKER = "#### Zaloguj się"
+
+
+@dataclass
+class StubDocument:
+    """
+    Mimics the document returned by `Firecrawl.scrape`.
+
+    Attributes
+    ----------
+    markdown : str
+        The page content in markdown.
+    links : list[str]
+        Links found on the page.
+    """
+
+    markdown: str
+    links: list[str] = field(default_factory=list)
+
+
+class StubFirecrawl:
+    """
+    Local stand-in for the Firecrawl client, used to exercise the scraper offline.
+
+    Pages are synthetic but wrapped in the same head- and footnote markers as
+    real MiNI pages. Every request sleeps for a random latency, so scheduling
+    and politeness settings can be measured without network access. Crawl jobs
+    are kept in memory and reveal their pages gradually, like a running crawl.
+    """
+
+    CRAWL_PAGE_SIZE = 10
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        crawl_size: int = 50,
+    ):
+        """
+        Initializes the stub.
+
+        Parameters
+        ----------
+        latency : float, optional
+            Mean latency of a request in seconds, by default 0.5.
+        jitter : float, optional
+            Maximum deviation from the mean latency in seconds, by default 0.2.
+        failure_rate : float, optional
+            Probability that a request raises an error, by default 0.0.
+        crawl_size : int, optional
+            Number of pages returned by a crawl, by default 50.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.crawl_size = crawl_size
+
+        self._jobs: dict[str, tuple[str, int, float]] = {}
+
+    def _wait(self) -> None:
+        """
+        Simulates network latency and random failures.
+
+        Raises
+        ------
+        ConnectionError
+            With probability `failure_rate`.
+        """
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.failure_rate:
+            raise ConnectionError("Simulated Firecrawl failure")
+
+    @staticmethod
+    def _render(url: str) -> str:
+        """
+        Builds the synthetic markdown of a page.
+
+        Parameters
+        ----------
+        url : str
+            The page URL.
+
+        Returns
+        -------
+        str
+            Markdown with head- and footnote around the content.
+        """
+        return (
+            f"Menu\n{HEADNOTE_MARKER}\n# {url}\n\n"
+            f"Treść strony {url}.\n\n{FOOTNOTE_MARKER}\nStopka"
+        )
+
+    def scrape(self, url: str, **kwargs: Any) -> StubDocument:
+        """
+        Returns a synthetic page, like `Firecrawl.scrape`.
+
+        Parameters
+        ----------
+        url : str
+            The page URL.
+        **kwargs : Any
+            Ignored scrape options.
+
+        Returns
+        -------
+        StubDocument
+            The page content and links.
+        """
+        self._wait()
+        return StubDocument(markdown=self._render(url), links=[urljoin(url, "/")])
+
+    def start_crawl(self, url: str, limit: int | None = None, **kwargs: Any) -> Any:
+        """
+        Starts a synthetic crawl job, like `Firecrawl.start_crawl`.
+
+        Pages of the job become available one per `latency` seconds.
+
+        Parameters
+        ----------
+        url : str
+            The root URL of the crawl.
+        limit : int | None, optional
+            Maximum number of pages, by default `crawl_size`.
+        **kwargs : Any
+            Ignored crawl options.
+
+        Returns
+        -------
+        Any
+            An object with the job 'id'.
+        """
+        self._wait()
+        total = min(limit or self.crawl_size, self.crawl_size)
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = (url, total, time.monotonic())
+        return SimpleNamespace(id=job_id, url=url)
+
+    def get_crawl_status(self, job_id: str, pagination_config: Any = None) -> Any:
+        """
+        Returns the first page of crawl results, like `Firecrawl.get_crawl_status`.
+
+        Parameters
+        ----------
+        job_id : str
+            The ID of the crawl job.
+        pagination_config : Any, optional
+            Ignored; results are never auto-paginated.
+
+        Returns
+        -------
+        Any
+            An object with 'status', 'total', 'completed', 'next' and 'data'.
+
+        Raises
+        ------
+        KeyError
+            If the job is unknown.
+        """
+        return self._crawl_page(job_id, 0)
+
+    def get_crawl_status_page(self, next_url: str) -> Any:
+        """
+        Returns a further page of crawl results, like `Firecrawl.get_crawl_status_page`.
+
+        Parameters
+        ----------
+        next_url : str
+            A '/v2/crawl/<job_id>?skip=<n>' URL.
+
+        Returns
+        -------
+        Any
+            An object with 'status', 'total', 'completed', 'next' and 'data'.
+
+        Raises
+        ------
+        KeyError
+            If the job is unknown.
+        """
+        parsed = urlparse(next_url)
+        job_id = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+        skip = int(parse_qs(parsed.query).get("skip", ["0"])[0])
+        return self._crawl_page(job_id, skip)
+
+    def _crawl_page(self, job_id: str, skip: int) -> Any:
+        """
+        Builds one page of the results of a crawl job.
+
+        Parameters
+        ----------
+        job_id : str
+            The ID of the crawl job.
+        skip : int
+            Number of results to skip.
+
+        Returns
+        -------
+        Any
+            An object with 'status', 'total', 'completed', 'next' and 'data'.
+        """
+        self._wait()
+        root, total, started = self._jobs[job_id]
+        elapsed = time.monotonic() - started
+        completed = min(total, int(elapsed / max(self.latency, 1e-3)))
+
+        end = min(completed, skip + self.CRAWL_PAGE_SIZE)
+        data = []
+        for i in range(skip, end):
+            page_url = urljoin(root, f"stub/page-{i}/")
+            data.append(
+                SimpleNamespace(
+                    markdown=self._render(page_url),
+                    metadata=SimpleNamespace(url=page_url, source_url=page_url),
+                )
+            )
+
+        return SimpleNamespace(
+            id=job_id,
+            status="completed" if completed == total else "scraping",
+            total=total,
+            completed=completed,
+            next=f"/v2/crawl/{job_id}?skip={end}" if end < completed else None,
+            data=data,
+        )
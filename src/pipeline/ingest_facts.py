@@ -1,10 +1,32 @@
+import hashlib
 import json
 import logging
 import os
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
 
 from data_ingest.modules.embedder import Embedder
-from data_ingest.modules.vector_db import save_to_vector_db
+from data_ingest.modules.lexical_index import (
+    build_lexical_index,
+    get_lexical_index_path,
+)
+from data_ingest.modules.vector_db import (
+    delete_stale_documents,
+    get_existing_ids,
+    get_or_create_collection,
+    make_fact_id,
+    publish_index_version,
+    save_to_vector_db,
+)
 from pipeline.common import CURRENT_VERSION
+from pipeline.dedupe import (
+    LexicalDeduplicator,
+    find_paraphrases,
+    load_aliases,
+    merge_sources,
+    save_aliases,
+)
 from utils.paths import get_data_dir
 
 logging.basicConfig(level=logging.INFO)
@@ -12,15 +34,193 @@ logger = logging.getLogger(__name__)
 
 INPUT_DIR = "src/data/facts"
 DB_PATH = os.environ.get("CHROMA_DIR", get_data_dir("chroma_db"))
+BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 256))
+CHECKPOINT_PATH = os.path.join(DB_PATH, "ingest_checkpoint.json")
+DEDUPE_ENABLED = os.environ.get("INGEST_DEDUPE", "1") == "1"
+# estimated Jaccard similarity of character shingles
+LSH_THRESHOLD = float(os.environ.get("DEDUPE_LSH_THRESHOLD", 0.8))
+# number of most recently kept facts that lexical duplicates are looked for in
+LSH_WINDOW = int(os.environ.get("DEDUPE_LSH_WINDOW", 100_000))
+# cosine similarity of embeddings
+PARAPHRASE_THRESHOLD = float(os.environ.get("DEDUPE_PARAPHRASE_THRESHOLD", 0.95))
+
+
+def list_fact_files(input_dir: str) -> list[str]:
+    """
+    Lists the fact files in a stable order, so that runs can be resumed.
+
+    Parameters
+    ----------
+    input_dir : str
+        Directory containing JSON files with facts.
+
+    Returns
+    -------
+    list[str]
+        Sorted file names.
+    """
+    return sorted(f for f in os.listdir(input_dir) if f.endswith(".json"))
+
+
+def fingerprint_files(input_dir: str, files: list[str]) -> str:
+    """
+    Computes a cheap fingerprint of the input files (names, sizes, mtimes).
+
+    Parameters
+    ----------
+    input_dir : str
+        Directory containing the files.
+    files : list[str]
+        File names to include.
+
+    Returns
+    -------
+    str
+        A hex digest that changes whenever any input file changes.
+    """
+    digest = hashlib.sha256()
+    for filename in files:
+        stat = os.stat(os.path.join(input_dir, filename))
+        digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def iter_facts(input_dir: str, files: list[str]) -> Iterator[tuple[str, str]]:
+    """
+    Lazily yields facts, reading one file at a time.
+
+    Parameters
+    ----------
+    input_dir : str
+        Directory containing JSON files with facts.
+    files : list[str]
+        File names to read, in order.
+
+    Yields
+    ------
+    tuple[str, str]
+        The fact text and its source URL.
+    """
+    for filename in files:
+        path = os.path.join(input_dir, filename)
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                facts_list = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading file {filename}: {e}")
+            continue
+
+        if not isinstance(facts_list, list):
+            logger.warning(
+                f"File {filename} has wrong format, expected a list of facts."
+            )
+            continue
+
+        for item in facts_list:
+            fact_text = item.get("fact")
+            source_url = item.get("source", "unknown")
+            if fact_text:
+                yield fact_text, source_url
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    """
+    Groups an iterable into lists of at most `batch_size` items.
+
+    Parameters
+    ----------
+    items : Iterable[Any]
+        The items to group.
+    batch_size : int
+        Maximum size of a batch.
+
+    Yields
+    ------
+    list[Any]
+        Consecutive batches.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_checkpoint(fingerprint: str) -> int:
+    """
+    Returns the number of facts committed by an interrupted run on the same input.
+
+    Parameters
+    ----------
+    fingerprint : str
+        Fingerprint of the current input files.
+
+    Returns
+    -------
+    int
+        Number of facts to skip, 0 if there is no matching checkpoint.
+    """
+    if not os.path.exists(CHECKPOINT_PATH):
+        return 0
+
+    with open(CHECKPOINT_PATH, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get("fingerprint") != fingerprint:
+        logger.info("Input changed since the last checkpoint, starting from scratch.")
+        return 0
+
+    return checkpoint.get("committed", 0)
+
+
+def save_checkpoint(fingerprint: str, committed: int) -> None:
+    """
+    Records how many facts have been written to the database.
+
+    Parameters
+    ----------
+    fingerprint : str
+        Fingerprint of the current input files.
+    committed : int
+        Number of facts committed so far.
+
+    Returns
+    -------
+    None
+    """
+    tmp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "committed": committed}, f)
+    os.replace(tmp_path, CHECKPOINT_PATH)
 
 
 def main() -> None:
     """
     Ingests facts from JSON files, generates embeddings, and saves them to ChromaDB.
 
-    This function reads all JSON files from the configured input directory, extracts
-    facts and source URLs, generates vector embeddings for each fact, and stores
-    everything in the vector database. It also logs progress and any errors encountered.
+    Facts are read lazily and processed in batches of INGEST_BATCH_SIZE: each
+    batch is embedded and written before the next one is read, so memory use
+    does not grow with the corpus. After every batch a checkpoint is stored;
+    if the process crashes, the next run on the same input resumes after the
+    last committed batch.
+
+    Ingestion is incremental: facts are identified by a hash of their source
+    and text, only facts missing from the database are embedded and written,
+    and facts that are no longer produced by any source are deleted.
+
+    Unless INGEST_DEDUPE=0, near-duplicates are dropped before they are
+    stored: MinHash LSH over the last DEDUPE_LSH_WINDOW kept facts finds
+    lexical near-duplicates before embedding, and every new embedding is
+    compared with its nearest stored neighbour to find paraphrases. The source
+    URLs of dropped facts are merged into the 'sources' of the kept fact,
+    which retrieval returns with it, and paraphrase aliases are kept in
+    fact_aliases.json so they are not re-embedded on later runs. A new
+    index version is published only if the database changed, after the BM25
+    index stored next to the collection has been rebuilt.
 
     Parameters
     ----------
@@ -32,46 +232,170 @@ def main() -> None:
     """
     logger.info(f"Starting ingestion for pipeline version: {CURRENT_VERSION}")
 
+    files = list_fact_files(INPUT_DIR)
+    logger.info(f"Found {len(files)} files with facts to ingest.")
+
+    os.makedirs(DB_PATH, exist_ok=True)
+    fingerprint = fingerprint_files(INPUT_DIR, files)
+    resume_from = load_checkpoint(fingerprint)
+    if resume_from:
+        logger.info(f"Resuming after {resume_from} already committed facts.")
+
+    deduplicator = (
+        LexicalDeduplicator(threshold=LSH_THRESHOLD, window=LSH_WINDOW)
+        if DEDUPE_ENABLED
+        else None
+    )
+
     embedder = Embedder()
+    collection = get_or_create_collection(DB_PATH)
+    previous_aliases = load_aliases(DB_PATH)
+    aliases: dict[str, str] = {}
+    logger.info(f"Saving to ChromaDB ({DB_PATH}) in batches of {BATCH_SIZE}...")
 
-    all_text_chunks = []
-    all_urls = []
+    seen = 0
+    seen_ids: set[str] = set()
+    # facts of this run that are stored, i.e. valid targets of paraphrases
+    stored_ids: set[str] = set()
+    lexical_duplicates = 0
+    written = 0
+    paraphrases = 0
+    updated = 0
+    started = time.perf_counter()
 
-    files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".json")]
-    logger.info(f"Found {len(files)} files with facts to ingest.")
+    for batch in iter_batches(iter_facts(INPUT_DIR, files), BATCH_SIZE):
+        seen += len(batch)
 
-    for filename in files:
-        path = os.path.join(INPUT_DIR, filename)
+        batch_facts = []
+        # source URLs of lexical duplicates, by the ID of the fact they repeat
+        duplicate_urls: dict[str, set[str]] = {}
+        for text, url in batch:
+            fact_id = make_fact_id(text, url)
+            if fact_id in seen_ids:
+                continue
+            if deduplicator is not None:
+                canonical = deduplicator.check(fact_id, text)
+                if canonical is not None:
+                    lexical_duplicates += 1
+                    duplicate_urls.setdefault(canonical, set()).add(url)
+                    continue
+            seen_ids.add(fact_id)
 
-        try:
-            with open(path, encoding="utf-8") as f:
-                facts_list = json.load(f)
+            alias = previous_aliases.get(fact_id)
+            if alias is not None:
+                # keep the fact this one was merged into, even if its own
+                # source no longer produces it
+                aliases[fact_id] = alias
+                seen_ids.add(alias)
+            batch_facts.append((fact_id, text, url, [url]))
+
+        for fact_id, _, _, urls in batch_facts:
+            urls.extend(sorted(duplicate_urls.pop(fact_id, set()) - set(urls)))
+
+        candidate_ids = {fact_id for fact_id, *_ in batch_facts}
+        candidate_ids.update(
+            aliases[fact_id] for fact_id, *_ in batch_facts if fact_id in aliases
+        )
+        existing = get_existing_ids(collection, list(candidate_ids))
+        stored_ids.update(existing)
+
+        if seen <= resume_from:
+            continue
+
+        new_facts = [
+            fact
+            for fact in batch_facts
+            if fact[0] not in existing and aliases.get(fact[0]) not in existing
+        ]
 
-            if not isinstance(facts_list, list):
-                logger.warning(
-                    f"File {filename} has wrong format, expected a list of facts."
+        # sources of lexical duplicates of facts stored in earlier batches or runs
+        new_sources: dict[str, set[str]] = {}
+        for canonical, urls in duplicate_urls.items():
+            new_sources.setdefault(aliases.get(canonical, canonical), set()).update(
+                urls
+            )
+        for fact_id, _, _, urls in batch_facts:
+            target = fact_id if fact_id in existing else aliases.get(fact_id)
+            if target in existing and len(urls) > 1:
+                new_sources.setdefault(target, set()).update(urls)
+
+        if new_facts:
+            for fact_id, *_ in new_facts:
+                # its alias target is gone, so the fact is stored again
+                aliases.pop(fact_id, None)
+                previous_aliases.pop(fact_id, None)
+
+            texts = [text for _, text, _, _ in new_facts]
+            embeddings = embedder.generate_embeddings(texts)
+
+            paraphrase_of = {}
+            if DEDUPE_ENABLED:
+                paraphrase_of = find_paraphrases(
+                    collection, embeddings, PARAPHRASE_THRESHOLD, stored_ids
                 )
-                continue
 
-            for item in facts_list:
-                fact_text = item.get("fact")
-                source_url = item.get("source", "unknown")
-                if fact_text:
-                    all_text_chunks.append(fact_text)
-                    all_urls.append(source_url)
+            for i, target in paraphrase_of.items():
+                fact_id, _, _, urls = new_facts[i]
+                if isinstance(target, int):
+                    target = new_facts[target][0]
+                aliases[fact_id] = target
+                seen_ids.add(target)
+                new_sources.setdefault(target, set()).update(urls)
 
-        except Exception as e:
-            logger.error(f"Error reading file {filename}: {e}")
+            kept = [i for i in range(len(new_facts)) if i not in paraphrase_of]
+            if kept:
+                save_to_vector_db(
+                    [new_facts[i][1] for i in kept],
+                    [embeddings[i] for i in kept],
+                    [new_facts[i][2] for i in kept],
+                    DB_PATH,
+                    sources=[new_facts[i][3] for i in kept],
+                )
+                stored_ids.update(new_facts[i][0] for i in kept)
+            written += len(kept)
+            paraphrases += len(paraphrase_of)
+
+        updated += merge_sources(collection, new_sources)
+
+        # aliases of facts not reached yet in this run must survive a crash
+        save_aliases(DB_PATH, {**previous_aliases, **aliases})
+        save_checkpoint(fingerprint, seen)
 
-    if not all_text_chunks:
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Processed {seen} facts, wrote {written} new "
+            f"({(seen - resume_from) / elapsed:.1f} facts/s)."
+        )
+
+    if seen == 0:
         logger.warning("No data to ingest.")
         return
 
-    logger.info(f"Generating embeddings for {len(all_text_chunks)} facts...")
-    embeddings = embedder.generate_embeddings(all_text_chunks)
+    deleted = delete_stale_documents(collection, seen_ids)
+    save_aliases(DB_PATH, aliases)
+    os.remove(CHECKPOINT_PATH)
+
+    removed = lexical_duplicates + len(aliases)
+    logger.info(
+        f"Deduplication removed {removed} of {seen} facts ({removed / seen:.1%}): "
+        f"{lexical_duplicates} lexical near-duplicates, {len(aliases)} paraphrases "
+        f"({paraphrases} found in this run)."
+    )
+    logger.info(
+        f"Ingestion finished: {len(seen_ids)} unique facts, {written} written, "
+        f"{updated} merged, {deleted} stale deleted."
+    )
+
+    changed = written or updated or deleted or resume_from
+    if changed or not os.path.exists(get_lexical_index_path(DB_PATH)):
+        indexed = build_lexical_index(collection, DB_PATH)
+        logger.info(f"Built BM25 index over {indexed} facts.")
 
-    logger.info(f"Saving to ChromaDB ({DB_PATH})...")
-    save_to_vector_db(all_text_chunks, embeddings, all_urls, DB_PATH)
+    if changed:
+        version = publish_index_version(DB_PATH)
+        logger.info(f"Published index version {version}.")
+    else:
+        logger.info("Index unchanged, keeping the current version.")
     logger.info("Ready for deployment!")
 
 
@@ -1,18 +1,37 @@
 import logging
 import os
 import time
+from collections.abc import Callable
 from dataclasses import dataclass
+from typing import Any
 
 from dotenv import load_dotenv
 from firecrawl import Firecrawl
+from firecrawl.v2.types import PaginationConfig, ScrapeOptions
 
-from src.pipeline.common import CURRENT_VERSION
+from pipeline.common import CURRENT_VERSION
+from pipeline.crawl_state import CrawlCheckpoint, CrawlState
+from pipeline.fetch_scheduler import FetchScheduler
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+OUTPUT_DIR = "src/data/scraped_raw"
+
+MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", 8))
+PER_HOST_CONCURRENCY = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", 2))
+PER_HOST_RATE = float(os.getenv("SCRAPE_PER_HOST_RATE", 1.0))  # requests per second
+MAX_RETRIES = int(os.getenv("SCRAPE_MAX_RETRIES", 3))
+# set to a latency in seconds (e.g. "0.5") to use the local Firecrawl stand-in
+FIRECRAWL_STUB_LATENCY = os.getenv("FIRECRAWL_STUB_LATENCY")
+# fetch every page regardless of its revisit interval
+FORCE_RECRAWL = os.getenv("CRAWL_FORCE", "0") == "1"
+CRAWL_LIMIT = int(os.getenv("CRAWL_LIMIT", 1000))
+# seconds to wait for new results of a running crawl
+CRAWL_POLL_INTERVAL = float(os.getenv("CRAWL_POLL_INTERVAL", 5.0))
+
 
 @dataclass
 class ScrapedPage:
@@ -76,12 +95,9 @@ def clean_footnote(text: str) -> str:
     return text
 
 
-def scrap_data() -> list[ScrapedPage]:
+def get_firecrawl_client() -> Any:
     """
-    Scrapes data from the MiNI PW website using the Firecrawl API.
-
-    Depending on the CURRENT_VERSION, it either scrapes a limited list of URLs
-    or performs a full crawl of the website.
+    Returns the Firecrawl client, or the local stand-in if FIRECRAWL_STUB_LATENCY is set.
 
     Parameters
     ----------
@@ -89,15 +105,263 @@ def scrap_data() -> list[ScrapedPage]:
 
     Returns
     -------
-    list[ScrapedPage]
-        A list of ScrapedPage objects containing URL, cleaned text, and links.
+    Any
+        A `Firecrawl` client or a `StubFirecrawl` with the same interface.
     """
+    if FIRECRAWL_STUB_LATENCY is not None:
+        from pipeline.firecrawl_stub import StubFirecrawl
+
+        logger.info("Using the local Firecrawl stand-in.")
+        return StubFirecrawl(latency=float(FIRECRAWL_STUB_LATENCY))
+
     firecrawl_api_key = os.getenv("FIRECRAWL_API_KEY")
     if not firecrawl_api_key:
         logger.warning("FIRECRAWL_API_KEY not found in environment variables.")
 
-    app = Firecrawl(api_key=firecrawl_api_key)
-    output = []
+    return Firecrawl(api_key=firecrawl_api_key)
+
+
+def page_file_name(url: str) -> str:
+    """
+    Returns the name of the text file a page is stored in.
+
+    Parameters
+    ----------
+    url : str
+        The page URL.
+
+    Returns
+    -------
+    str
+        The file name derived from the URL.
+    """
+    safe_name = url.replace("https://", "").replace("/", "_").strip("_")
+    return f"{safe_name}.txt"
+
+
+def save_page(page: ScrapedPage, output_dir: str = OUTPUT_DIR) -> str:
+    """
+    Writes a scraped page to a text file.
+
+    Parameters
+    ----------
+    page : ScrapedPage
+        The page to save.
+    output_dir : str, optional
+        The output directory, by default OUTPUT_DIR.
+
+    Returns
+    -------
+    str
+        The path of the written file.
+    """
+    file_path = os.path.join(output_dir, page_file_name(page.url))
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"URL: {page.url}\n\n{page.text}")
+
+    return file_path
+
+
+def scrape_page(app: Any, url: str) -> ScrapedPage:
+    """
+    Scrapes and cleans a single page.
+
+    Parameters
+    ----------
+    app : Any
+        The Firecrawl client.
+    url : str
+        The URL to scrape.
+
+    Returns
+    -------
+    ScrapedPage
+        The cleaned page.
+    """
+    result = app.scrape(
+        url,
+        formats=[
+            "markdown",
+            "links",
+        ],  # markdown — for cleaned page content; links — for all links displayed on given url
+        only_main_content=False,
+        timeout=120000,
+    )
+    text = clean_headnote(result.markdown)
+    text = clean_footnote(text)
+    return ScrapedPage(url=url, text=text, links=result.links)
+
+
+def start_crawl(app: Any, root: str, checkpoint: CrawlCheckpoint) -> str:
+    """
+    Starts a new crawl job and records it in the checkpoint.
+
+    Parameters
+    ----------
+    app : Any
+        The Firecrawl client.
+    root : str
+        The root URL of the crawl.
+    checkpoint : CrawlCheckpoint
+        The crawl checkpoint.
+
+    Returns
+    -------
+    str
+        The ID of the crawl job.
+    """
+    job = app.start_crawl(
+        root, limit=CRAWL_LIMIT, scrape_options=ScrapeOptions(formats=["markdown"])
+    )
+    checkpoint.update(root, job.id, 0)
+    logger.info(f"Started crawl {job.id} of {root}")
+    return job.id
+
+
+def get_crawl_results(app: Any, job_id: str, skip: int) -> Any:
+    """
+    Fetches the status of a crawl job and the next page of its results.
+
+    Parameters
+    ----------
+    app : Any
+        The Firecrawl client.
+    job_id : str
+        The ID of the crawl job.
+    skip : int
+        Number of results already consumed.
+
+    Returns
+    -------
+    Any
+        A `CrawlJob` with 'status' and the results after `skip` under 'data'.
+    """
+    if skip == 0:
+        return app.get_crawl_status(
+            job_id, pagination_config=PaginationConfig(auto_paginate=False)
+        )
+    return app.get_crawl_status_page(f"/v2/crawl/{job_id}?skip={skip}")
+
+
+def crawl_site(
+    app: Any,
+    root: str,
+    on_page: Callable[[ScrapedPage], Any],
+    checkpoint: CrawlCheckpoint,
+) -> int:
+    """
+    Crawls a website from its root URL, streaming cleaned pages to `on_page`.
+
+    Results are consumed page by page while the crawl job is still running,
+    so memory use does not grow with the size of the site. The number of
+    consumed results is checkpointed after every batch; if the checkpoint
+    holds an unfinished crawl of the root, it is resumed instead of starting
+    a new one.
+
+    Every crawled page is passed to `on_page`, including pages that are not
+    due for a revisit: Firecrawl has fetched them anyway (excluding them from
+    the crawl would also stop it from discovering the pages they link to), so
+    recording them is a free revisit rather than discarded content.
+
+    Parameters
+    ----------
+    app : Any
+        The Firecrawl client.
+    root : str
+        The root URL of the crawl.
+    on_page : Callable[[ScrapedPage], Any]
+        Called for every cleaned page as soon as it is received.
+    checkpoint : CrawlCheckpoint
+        The crawl checkpoint.
+
+    Returns
+    -------
+    int
+        The total number of pages of the crawl, including those consumed
+        before a resume.
+
+    Raises
+    ------
+    RuntimeError
+        If the crawl job failed or was cancelled; its checkpoint is removed,
+        so the next attempt starts a new crawl.
+    """
+    progress = checkpoint.get(root)
+    if progress is None:
+        job_id, consumed = start_crawl(app, root, checkpoint), 0
+        job = get_crawl_results(app, job_id, consumed)
+    else:
+        job_id, consumed = progress["job_id"], progress["consumed"]
+        logger.info(f"Resuming crawl {job_id} of {root} after {consumed} pages")
+        try:
+            job = get_crawl_results(app, job_id, consumed)
+        except Exception as e:
+            logger.warning(f"Couldn't resume crawl {job_id} ({e}), starting over")
+            job_id, consumed = start_crawl(app, root, checkpoint), 0
+            job = get_crawl_results(app, job_id, consumed)
+
+    while True:
+        for document in job.data:
+            metadata = document.metadata
+            url = metadata.url or metadata.source_url if metadata else None
+            if url is None:
+                continue
+            text = clean_footnote(clean_headnote(document.markdown or ""))
+            on_page(ScrapedPage(url=url, text=text, links=[]))
+
+        if job.data:
+            consumed += len(job.data)
+            checkpoint.update(root, job_id, consumed)
+            logger.info(f"Crawl of {root}: {consumed}/{job.total} pages received")
+        elif job.status == "completed":
+            break
+        elif job.status in ("failed", "cancelled"):
+            # a dead job cannot be resumed: the next attempt starts a new crawl
+            checkpoint.remove(root)
+            raise RuntimeError(f"Crawl {job_id} of {root} {job.status}")
+        else:
+            time.sleep(CRAWL_POLL_INTERVAL)
+
+        job = get_crawl_results(app, job_id, consumed)
+
+    checkpoint.remove(root)
+    return consumed
+
+
+def scrap_data(
+    on_page: Callable[[ScrapedPage], Any] = save_page,
+    should_fetch: Callable[[str], bool] | None = None,
+) -> int:
+    """
+    Scrapes data from the MiNI PW website using the Firecrawl API.
+
+    Depending on the CURRENT_VERSION, it either scrapes a limited list of URLs
+    or performs a full crawl of the website. URLs (or crawl roots) are fetched
+    concurrently by a FetchScheduler with per-host concurrency and rate limits,
+    and every page is passed to `on_page` as soon as it is ready. Crawl results
+    are streamed while the crawl runs and an interrupted crawl resumes from
+    its checkpoint.
+
+    Parameters
+    ----------
+    on_page : Callable[[ScrapedPage], Any], optional
+        Called from a worker thread for every scraped page, by default `save_page`.
+    should_fetch : Callable[[str], bool] | None, optional
+        Filter deciding which URLs of the limited list are fetched, by default
+        None (all of them). Full crawls pass every crawled page to `on_page`.
+
+    Returns
+    -------
+    int
+        The number of pages passed to `on_page`.
+    """
+    app = get_firecrawl_client()
+    scheduler = FetchScheduler(
+        max_workers=MAX_WORKERS,
+        per_host_concurrency=PER_HOST_CONCURRENCY,
+        per_host_rate=PER_HOST_RATE,
+        max_retries=MAX_RETRIES,
+    )
 
     if CURRENT_VERSION <= 2:
         # first 15 URLs to test the results
@@ -119,61 +383,59 @@ def scrap_data() -> list[ScrapedPage]:
             "https://ww2.mini.pw.edu.pl/wydzial/uchwaly-rw/",
         ]
 
-        logger.info(f"V{CURRENT_VERSION}: Scraping limited list of {len(urls)} URLs.")
+        if should_fetch is not None:
+            due = [url for url in urls if should_fetch(url)]
+            logger.info(
+                f"V{CURRENT_VERSION}: {len(urls) - len(due)} URLs are not due for a revisit."
+            )
+            urls = due
 
-        for url in urls:
-            try:
-                result = app.scrape(
-                    url,
-                    formats=[
-                        "markdown",
-                        "links",
-                    ],  # markdown — for cleaned page content; links — for all links displayed on given url
-                    only_main_content=False,
-                    timeout=120000,
-                )
-                text = clean_headnote(result.markdown)
-                text = clean_footnote(text)
-                output.append(ScrapedPage(url=url, text=text, links=result.links))
-                time.sleep(1)
-            except Exception as e:
-                logger.warning(f"Couldn't get content from {url}. Error: {e}")
+        logger.info(f"V{CURRENT_VERSION}: Scraping limited list of {len(urls)} URLs.")
 
-    else:
-        logger.info(f"V{CURRENT_VERSION}: Starting full crawl of MiNI PW website.")
-        root_urls = ["https://ww2.mini.pw.edu.pl/"]
+        counts = scheduler.run(
+            urls,
+            fetch=lambda url: scrape_page(app, url),
+            on_result=lambda _, page: on_page(page),
+        )
+        return counts["succeeded"]
 
-        if CURRENT_VERSION == 4:
-            root_urls.extend(["https://repo.pw.edu.pl/index.seam?lang=pl"])
+    logger.info(f"V{CURRENT_VERSION}: Starting full crawl of MiNI PW website.")
+    root_urls = ["https://ww2.mini.pw.edu.pl/"]
 
-        logger.info(f"V{CURRENT_VERSION}: Starting crawl for roots: {root_urls}")
+    if CURRENT_VERSION == 4:
+        root_urls.extend(["https://repo.pw.edu.pl/index.seam?lang=pl"])
 
-        for root in root_urls:
-            try:
-                crawl_result = app.crawl_url(
-                    root,
-                    params={"limit": 1000, "scrapeOptions": {"formats": ["markdown"]}},
-                )
+    logger.info(f"V{CURRENT_VERSION}: Starting crawl for roots: {root_urls}")
 
-                for page in crawl_result.get("data", []):
-                    raw_text = page.get("markdown", "")
-                    clean_text = clean_footnote(clean_headnote(raw_text))
-                    output.append(
-                        ScrapedPage(url=page.get("url"), text=clean_text, links=[])
-                    )
+    checkpoint = CrawlCheckpoint()
+    pages_per_root: list[int] = []
 
-            except Exception as e:
-                logger.error(f"Crawl failed for {root}: {e}")
+    def handle_crawl(root: str, total: int) -> None:
+        """Records the number of pages streamed from a finished crawl."""
+        pages_per_root.append(total)
+        logger.info(f"Crawl of {root} finished with {total} pages.")
 
-    return output
+    # a crawl retried by the scheduler resumes from the checkpoint
+    scheduler.run(
+        root_urls,
+        fetch=lambda root: crawl_site(app, root, on_page, checkpoint),
+        on_result=handle_crawl,
+    )
+    return sum(pages_per_root)
 
 
 def main() -> None:
     """
     Main function to run the scraper pipeline.
 
-    Scrapes data, creates the output directory, and saves the cleaned
-    content to text files.
+    Creates the output directory and scrapes data, saving the cleaned
+    content of every page to a text file as soon as it is scraped.
+
+    The crawl state store decides which pages are due for a revisit (unless
+    CRAWL_FORCE=1) and which fetched pages actually changed; only new or
+    changed pages are written and marked dirty for the extraction stage. Full crawls
+    (V3/V4) fetch every page of the site regardless, so every crawled page is
+    recorded as a revisit.
 
     Parameters
     ----------
@@ -184,18 +446,29 @@ def main() -> None:
     None
     """
     logger.info(f"Starting scraper pipeline V{CURRENT_VERSION}")
-    scraped_data = scrap_data()
-
-    output_dir = "src/data/scraped_raw"
-    os.makedirs(output_dir, exist_ok=True)
-
-    for _, page in enumerate(scraped_data):
-        safe_name = page.url.replace("https://", "").replace("/", "_").strip("_")
-        file_path = os.path.join(output_dir, f"{safe_name}.txt")
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(f"URL: {page.url}\n\n{page.text}")
 
-    logger.info(f"Successfully saved {len(scraped_data)} pages to {output_dir}")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    crawl_state = CrawlState()
+    changed_urls: list[str] = []
+
+    def handle_page(page: ScrapedPage) -> None:
+        """Writes the page if it is new or its content changed."""
+        file_name = page_file_name(page.url)
+        changed = crawl_state.record(page.url, page.text, file_name)
+        if changed or not os.path.exists(os.path.join(OUTPUT_DIR, file_name)):
+            save_page(page)
+            changed_urls.append(page.url)
+
+    fetched = scrap_data(
+        on_page=handle_page,
+        should_fetch=None if FORCE_RECRAWL else crawl_state.is_due,
+    )
+    crawl_state.save()
+
+    logger.info(
+        f"Fetched {fetched} pages, {len(changed_urls)} new or changed "
+        f"saved to {OUTPUT_DIR}"
+    )
 
 
 if __name__ == "__main__":
@@ -1,17 +1,87 @@
+import json
 import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import BaseModel
 
-from rag_api.main import query_llm
-from rag_api.modules.prompt_builder import build_prompt
-from rag_api.modules.retrieval import get_top_k_chunks
+from rag_api.main import (
+    LLM_ERROR_MESSAGE,
+    LLM_MODELS,
+    aquery_llm,
+    get_gateway,
+    stream_llm,
+)
+from rag_api.modules import metrics
+from rag_api.modules.answer_cache import SemanticAnswerCache
+from rag_api.modules.prompt_builder import build_prompt, get_encoding
+from rag_api.modules.retrieval import (
+    embed_query,
+    get_collection_manager,
+    get_lexical_index_manager,
+    get_reranker,
+    get_top_k_chunks,
+)
+from rag_api.modules.warmup import WarmUp
+from utils import tracing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
 
-app = FastAPI()
+warm_up = WarmUp(
+    [
+        ("embedder", lambda: embed_query("rozgrzewka")),
+        ("collection", lambda: get_collection_manager().get_collection()),
+        (
+            "lexical_index",
+            lambda: get_lexical_index_manager().get_index(
+                get_collection_manager().version
+            ),
+        ),
+        ("reranker", get_reranker),
+        ("tokenizer", lambda: get_encoding(LLM_MODELS[0])),
+        ("llm_gateway", get_gateway),
+    ]
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Sets up tracing and starts the background warm-up without delaying the
+    start of the server.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application.
+
+    Yields
+    ------
+    None
+    """
+    tracing.setup_tracing("rag_api")
+    warm_up.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+NO_CONTEXT_ANSWER = "Przepraszam, nie znalazłem w bazie informacji na ten temat."
+
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.95)),
+    max_size=int(os.environ.get("ANSWER_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL", 3600.0)),
+)
 
 
 class QueryRequest(BaseModel):
@@ -27,21 +97,232 @@ class QueryRequest(BaseModel):
     query: str
 
 
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats a single server-sent event.
+
+    Parameters
+    ----------
+    event : str
+        The event name ('sources', 'delta', 'error' or 'done').
+    data : Any
+        A JSON-serializable payload.
+
+    Returns
+    -------
+    str
+        The event encoded in the text/event-stream format.
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@app.get("/healthz")
+def healthz_endpoint() -> dict[str, Any]:
+    """
+    Liveness probe; answers as soon as the process serves requests.
+
+    Returns
+    -------
+    dict[str, Any]
+        {'status': 'ok'}, the warm-up progress and, once the LLM gateway is
+        created, the state of every LLM model (circuit breaker and latency).
+    """
+    status = {"status": "ok", **warm_up.status()}
+    # the probe must stay cheap, so it never creates the gateway itself
+    if get_gateway.cache_info().currsize:
+        status["llm"] = get_gateway().stats()
+    return status
+
+
+@app.get("/readyz")
+def readyz_endpoint() -> dict[str, Any]:
+    """
+    Readiness probe; succeeds once the models, the collection and the
+    indexes are loaded.
+
+    Returns
+    -------
+    dict[str, Any]
+        {'status': 'ready'} and the warm-up progress.
+
+    Raises
+    ------
+    HTTPException
+        If the warm-up has not finished yet, e.g. while a failed stage is
+        being retried (503 Service Unavailable), with the progress as detail.
+    """
+    status = warm_up.status()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status)
+    return {"status": "ready", **status}
+
+
+@app.get("/metrics")
+def metrics_endpoint() -> Response:
+    """
+    Exposes the metrics in the Prometheus text format.
+
+    The collection size is refreshed on every scrape.
+
+    Returns
+    -------
+    Response
+        The metrics of all worker processes.
+    """
+    try:
+        metrics.COLLECTION_DOCUMENTS.set(
+            get_collection_manager().get_collection().count()
+        )
+    except Exception as e:
+        logger.warning("Could not read the collection size: %s", e)
+
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+def format_server_timing(timings: dict[str, float]) -> str:
+    """
+    Formats stage durations as a Server-Timing header value.
+
+    Parameters
+    ----------
+    timings : dict[str, float]
+        Durations in milliseconds keyed by '<stage>_ms'.
+
+    Returns
+    -------
+    str
+        The header value, e.g. 'embed;dur=12.3, search;dur=4.1'.
+    """
+    return ", ".join(
+        f"{stage.removesuffix('_ms')};dur={ms:.1f}" for stage, ms in timings.items()
+    )
+
+
+def retrieve_context(
+    query: str, timings: dict[str, float] | None = None
+) -> tuple[list[float] | None, list[dict[str, Any]]]:
+    """
+    Retrieves the top-k chunks for the query and returns them with its
+    embedding, logging the duration of every retrieval stage.
+
+    The query is embedded inside `get_top_k_chunks`, where it overlaps with
+    the lexical search; the embedding is then read back from the embedding
+    cache.
+
+    Parameters
+    ----------
+    query : str
+        The user's question.
+    timings : dict[str, float] | None, optional
+        If given, filled with the duration of each retrieval stage in
+        milliseconds, by default None.
+
+    Returns
+    -------
+    tuple[list[float] | None, list[dict[str, Any]]]
+        The query embedding (None if embedding failed) and the retrieved chunks.
+    """
+    timings = {} if timings is None else timings
+    chunks = get_top_k_chunks(query, timings=timings)
+    try:
+        query_embedding = embed_query(query)
+    except Exception as e:
+        tracing.record_error(e)
+        logger.error("Failed to embed query: %s", e, exc_info=True)
+        metrics.EMPTY_RETRIEVALS.inc()
+        return None, []
+
+    logger.info(
+        "Retrieval timings: %s",
+        ", ".join(f"{stage}={ms:.1f}" for stage, ms in timings.items()),
+    )
+    metrics.observe_timings(timings)
+    if not chunks:
+        metrics.EMPTY_RETRIEVALS.inc()
+    return query_embedding, chunks
+
+
+def collect_sources(chunks: list[dict[str, Any]]) -> list[str]:
+    """
+    Lists the source URLs of the chunks put into the prompt.
+
+    Parameters
+    ----------
+    chunks : list[dict[str, Any]]
+        The chunks used as context.
+
+    Returns
+    -------
+    list[str]
+        Every source of every chunk (including those of near-duplicates merged
+        into it at ingest time), without repetitions, best chunk first.
+    """
+    return list(
+        dict.fromkeys(
+            url
+            for chunk in chunks
+            for url in chunk.get("sources", [chunk.get("source_url", "Unknown")])
+        )
+    )
+
+
+def lookup_cached_answer(
+    query_embedding: list[float],
+    chunks: list[dict[str, Any]],
+    index_version: str | None,
+) -> dict[str, Any] | None:
+    """
+    Looks up the semantic answer cache and counts the hit or miss.
+
+    Parameters
+    ----------
+    query_embedding : list[float]
+        The embedding of the question.
+    chunks : list[dict[str, Any]]
+        The retrieved chunks.
+    index_version : str | None
+        The index version the chunks were retrieved from.
+
+    Returns
+    -------
+    dict[str, Any] | None
+        A dictionary with 'answer' and 'sources', or None on a miss.
+    """
+    cached = answer_cache.lookup(query_embedding, chunks, index_version)
+    metrics.ANSWER_CACHE_LOOKUPS.labels("miss" if cached is None else "hit").inc()
+    tracing.set_attributes({"chat.cache_hit": cached is not None})
+    if cached is not None:
+        logger.info("Serving answer from the semantic cache.")
+    return cached
+
+
 @app.post("/chat")
-def chat_endpoint(request: QueryRequest) -> dict[str, Any]:
+async def chat_endpoint(
+    request: QueryRequest, http_request: Request, response: Response
+) -> dict[str, Any]:
     """
     Handles chat interactions by retrieving context and generating an LLM response.
 
     1. Validates the input query.
     2. Retrieves the top-k relevant text chunks from the vector database.
-    3. Builds a prompt using the retrieved context.
-    4. Queries the LLM to generate an answer.
-    5. Returns the answer along with source URLs.
+    3. Returns a cached answer if a near-duplicate question with the same
+       context was answered recently.
+    4. Builds a prompt from the context chunks that fit into the token budget.
+    5. Queries the LLM to generate an answer.
+    6. Returns the answer along with the source URLs of the chunks in the prompt.
+
+    The duration of every stage is reported in the Server-Timing header, and
+    recorded as a span of the trace continued from the 'traceparent' header.
 
     Parameters
     ----------
     request : QueryRequest
         The request body containing the user's query.
+    http_request : Request
+        The raw request, used to read the trace context headers.
+    response : Response
+        The outgoing response, used to set the Server-Timing header.
 
     Returns
     -------
@@ -61,19 +342,153 @@ def chat_endpoint(request: QueryRequest) -> dict[str, Any]:
 
     logger.info(f"Received query: {query}")
 
-    sorted_chunks = get_top_k_chunks(query)
+    with (
+        metrics.track_request("chat"),
+        tracer.start_as_current_span(
+            "chat", context=tracing.request_context(http_request.headers)
+        ),
+    ):
+        tracing.set_attributes({"chat.query_length": len(query)})
+        timings: dict[str, float] = {}
+        query_embedding, sorted_chunks = await run_in_threadpool(
+            retrieve_context, query, timings
+        )
+        response.headers["Server-Timing"] = format_server_timing(timings)
+
+        if not sorted_chunks:
+            return {
+                "answer": NO_CONTEXT_ANSWER,
+                "sources": [],
+            }
+
+        index_version = get_collection_manager().version
+        cached = lookup_cached_answer(query_embedding, sorted_chunks, index_version)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
+        prompt = build_prompt(query, text_only_chunks, model=LLM_MODELS[0])
+        timings["prompt_ms"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        answer = await aquery_llm(prompt.messages)
+        timings["llm_ms"] = (time.perf_counter() - started) * 1000
+        response.headers["Server-Timing"] = format_server_timing(timings)
+        metrics.observe_timings(
+            {stage: timings[stage] for stage in ("prompt_ms", "llm_ms")}
+        )
+
+        used_chunks = sorted_chunks[: prompt.num_chunks]
+        sources = collect_sources(used_chunks)
+
+        if answer != LLM_ERROR_MESSAGE:
+            answer_cache.store(
+                query_embedding, sorted_chunks, answer, sources, index_version
+            )
+
+        return {"answer": answer, "sources": sources}
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: QueryRequest, http_request: Request
+) -> StreamingResponse:
+    """
+    Handles chat interactions and streams the answer as server-sent events.
+
+    Near-duplicate questions are answered from the semantic cache.
+    The stream consists of:
+    1. A 'sources' event with the source URLs of the chunks in the prompt,
+       sent as soon as retrieval finishes.
+    2. 'delta' events with incremental pieces of the answer.
+    3. An 'error' event, only if the LLM call fails mid-stream.
+    4. A final 'done' event.
+
+    Parameters
+    ----------
+    request : QueryRequest
+        The request body containing the user's query.
+    http_request : Request
+        The raw request, used to read the trace context headers.
+
+    Returns
+    -------
+    StreamingResponse
+        A text/event-stream response.
+
+    Raises
+    ------
+    HTTPException
+        If the query is empty (400 Bad Request).
+    """
+    query = request.query
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    logger.info(f"Received streaming query: {query}")
+    trace_context = tracing.request_context(http_request.headers)
+
+    async def event_stream() -> AsyncIterator[str]:
+        with (
+            metrics.track_request("chat_stream"),
+            tracer.start_as_current_span("chat_stream", context=trace_context),
+        ):
+            tracing.set_attributes({"chat.query_length": len(query)})
+            query_embedding, sorted_chunks = await run_in_threadpool(
+                retrieve_context, query
+            )
+
+            if not sorted_chunks:
+                yield format_sse("sources", {"sources": []})
+                yield format_sse("delta", {"text": NO_CONTEXT_ANSWER})
+                yield format_sse("done", {})
+                return
+
+            index_version = get_collection_manager().version
+            cached = lookup_cached_answer(query_embedding, sorted_chunks, index_version)
+            if cached is not None:
+                yield format_sse("sources", {"sources": cached["sources"]})
+                yield format_sse("delta", {"text": cached["answer"]})
+                yield format_sse("done", {})
+                return
 
-    if not sorted_chunks:
-        return {
-            "answer": "Przepraszam, nie znalazłem w bazie informacji na ten temat.",
-            "sources": [],
-        }
+            started = time.perf_counter()
+            text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
+            prompt = build_prompt(query, text_only_chunks, model=LLM_MODELS[0])
+            timings = {"prompt_ms": (time.perf_counter() - started) * 1000}
 
-    text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
-    prompt = build_prompt(query, text_only_chunks)
+            used_chunks = sorted_chunks[: prompt.num_chunks]
+            sources = collect_sources(used_chunks)
+            yield format_sse("sources", {"sources": sources})
 
-    answer = query_llm(prompt)
+            answer_parts = []
+            started = time.perf_counter()
+            try:
+                async for delta in stream_llm(prompt.messages):
+                    if not answer_parts:
+                        timings["llm_first_token_ms"] = (
+                            time.perf_counter() - started
+                        ) * 1000
+                    answer_parts.append(delta)
+                    yield format_sse("delta", {"text": delta})
+            except Exception as e:
+                metrics.LLM_ERRORS.inc()
+                logger.error("Failed to stream from OpenRouter: %s", e)
+                yield format_sse("error", {"detail": LLM_ERROR_MESSAGE})
+            else:
+                timings["llm_ms"] = (time.perf_counter() - started) * 1000
+                answer = "".join(answer_parts).strip()
+                if answer:
+                    answer_cache.store(
+                        query_embedding, sorted_chunks, answer, sources, index_version
+                    )
+            metrics.observe_timings(timings)
 
-    sources = [chunk.get("source_url", "Unknown") for chunk in sorted_chunks]
+            yield format_sse("done", {})
 
-    return {"answer": answer, "sources": sources}
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
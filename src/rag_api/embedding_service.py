@@ -0,0 +1,129 @@
+"""
+Embedding service shared by all API worker processes.
+
+Loads the embedding model once and serves it over HTTP, usually on a Unix
+socket next to the API, e.g.:
+
+    uvicorn rag_api.embedding_service:app --uds /run/embedder/embedder.sock
+
+API workers started with EMBEDDER_URL=unix:///run/embedder/embedder.sock use
+it instead of loading their own copy of the model. Concurrent requests from
+all workers are merged into batched forward passes.
+"""
+
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from data_ingest.modules.embedder import Embedder
+from data_ingest.modules.embedding_batcher import EmbeddingBatcher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", 32))
+EMBEDDING_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_MAX_WAIT_MS", 2.0))
+EMBEDDING_BATCH_WORKERS = int(os.environ.get("EMBEDDING_BATCH_WORKERS", 1))
+
+state: dict[str, Any] = {"batcher": None}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Loads and warms up the model before the service accepts requests.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application.
+
+    Yields
+    ------
+    None
+    """
+    logger.info("Loading embedding model...")
+    batcher = EmbeddingBatcher(
+        Embedder(),
+        max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms=EMBEDDING_MAX_WAIT_MS,
+        num_workers=EMBEDDING_BATCH_WORKERS,
+    )
+    batcher.generate_embedding("rozgrzewka")
+    state["batcher"] = batcher
+    logger.info("Embedding model ready.")
+
+    yield
+
+    state["batcher"] = None
+    batcher.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class EmbedRequest(BaseModel):
+    """
+    Pydantic model representing an embedding request.
+
+    Attributes
+    ----------
+    texts : list[str]
+        The texts to embed.
+    """
+
+    texts: list[str]
+
+
+@app.post("/embed")
+def embed_endpoint(request: EmbedRequest) -> dict[str, list[list[float]]]:
+    """
+    Embeds a list of texts.
+
+    Parameters
+    ----------
+    request : EmbedRequest
+        The request body with the texts.
+
+    Returns
+    -------
+    dict[str, list[list[float]]]
+        A dictionary with the vectors under 'embeddings', in input order.
+
+    Raises
+    ------
+    HTTPException
+        If the model is not loaded (503 Service Unavailable).
+    """
+    batcher = state["batcher"]
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded")
+
+    if len(request.texts) == 1:
+        return {"embeddings": [batcher.generate_embedding(request.texts[0])]}
+    return {"embeddings": batcher.generate_embeddings(request.texts)}
+
+
+@app.get("/readyz")
+def readyz_endpoint() -> dict[str, str]:
+    """
+    Reports whether the model is loaded and warmed up.
+
+    Returns
+    -------
+    dict[str, str]
+        {'status': 'ready'}.
+
+    Raises
+    ------
+    HTTPException
+        If the model is not loaded yet (503 Service Unavailable).
+    """
+    if state["batcher"] is None:
+        raise HTTPException(status_code=503, detail="Model is loading")
+    return {"status": "ready"}
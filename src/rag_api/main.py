@@ -1,41 +1,256 @@
+import functools
 import logging
 import os
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, Any
 
-from dotenv import load_dotenv
-from openai import OpenAI
-
+from rag_api.modules import metrics
 from rag_api.modules.prompt_builder import build_prompt
 from rag_api.modules.retrieval import get_top_k_chunks
+from utils import tracing
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+    from opentelemetry.trace import Span
 
-load_dotenv()
+    from rag_api.modules.llm_gateway import GatewayResult, LLMGateway
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
 
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    logger.warning("OPENROUTER_API_KEY not found in environment variables.")
-
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
+# any OpenAI-compatible endpoint, e.g. the stub LLM of the benchmarks
+OPENROUTER_BASE_URL = os.environ.get(
+    "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"
 )
+
+
+def get_api_key() -> str | None:
+    """
+    Reads the OpenRouter API key, loading the .env file first.
+
+    Returns
+    -------
+    str | None
+        The API key, or None if it is not configured.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        logger.warning("OPENROUTER_API_KEY not found in environment variables.")
+    return api_key
+
+
 # Highly recommended for usage with RAG, because it's free and has a good performance.
 # In order to run it, one needs to create an account on OpenRouter and get the API key.
 # Then put the API key in the .env file
 
 MODEL_NAME = "mistralai/mistral-7b-instruct:free"  # "openai/gpt-oss-20b:free"
+TEMPERATURE = 0.5
+MAX_TOKENS = 500
+LLM_ERROR_MESSAGE = "Sorry, I encountered an error while generating the response."
+
+# comma-separated models in order of preference, the first one is used for prompts;
+# an empty list falls back to MODEL_NAME
+LLM_MODELS = [
+    model.strip()
+    for model in os.environ.get("LLM_MODELS", MODEL_NAME).split(",")
+    if model.strip()
+] or [MODEL_NAME]
+# time budget of an answer (of its first token when streaming) and of one attempt
+LLM_DEADLINE = float(os.environ.get("LLM_DEADLINE", 60.0))
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get("LLM_ATTEMPT_TIMEOUT", 30.0))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", 0.5))
+# consecutive transient failures that open a model's breaker; kept above the
+# LLM_MAX_RETRIES + 1 attempts of one request, so one bad request cannot open it
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", 30.0))
+# fire the next model when an attempt exceeds the p95 latency of its model
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", 95.0))
+LLM_PREFER_FASTEST = os.environ.get("LLM_PREFER_FASTEST", "1") == "1"
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 100))
+
+
+@functools.cache
+def get_client() -> "OpenAI":
+    """
+    Returns the shared synchronous OpenRouter client, created on the first call.
+
+    Used by the CLI, which relies on the SDK's own retries.
+
+    Returns
+    -------
+    openai.OpenAI
+        The client.
+    """
+    from openai import OpenAI
+
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=get_api_key(),
+        timeout=LLM_ATTEMPT_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+@functools.cache
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Returns the shared asynchronous OpenRouter client, created on the first call.
+
+    Its connection pool keeps up to LLM_MAX_CONNECTIONS connections alive for
+    all requests of the process. The SDK's own retries are disabled, since
+    the gateway applies its own policy.
+
+    Returns
+    -------
+    openai.AsyncOpenAI
+        The client.
+    """
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=get_api_key(),
+        timeout=LLM_ATTEMPT_TIMEOUT,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            )
+        ),
+    )
+
+
+@functools.cache
+def get_gateway() -> "LLMGateway":
+    """
+    Returns the shared LLM gateway, created on the first call.
+
+    Returns
+    -------
+    LLMGateway
+        The gateway over LLM_MODELS using the asynchronous client.
+    """
+    from rag_api.modules.llm_gateway import LLMGateway
+
+    return LLMGateway(
+        get_async_client(),
+        LLM_MODELS,
+        deadline=LLM_DEADLINE,
+        attempt_timeout=LLM_ATTEMPT_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        breaker_failures=LLM_BREAKER_FAILURES,
+        breaker_cooldown=LLM_BREAKER_COOLDOWN,
+        hedge=LLM_HEDGE,
+        hedge_percentile=LLM_HEDGE_PERCENTILE,
+        prefer_fastest=LLM_PREFER_FASTEST,
+    )
+
+
+def set_llm_attributes(
+    usage: Any = None,
+    span: "Span | None" = None,
+    model: str | None = None,
+    result: "GatewayResult | None" = None,
+) -> None:
+    """
+    Describes the LLM call on a span.
 
+    Parameters
+    ----------
+    usage : Any, optional
+        The `usage` object of the completion, by default None.
+    span : opentelemetry.trace.Span | None, optional
+        The span, by default the current one.
+    model : str | None, optional
+        The model that answered, by default the preferred one.
+    result : GatewayResult | None, optional
+        The outcome of the gateway call, whose model takes precedence, by
+        default None.
 
-def query_llm(prompt: str) -> str:
+    Returns
+    -------
+    None
+    """
+    model = model or LLM_MODELS[0]
+    tracing.set_attributes(
+        {
+            "llm.model": result.model if result is not None else model,
+            "llm.temperature": TEMPERATURE,
+            "llm.max_tokens": MAX_TOKENS,
+            "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+            "llm.attempts": getattr(result, "attempts", None),
+            "llm.hedged": getattr(result, "hedged", None),
+        },
+        span,
+    )
+
+
+@tracer.start_as_current_span("query_llm")
+def query_llm(messages: list[dict[str, str]]) -> str:
     """
     Generates an answer using the OpenRouter API.
 
+    LLM_MODELS are tried in order; each is retried by the SDK on transient
+    errors.
+
+    Parameters
+    ----------
+    messages : list[dict[str, str]]
+        The chat messages built by `build_prompt`: the system instructions,
+        then the context and user query.
+
+    Returns
+    -------
+    str
+        The generated text response from the LLM.
+    """
+    for model in LLM_MODELS:
+        try:
+            logger.debug("Sending request to OpenRouter model: %s", model)
+
+            completion = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+            )
+
+            metrics.observe_llm_usage(completion.usage)
+            set_llm_attributes(completion.usage, model=model)
+            answer = completion.choices[0].message.content.strip()
+            logger.debug("LLM query successful.")
+            return answer
+
+        except Exception as e:
+            error = e
+            logger.warning("Failed to query OpenRouter model %s: %s", model, e)
+
+    metrics.LLM_ERRORS.inc()
+    tracing.record_error(error)
+    logger.error("Failed to query OpenRouter: %s", error)
+    return LLM_ERROR_MESSAGE
+
+
+@tracer.start_as_current_span("query_llm")
+async def aquery_llm(messages: list[dict[str, str]]) -> str:
+    """
+    Generates an answer through the LLM gateway without blocking the event loop.
+
     Parameters
     ----------
-    prompt : str
-        The full prompt string containing the system instructions,
-        context, and user query.
+    messages : list[dict[str, str]]
+        The chat messages built by `build_prompt`: the system instructions,
+        then the context and user query.
 
     Returns
     -------
@@ -43,22 +258,83 @@ def query_llm(prompt: str) -> str:
         The generated text response from the LLM.
     """
     try:
-        logger.debug("Sending request to OpenRouter model: %s", MODEL_NAME)
+        logger.debug("Sending async request to OpenRouter models: %s", LLM_MODELS)
 
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-            max_tokens=500,
+        result = await get_gateway().complete(
+            messages, temperature=TEMPERATURE, max_tokens=MAX_TOKENS
         )
+        completion = result.value
 
+        metrics.observe_llm_usage(completion.usage)
+        set_llm_attributes(completion.usage, result=result)
         answer = completion.choices[0].message.content.strip()
-        logger.debug("LLM query successful.")
+        logger.debug("LLM query to %s successful.", result.model)
         return answer
 
     except Exception as e:
+        metrics.LLM_ERRORS.inc()
+        tracing.record_error(e)
         logger.error("Failed to query OpenRouter: %s", e)
-        return "Sorry, I encountered an error while generating the response."
+        return LLM_ERROR_MESSAGE
+
+
+async def stream_llm(messages: list[dict[str, str]]) -> AsyncIterator[str]:
+    """
+    Streams an answer through the LLM gateway token by token.
+
+    Parameters
+    ----------
+    messages : list[dict[str, str]]
+        The chat messages built by `build_prompt`: the system instructions,
+        then the context and user query.
+
+    Yields
+    ------
+    str
+        Incremental pieces of the generated answer, in order.
+
+    Raises
+    ------
+    LLMUnavailableError
+        If no model started answering before the deadline.
+    openai.OpenAIError
+        If the stream fails midway; the caller decides how to report it.
+    """
+    logger.debug("Opening stream to OpenRouter models: %s", LLM_MODELS)
+
+    # not made current: the generator may be closed outside of its context
+    span = tracer.start_span("stream_llm")
+    usage = None
+    result = None
+    try:
+        result = await get_gateway().stream(
+            messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream_options={"include_usage": True},
+        )
+
+        first_token = True
+        async for chunk in result.value:
+            if chunk.usage is not None:
+                usage = chunk.usage
+                metrics.observe_llm_usage(usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    span.add_event("first_token")
+                    first_token = False
+                yield delta
+    except Exception as e:
+        tracing.record_error(e, span)
+        raise
+    finally:
+        set_llm_attributes(usage, span, result=result)
+        span.end()
+
+    logger.debug("LLM stream finished.")
 
 
 def main() -> None:
@@ -77,7 +353,7 @@ def main() -> None:
     None
     """
     logger.info("RAG API script started.")
-    logger.info(f"Using Model: {MODEL_NAME}")
+    logger.info(f"Using Models: {', '.join(LLM_MODELS)}")
 
     while True:
         query = input("\nEnter your query (or 'q' to quit): ").strip()
@@ -97,10 +373,10 @@ def main() -> None:
             continue
 
         text_only_chunks = [chunk["text_chunk"] for chunk in sorted_chunks]
-        prompt = build_prompt(query, text_only_chunks)
+        prompt = build_prompt(query, text_only_chunks, model=LLM_MODELS[0])
 
         print("\nThinking...")
-        answer = query_llm(prompt)
+        answer = query_llm(prompt.messages)
 
         print("\n=== Answer ===")
         print(answer)
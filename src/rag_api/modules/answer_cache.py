@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Caches LLM answers keyed by the embedding of the question.
+
+    A lookup hits when a cached question is at least `similarity_threshold`
+    cosine-similar to the new one and both retrieved exactly the same context
+    chunks. The whole cache is dropped when the index version changes, because
+    answers built on an old index may no longer be correct.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_size: int = 512,
+        ttl: float = 3600.0,
+    ):
+        """
+        Initializes an empty cache.
+
+        Parameters
+        ----------
+        similarity_threshold : float, optional
+            Minimum cosine similarity between questions for a hit, by default 0.95.
+        max_size : int, optional
+            Maximum number of cached answers, by default 512.
+        ttl : float, optional
+            Time to live of a cached answer in seconds, by default 3600.0.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._next_id = 0
+        self._index_version: str | None = None
+
+    @staticmethod
+    def _context_key(chunks: list[dict[str, Any]]) -> frozenset[tuple[str, str]]:
+        """
+        Builds an order-independent key of the retrieved context.
+
+        Parameters
+        ----------
+        chunks : list[dict[str, Any]]
+            The chunks returned by retrieval.
+
+        Returns
+        -------
+        frozenset[tuple[str, str]]
+            The set of (source_url, text_chunk) pairs.
+        """
+        return frozenset(
+            (chunk.get("source_url", ""), chunk["text_chunk"]) for chunk in chunks
+        )
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """
+        Converts an embedding to a unit-length float32 vector.
+
+        Parameters
+        ----------
+        embedding : list[float]
+            The raw embedding.
+
+        Returns
+        -------
+        np.ndarray
+            The normalized vector.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, index_version: str | None) -> None:
+        """
+        Drops all entries if the index version changed. Must be called with the lock held.
+
+        Parameters
+        ----------
+        index_version : str | None
+            The index version the caller is working with.
+        """
+        if index_version != self._index_version:
+            if self._entries:
+                logger.info(
+                    "Index version changed (%s -> %s), invalidating %d cached answers.",
+                    self._index_version,
+                    index_version,
+                    len(self._entries),
+                )
+            self._entries.clear()
+            self._index_version = index_version
+
+    def lookup(
+        self,
+        query_embedding: list[float],
+        chunks: list[dict[str, Any]],
+        index_version: str | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        Returns a cached answer for a near-duplicate question, if there is one.
+
+        Parameters
+        ----------
+        query_embedding : list[float]
+            The embedding of the new question.
+        chunks : list[dict[str, Any]]
+            The chunks retrieved for the new question.
+        index_version : str | None, optional
+            The index version the chunks were retrieved from, by default None.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            A dictionary with 'answer' and 'sources', or None on a miss.
+        """
+        context_key = self._context_key(chunks)
+        query_vector = self._normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version(index_version)
+
+            expired = [k for k, e in self._entries.items() if e["expires_at"] < now]
+            for key in expired:
+                del self._entries[key]
+
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if entry["context_key"] == context_key
+            ]
+            if candidates:
+                matrix = np.stack([entry["vector"] for _, entry in candidates])
+                similarities = matrix @ query_vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    logger.debug(
+                        "Answer cache hit (similarity %.3f).", similarities[best]
+                    )
+                    return {"answer": entry["answer"], "sources": entry["sources"]}
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        query_embedding: list[float],
+        chunks: list[dict[str, Any]],
+        answer: str,
+        sources: list[str],
+        index_version: str | None = None,
+    ) -> None:
+        """
+        Stores an answer for later near-duplicate questions.
+
+        Parameters
+        ----------
+        query_embedding : list[float]
+            The embedding of the question.
+        chunks : list[dict[str, Any]]
+            The chunks the answer was generated from.
+        answer : str
+            The generated answer.
+        sources : list[str]
+            The source URLs returned together with the answer.
+        index_version : str | None, optional
+            The index version the chunks were retrieved from, by default None.
+        """
+        if self.max_size <= 0:
+            return
+
+        entry = {
+            "vector": self._normalize(query_embedding),
+            "context_key": self._context_key(chunks),
+            "answer": answer,
+            "sources": sources,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+
+        with self._lock:
+            self._check_version(index_version)
+
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """
+        Removes all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary with 'size', 'hits', 'misses' and 'hit_rate'.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,733 @@
+"""
+Resilient access to the LLM provider.
+
+Free OpenRouter models regularly stall or answer 429, so every call goes
+through an `LLMGateway` that tries an ordered list of models within one
+deadline: transient errors are retried with jittered backoff, a model that
+keeps failing is skipped by its circuit breaker for a while, and, if enabled,
+a slow call is hedged by firing the next model once the first one exceeds its
+usual (p95) latency. Healthy models with known latency are tried fastest first.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from rag_api.modules import metrics
+from utils.rate_limit import backoff_delay
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised when no model answered before the deadline.
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Tells whether a failed LLM request is worth retrying with the same model.
+
+    Parameters
+    ----------
+    error : BaseException
+        The exception raised by the OpenAI client or by the attempt timeout.
+
+    Returns
+    -------
+    bool
+        True for rate limiting (429), server errors (5xx), timeouts and
+        connection errors.
+    """
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(error, asyncio.TimeoutError | RateLimitError | APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Reads the Retry-After header of a failed response, if present.
+
+    Parameters
+    ----------
+    error : BaseException
+        The exception raised by the OpenAI client.
+
+    Returns
+    -------
+    float | None
+        The number of seconds the server asked to wait, or None.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a model after consecutive failures.
+
+    After `failure_threshold` transient failures in a row the breaker opens and
+    the model is skipped for `cooldown` seconds; then a single probe request is let
+    through, which closes the breaker on success or opens it again on failure.
+    The gateway runs on one event loop, so no locking is needed.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown: float = 30.0):
+        """
+        Initializes a closed breaker.
+
+        Parameters
+        ----------
+        name : str
+            The guarded model, used in log messages.
+        failure_threshold : int, optional
+            Consecutive failures that open the breaker, by default 3.
+        cooldown : float, optional
+            Seconds the breaker stays open before a probe, by default 30.0.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """
+        The breaker state: 'closed', 'open' or 'half_open' (a probe may be sent).
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def is_available(self) -> bool:
+        """
+        Tells whether a request could be sent now, without reserving it.
+
+        Returns
+        -------
+        bool
+            False while the breaker is open or its probe is in flight.
+        """
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def allow(self) -> bool:
+        """
+        Reserves a request; in the half-open state only one is let through.
+
+        Returns
+        -------
+        bool
+            True if the request may be sent.
+        """
+        if not self.is_available():
+            return False
+        if self.state == "half_open":
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        """
+        Closes the breaker.
+
+        Returns
+        -------
+        None
+        """
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """
+        Counts a failure, opening the breaker at the threshold.
+
+        Returns
+        -------
+        None
+        """
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.state == "half_open":
+                logger.warning(
+                    "Circuit of %s opened after %d consecutive failures",
+                    self.name,
+                    self.failures,
+                )
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Gives back a reservation whose request was cancelled before finishing.
+
+        Returns
+        -------
+        None
+        """
+        self._probing = False
+
+
+class LatencyWindow:
+    """
+    The latencies of the most recent successful calls of a model.
+    """
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        """
+        Initializes an empty window.
+
+        Parameters
+        ----------
+        size : int, optional
+            Number of latencies kept, by default 200.
+        min_samples : int, optional
+            Latencies needed before percentiles are reported, by default 20.
+        """
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of recorded latencies.
+
+        Returns
+        -------
+        int
+            The number of samples in the window, at most `size`.
+        """
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        """
+        Adds a latency.
+
+        Parameters
+        ----------
+        seconds : float
+            The duration of the call.
+
+        Returns
+        -------
+        None
+        """
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """
+        Returns a latency percentile.
+
+        Parameters
+        ----------
+        p : float
+            The percentile, between 0 and 100.
+
+        Returns
+        -------
+        float | None
+            The latency in seconds, or None if fewer than `min_samples` calls
+            were recorded.
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+        return float(np.percentile(self._samples, p))
+
+
+@dataclass
+class GatewayResult:
+    """
+    The outcome of a call through the gateway.
+    """
+
+    value: Any
+    model: str
+    attempts: int
+    hedged: bool
+
+
+class LLMGateway:
+    """
+    Sends chat completions to the first model that answers in time.
+
+    Models are tried in order of preference, or fastest first once their
+    latency is known (`prefer_fastest`). A model is retried with jittered
+    backoff on transient errors (429, 5xx, timeouts) and given up on
+    immediately on other errors. Every attempt is bounded by `attempt_timeout`
+    and the whole call by the deadline.
+
+    Latencies are tracked per model and per operation ('complete' measures the
+    whole answer, 'stream' the time to its first chunk), since the two differ
+    by an order of magnitude.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncOpenAI",
+        models: list[str],
+        deadline: float = 60.0,
+        attempt_timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 30.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        prefer_fastest: bool = True,
+        latency_window: int = 200,
+        min_samples: int = 20,
+    ):
+        """
+        Initializes the gateway.
+
+        Parameters
+        ----------
+        client : openai.AsyncOpenAI
+            The shared client; its own retries should be disabled.
+        models : list[str]
+            Model names in order of preference.
+        deadline : float, optional
+            Default time budget of a call in seconds, by default 60.0.
+        attempt_timeout : float, optional
+            Maximum duration of a single attempt in seconds, by default 30.0.
+        max_retries : int, optional
+            Retries of a model after a transient error, by default 2.
+        backoff_base : float, optional
+            Scale of the exponential backoff in seconds, by default 0.5.
+        breaker_failures : int, optional
+            Consecutive transient failures that open a model's breaker, by
+            default 5.
+        breaker_cooldown : float, optional
+            Seconds a model is skipped after its breaker opens, by default 30.0.
+        hedge : bool, optional
+            Whether to fire the next model when an attempt is slow, by default
+            False.
+        hedge_percentile : float, optional
+            The latency percentile after which an attempt is hedged, by
+            default 95.0.
+        prefer_fastest : bool, optional
+            Whether to order healthy models by their median latency, by default
+            True.
+        latency_window : int, optional
+            Latencies kept per model and operation, by default 200.
+        min_samples : int, optional
+            Latencies needed before a model's percentiles are used, by default
+            20.
+
+        Raises
+        ------
+        ValueError
+            If no model is given.
+        """
+        if not models:
+            raise ValueError("At least one model is required.")
+
+        self.client = client
+        self.models = models
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.prefer_fastest = prefer_fastest
+
+        self.breakers = {
+            model: CircuitBreaker(model, breaker_failures, breaker_cooldown)
+            for model in models
+        }
+        self.latencies = {
+            (model, operation): LatencyWindow(latency_window, min_samples)
+            for model in models
+            for operation in ("complete", "stream")
+        }
+
+    def candidates(self, operation: str) -> list[str]:
+        """
+        Returns the models to try, best first.
+
+        Parameters
+        ----------
+        operation : str
+            'complete' or 'stream'.
+
+        Returns
+        -------
+        list[str]
+            The models whose breaker lets requests through; with
+            `prefer_fastest`, models with a known median latency come first,
+            fastest first, followed by the rest in order of preference.
+        """
+        available = [m for m in self.models if self.breakers[m].is_available()]
+        if not self.prefer_fastest:
+            return available
+
+        def sort_key(model: str) -> float:
+            median = self.latencies[(model, operation)].percentile(50)
+            return median if median is not None else float("inf")
+
+        # sorted() is stable, so ties keep the order of preference
+        return sorted(available, key=sort_key)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Describes the state of every model, for health endpoints.
+
+        Returns
+        -------
+        dict[str, dict[str, Any]]
+            The breaker state, the consecutive failures and the number of
+            samples and p50/p95 latency in milliseconds of each operation,
+            keyed by model.
+        """
+        stats = {}
+        for model in self.models:
+            breaker = self.breakers[model]
+            stats[model] = {"breaker": breaker.state, "failures": breaker.failures}
+            for operation in ("complete", "stream"):
+                window = self.latencies[(model, operation)]
+                stats[model][operation] = {
+                    "samples": len(window),
+                    **{
+                        f"p{p}_ms": (
+                            round(value * 1000, 1)
+                            if (value := window.percentile(p)) is not None
+                            else None
+                        )
+                        for p in (50, 95)
+                    },
+                }
+        return stats
+
+    async def complete(
+        self, messages: list[dict[str, str]], deadline: float | None = None, **params
+    ) -> GatewayResult:
+        """
+        Generates a chat completion.
+
+        Parameters
+        ----------
+        messages : list[dict[str, str]]
+            The chat messages.
+        deadline : float | None, optional
+            Time budget in seconds, by default the gateway's.
+        **params
+            Further arguments of `chat.completions.create`, e.g. 'temperature'.
+
+        Returns
+        -------
+        GatewayResult
+            The `ChatCompletion` and the model that produced it.
+
+        Raises
+        ------
+        LLMUnavailableError
+            If no model answered before the deadline.
+        """
+
+        async def call(model: str) -> Any:
+            return await self.client.chat.completions.create(
+                model=model, messages=messages, **params
+            )
+
+        return await self._call("complete", call, deadline)
+
+    async def stream(
+        self, messages: list[dict[str, str]], deadline: float | None = None, **params
+    ) -> GatewayResult:
+        """
+        Opens a streamed chat completion.
+
+        Models are retried and hedged only until the first chunk arrives; the
+        deadline does not limit the rest of the stream, whose errors are
+        raised to the caller.
+
+        Parameters
+        ----------
+        messages : list[dict[str, str]]
+            The chat messages.
+        deadline : float | None, optional
+            Time budget for the first chunk in seconds, by default the
+            gateway's.
+        **params
+            Further arguments of `chat.completions.create`, e.g.
+            'stream_options'.
+
+        Returns
+        -------
+        GatewayResult
+            An async iterator over all `ChatCompletionChunk`s as value, and
+            the model that produced them.
+
+        Raises
+        ------
+        LLMUnavailableError
+            If no model started answering before the deadline.
+        """
+
+        async def call(model: str) -> tuple[Any, Any]:
+            stream = await self.client.chat.completions.create(
+                model=model, messages=messages, stream=True, **params
+            )
+            try:
+                first_chunk = await anext(stream)
+            except BaseException:
+                await stream.close()
+                raise
+            return stream, first_chunk
+
+        async def discard(opened: tuple[Any, Any]) -> None:
+            await opened[0].close()
+
+        result = await self._call("stream", call, deadline, discard)
+        stream, first_chunk = result.value
+
+        async def chunks() -> AsyncIterator[Any]:
+            try:
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.close()
+
+        result.value = chunks()
+        return result
+
+    async def _call(
+        self,
+        operation: str,
+        call: Callable[[str], Awaitable[Any]],
+        deadline: float | None,
+        discard: Callable[[Any], Awaitable[None]] | None = None,
+    ) -> GatewayResult:
+        """
+        Tries the candidate models in turn until one succeeds.
+
+        Parameters
+        ----------
+        operation : str
+            'complete' or 'stream', selecting the latency statistics.
+        call : Callable[[str], Awaitable[Any]]
+            Sends the request to the given model.
+        deadline : float | None
+            Time budget in seconds, or None for the gateway's.
+        discard : Callable[[Any], Awaitable[None]] | None, optional
+            Releases the result of a hedged attempt that lost the race, by
+            default nothing is done.
+
+        Returns
+        -------
+        GatewayResult
+            The first successful result.
+
+        Raises
+        ------
+        LLMUnavailableError
+            If every model failed or the deadline passed.
+        """
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + (self.deadline if deadline is None else deadline)
+        attempts = 0
+        last_error: BaseException | None = None
+
+        candidates = self.candidates(operation)
+        # never refuse every request: the last fallback is tried despite its
+        # open breaker, so the service recovers as soon as the provider does
+        forced = not candidates
+        if forced:
+            candidates = [self.models[-1]]
+            logger.warning(
+                "Every circuit breaker is open, trying %s anyway", candidates[0]
+            )
+
+        for i, model in enumerate(candidates):
+            for retry in range(self.max_retries + 1):
+                remaining = expires_at - loop.time()
+                if remaining <= 0 or not (forced or self.breakers[model].allow()):
+                    break
+                attempts += 1
+                try:
+                    value, used_model, hedged = await self._attempt(
+                        operation, model, candidates[i + 1 :], call, remaining, discard
+                    )
+                    return GatewayResult(value, used_model, attempts, hedged)
+                except Exception as e:
+                    last_error = e
+                    logger.warning("LLM attempt %d (%s) failed: %r", attempts, model, e)
+                    if not is_retryable(e) or retry == self.max_retries:
+                        break
+                    delay = retry_after(e) or backoff_delay(retry, self.backoff_base)
+                    await asyncio.sleep(min(delay, max(expires_at - loop.time(), 0)))
+
+        if loop.time() >= expires_at:
+            message = f"deadline exceeded after {attempts} attempts"
+        else:
+            message = f"all models failed after {attempts} attempts"
+        raise LLMUnavailableError(f"No LLM answered: {message}.") from last_error
+
+    async def _attempt(
+        self,
+        operation: str,
+        model: str,
+        fallbacks: list[str],
+        call: Callable[[str], Awaitable[Any]],
+        remaining: float,
+        discard: Callable[[Any], Awaitable[None]] | None,
+    ) -> tuple[Any, str, bool]:
+        """
+        Sends one attempt, hedged by the next available model if it is slow.
+
+        Parameters
+        ----------
+        operation : str
+            'complete' or 'stream'.
+        model : str
+            The model to call.
+        fallbacks : list[str]
+            The following candidates; the first available one is the hedge.
+        call : Callable[[str], Awaitable[Any]]
+            Sends the request to the given model.
+        remaining : float
+            Seconds left until the deadline.
+        discard : Callable[[Any], Awaitable[None]] | None
+            Releases the result of the losing attempt.
+
+        Returns
+        -------
+        tuple[Any, str, bool]
+            The result, the model that produced it and whether a hedge was
+            fired.
+
+        Raises
+        ------
+        Exception
+            The error of the attempt (of the first one, if both failed).
+        """
+        timeout = min(self.attempt_timeout, remaining)
+        primary = asyncio.ensure_future(self._timed(operation, model, call, timeout))
+        tasks = {primary: model}
+        try:
+            hedge_after = None
+            hedge_model = next(
+                (m for m in fallbacks if self.breakers[m].is_available()), None
+            )
+            if self.hedge and hedge_model is not None:
+                hedge_after = self.latencies[(model, operation)].percentile(
+                    self.hedge_percentile
+                )
+            if hedge_after is None or hedge_after >= timeout:
+                return await primary, model, False
+
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done or not self.breakers[hedge_model].allow():
+                return await primary, model, False
+
+            logger.info(
+                "%s exceeded its p%g of %.0f ms, hedging with %s",
+                model,
+                self.hedge_percentile,
+                hedge_after * 1000,
+                hedge_model,
+            )
+            metrics.LLM_HEDGES.inc()
+            secondary = asyncio.ensure_future(
+                self._timed(operation, hedge_model, call, timeout - hedge_after)
+            )
+            tasks[secondary] = hedge_model
+
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winners = [task for task in done if task.exception() is None]
+                for task in done:
+                    if task.exception() is not None and first_error is None:
+                        first_error = task.exception()
+                if winners:
+                    for loser in winners[1:]:
+                        if discard is not None:
+                            await discard(loser.result())
+                    return winners[0].result(), tasks[winners[0]], True
+            raise first_error
+        finally:
+            # the losing attempt, or both if the caller was cancelled
+            for task in tasks:
+                task.cancel()
+
+    async def _timed(
+        self,
+        operation: str,
+        model: str,
+        call: Callable[[str], Awaitable[Any]],
+        timeout: float,
+    ) -> Any:
+        """
+        Calls a model within a timeout and records the outcome.
+
+        Parameters
+        ----------
+        operation : str
+            'complete' or 'stream'.
+        model : str
+            The model to call.
+        call : Callable[[str], Awaitable[Any]]
+            Sends the request to the given model.
+        timeout : float
+            Maximum duration in seconds.
+
+        Returns
+        -------
+        Any
+            The result of `call`.
+
+        Raises
+        ------
+        TimeoutError
+            If the model did not answer within the timeout.
+        """
+        breaker = self.breakers[model]
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(model), timeout)
+        except asyncio.CancelledError:
+            # the other model of a hedged attempt won: not the model's fault
+            breaker.release()
+            metrics.LLM_ATTEMPTS.labels(model, "cancelled").inc()
+            raise
+        except Exception as e:
+            # only transient errors tell that the model is unhealthy; a bad
+            # request (e.g. a too long context) is the caller's fault
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            metrics.LLM_ATTEMPTS.labels(model, "error").inc()
+            raise
+
+        breaker.record_success()
+        self.latencies[(model, operation)].record(time.perf_counter() - started)
+        metrics.LLM_ATTEMPTS.labels(model, "success").inc()
+        return result
@@ -0,0 +1,179 @@
+"""
+Prometheus metrics of the chat API.
+
+When the API runs with several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR
+to an empty directory shared by them (wiped before every start); each worker
+then writes its samples there and `/metrics` aggregates all of them.
+"""
+
+import logging
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+STAGE_DURATION = Histogram(
+    "chatbot_stage_duration_seconds",
+    "Duration of a stage of answering a question "
+    "(embed, search, rerank_queue, rerank, prompt, llm, llm_first_token).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DURATION = Histogram(
+    "chatbot_request_duration_seconds",
+    "Total duration of a chat request.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "chatbot_llm_tokens",
+    "Tokens of an LLM call reported by the provider (prompt or completion).",
+    ["direction"],
+    buckets=TOKEN_BUCKETS,
+)
+ANSWER_CACHE_LOOKUPS = Counter(
+    "chatbot_answer_cache_lookups_total",
+    "Lookups in the semantic answer cache (hit or miss).",
+    ["result"],
+)
+EMPTY_RETRIEVALS = Counter(
+    "chatbot_empty_retrievals_total",
+    "Questions for which retrieval found no chunks.",
+)
+LLM_ERRORS = Counter(
+    "chatbot_llm_errors_total",
+    "Failed LLM calls.",
+)
+LLM_ATTEMPTS = Counter(
+    "chatbot_llm_attempts_total",
+    "Requests sent to an LLM by the gateway (success, error or cancelled).",
+    ["model", "outcome"],
+)
+LLM_HEDGES = Counter(
+    "chatbot_llm_hedges_total",
+    "Slow LLM requests hedged by a request to the next model.",
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "chatbot_requests_in_progress",
+    "Chat requests being processed.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+COLLECTION_DOCUMENTS = Gauge(
+    "chatbot_collection_documents",
+    "Number of documents in the Chroma collection.",
+    multiprocess_mode="mostrecent",
+)
+
+
+def observe_timings(timings: dict[str, float]) -> None:
+    """
+    Records stage durations measured in milliseconds.
+
+    Parameters
+    ----------
+    timings : dict[str, float]
+        Durations keyed by '<stage>_ms', as filled by `get_top_k_chunks`.
+
+    Returns
+    -------
+    None
+    """
+    for stage, ms in timings.items():
+        STAGE_DURATION.labels(stage.removesuffix("_ms")).observe(ms / 1000)
+
+
+def observe_llm_usage(usage: Any) -> None:
+    """
+    Records the token counts of an LLM call.
+
+    Parameters
+    ----------
+    usage : Any
+        The `usage` object of an OpenAI chat completion, or None if the
+        provider did not report it.
+
+    Returns
+    -------
+    None
+    """
+    if usage is None:
+        return
+    if usage.prompt_tokens is not None:
+        LLM_TOKENS.labels("prompt").observe(usage.prompt_tokens)
+    if usage.completion_tokens is not None:
+        LLM_TOKENS.labels("completion").observe(usage.completion_tokens)
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[None]:
+    """
+    Counts a request as in progress and records its total duration.
+
+    Parameters
+    ----------
+    endpoint : str
+        The endpoint label, e.g. 'chat' or 'chat_stream'.
+
+    Yields
+    ------
+    None
+    """
+    in_progress = REQUESTS_IN_PROGRESS.labels(endpoint)
+    in_progress.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+        in_progress.dec()
+
+
+def render() -> bytes:
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Returns
+    -------
+    bytes
+        The metrics of this process, or of all worker processes if
+        PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return generate_latest(registry)
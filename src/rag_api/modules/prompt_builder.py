@@ -1,110 +1,294 @@
-import logging
-
-logger = logging.getLogger(__name__)
-
-ERROR_PROMPT = (
-    "Przepraszamy, wystąpił wewnętrzny błąd podczas tworzenia zapytania. "
-    "Prosimy spróbować ponownie później."
-)
-
-STATIC_FAQ = (
-    "Wiedza ogólna i najczęstsze pytania (użyj tych informacji, jeśli brak ich w Kontekście):\n"
-    "- Władze Wydziału: Dziekan: prof. dr hab. Grzegorz Świątek "
-    "Prodziekan ds. Studenckich: dr hab. inż. Agata Pilitowska, prof. uczelni "
-    "Prodziekan ds. Nauczania: dr inż. Krzysztof Kaczmarski "
-    "Prodziekan ds. Nauki: prof. dr hab. Janina Kotus "
-    "Prodziekan ds. Ogólnych: dr hab. Wojciech Matysiak, prof. uczelni "
-    "Pełna lista: [dziekani] https://ww2.mini.pw.edu.pl/wydzial/dziekani/.\n"
-    "- Kierunki studiów I stopnia (inżynierskie/licencjackie): "
-    "1. Informatyka i Systemy Informacyjne (ISI), "
-    "2. Inżynieria i Analiza Danych (IAD), "
-    "3. Matematyka, "
-    "4. Matematyka i Analiza Danych (MAD), "
-    "5. Computer Science (studia w j. angielskim).\n"
-    "- Kierunki studiów II stopnia (magisterskie): "
-    "1. Informatyka i Systemy Informacyjne (ISI), "
-    "2. Matematyka, "
-    "3. Matematyka i Analiza Danych, "
-    "4. Data Science (studia w j. angielskim).\n"
-    "- Godziny otwarcia dziekanatu: PONIEDZIAŁEK, WTOREK, CZWARTEK, PIĄTEK 11:00-14:00, ŚRODA NIECZYNNE\n"
-    "- Harmonogram roku akademickiego i sesji: Sprawdź aktualny kalendarz akademicki na stronie uczelni. https://www.pw.edu.pl/studia/harmonogram-roku-akademickiego \n"
-    "- Punkty ECTS: Szczegóły w regulaminie. https://ww2.mini.pw.edu.pl/wp-content/uploads/Warunki-rejestracji-na-kolejny-semestr-rok-studiow-22.11.2023.pdf \n"
-    "- Oferta przedmiotów obieralnych: Zależy od kierunku, dostępne w systemie USOS. https://ww2.mini.pw.edu.pl/wp-content/uploads/katalog-obieralne-2023.pdf \n"
-    "- Wydarzenia wydziałowe: Śledź stronę wydziału i samorządu. https://ww2.mini.pw.edu.pl/ https://www.facebook.com/wrsminipw?locale=pl_PL \n"
-)
-
-
-def build_prompt(
-    query: str,
-    context: list[str],
-    field_of_study: str | None = None,
-    semester: str | None = None,
-) -> str:
-    """
-    Builds a prompt for the LLM based on the provided user query and context.
-
-    Constructs a formatted string including system instructions, static FAQ knowledge,
-    retrieved context chunks, and optional student metadata (field of study, semester).
-
-    Parameters
-    ----------
-    query : str
-        The user's question or input.
-    context : list[str]
-        A list of text chunks retrieved from the vector database.
-    field_of_study : str | None, optional
-        The student's field of study (e.g., "Informatyka"), by default None.
-    semester : str | None, optional
-        The student's current semester, by default None.
-
-    Returns
-    -------
-    str
-        The fully formatted prompt string ready to be sent to the LLM.
-    """
-    logger.info(
-        "Building prompt for query: '%s', Field: %s, Sem: %s",
-        query,
-        field_of_study,
-        semester,
-    )
-
-    try:
-        labeled = [f"[S{i}]\n{c}" for i, c in enumerate(context, start=1)]
-        joined_context = "\n\n---\n\n".join(labeled)
-
-        logger.debug("Joined %d context chunks into prompt.", len(labeled))
-
-        student_info = ""
-        if field_of_study and semester:
-            student_info = (
-                f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}', "
-                f"semestr {semester}. Wykorzystaj tę wiedzę przy pytaniach o plan zajęć, "
-                "przedmioty, sale wykładowe lub egzaminy."
-            )
-        elif field_of_study:
-            student_info = f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}'."
-
-        prompt = (
-            "Jesteś pomocnym asystentem o imieniu MiNIonek. Odpowiadasz na pytania studentów i pracowników Wydziału Matematyki i Nauk Informacyjnych (MiNI).\n"
-            "ZASADY ODPOWIADANIA:\n"
-            "1. Priorytetyzacja wiedzy: Opieraj swoją odpowiedź głównie na informacjach z sekcji 'Kontekst'. Wybierz z niej maksymalnie 5 najbardziej trafnych fragmentów [Sx] i na nich zbuduj odpowiedź."
-            "Jeśli nie znajdziesz tam odpowiedzi, sprawdź sekcję 'Wiedza ogólna'. "
-            "Możesz korzystać z własnej wiedzy tylko wtedy, gdy informacji brakuje w obu powyższych źródłach.\n"
-            "2. Styl: Odpowiadaj krótko, rzeczowo i po polsku.\n"
-            "3. Cytowanie: Każde stwierdzenie oparte na sekcji 'Kontekst' popieraj odwołaniem [Sx] w treści wypowiedzi.\n"
-            "4. Lista źródeł: W sekcji 'Źródła' wymień tylko te identyfikatory, które faktycznie zostały użyte do udzielenia odpowiedzi (maksymalnie 5 najważniejszych)."
-            "które zostały faktycznie użyte w odpowiedzi. Nie wymieniaj wszystkich dostępnych chunków.\n\n"
-            f"{student_info}\n\n"
-            f"---\n{STATIC_FAQ}\n---\n\n"
-            f"---\nKontekst:\n{joined_context}\n---\n\n"
-            f"Pytanie: {query}\n\n"
-            "Odpowiedź:"
-        )
-
-        logger.info("Prompt built successfully.")
-        return prompt
-
-    except Exception as e:
-        logger.error("Failed to build prompt: %s", e, exc_info=True)
-        return ERROR_PROMPT
+import functools
+import logging
+import os
+from dataclasses import dataclass, field
+
+import tiktoken
+
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
+
+# maximum number of tokens spent on retrieved context chunks
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("PROMPT_CONTEXT_TOKENS", 2000))
+FALLBACK_ENCODING = "o200k_base"
+# rough ratio used when no tokenizer can be loaded
+CHARS_PER_TOKEN = 4
+
+ERROR_PROMPT = (
+    "Przepraszamy, wystąpił wewnętrzny błąd podczas tworzenia zapytania. "
+    "Prosimy spróbować ponownie później."
+)
+
+STATIC_FAQ = (
+    "Wiedza ogólna i najczęstsze pytania (użyj tych informacji, jeśli brak ich w Kontekście):\n"
+    "- Władze Wydziału: Dziekan: prof. dr hab. Grzegorz Świątek "
+    "Prodziekan ds. Studenckich: dr hab. inż. Agata Pilitowska, prof. uczelni "
+    "Prodziekan ds. Nauczania: dr inż. Krzysztof Kaczmarski "
+    "Prodziekan ds. Nauki: prof. dr hab. Janina Kotus "
+    "Prodziekan ds. Ogólnych: dr hab. Wojciech Matysiak, prof. uczelni "
+    "Pełna lista: [dziekani] https://ww2.mini.pw.edu.pl/wydzial/dziekani/.\n"
+    "- Kierunki studiów I stopnia (inżynierskie/licencjackie): "
+    "1. Informatyka i Systemy Informacyjne (ISI), "
+    "2. Inżynieria i Analiza Danych (IAD), "
+    "3. Matematyka, "
+    "4. Matematyka i Analiza Danych (MAD), "
+    "5. Computer Science (studia w j. angielskim).\n"
+    "- Kierunki studiów II stopnia (magisterskie): "
+    "1. Informatyka i Systemy Informacyjne (ISI), "
+    "2. Matematyka, "
+    "3. Matematyka i Analiza Danych, "
+    "4. Data Science (studia w j. angielskim).\n"
+    "- Godziny otwarcia dziekanatu: PONIEDZIAŁEK, WTOREK, CZWARTEK, PIĄTEK 11:00-14:00, ŚRODA NIECZYNNE\n"
+    "- Harmonogram roku akademickiego i sesji: Sprawdź aktualny kalendarz akademicki na stronie uczelni. https://www.pw.edu.pl/studia/harmonogram-roku-akademickiego \n"
+    "- Punkty ECTS: Szczegóły w regulaminie. https://ww2.mini.pw.edu.pl/wp-content/uploads/Warunki-rejestracji-na-kolejny-semestr-rok-studiow-22.11.2023.pdf \n"
+    "- Oferta przedmiotów obieralnych: Zależy od kierunku, dostępne w systemie USOS. https://ww2.mini.pw.edu.pl/wp-content/uploads/katalog-obieralne-2023.pdf \n"
+    "- Wydarzenia wydziałowe: Śledź stronę wydziału i samorządu. https://ww2.mini.pw.edu.pl/ https://www.facebook.com/wrsminipw?locale=pl_PL \n"
+)
+
+
+SYSTEM_PROMPT = (
+    "Jesteś pomocnym asystentem o imieniu MiNIonek. Odpowiadasz na pytania studentów i pracowników Wydziału Matematyki i Nauk Informacyjnych (MiNI).\n"
+    "ZASADY ODPOWIADANIA:\n"
+    "1. Priorytetyzacja wiedzy: Opieraj swoją odpowiedź głównie na informacjach z sekcji 'Kontekst'. Wybierz z niej maksymalnie 5 najbardziej trafnych fragmentów [Sx] i na nich zbuduj odpowiedź."
+    "Jeśli nie znajdziesz tam odpowiedzi, sprawdź sekcję 'Wiedza ogólna'. "
+    "Możesz korzystać z własnej wiedzy tylko wtedy, gdy informacji brakuje w obu powyższych źródłach.\n"
+    "2. Styl: Odpowiadaj krótko, rzeczowo i po polsku.\n"
+    "3. Cytowanie: Każde stwierdzenie oparte na sekcji 'Kontekst' popieraj odwołaniem [Sx] w treści wypowiedzi.\n"
+    "4. Lista źródeł: W sekcji 'Źródła' wymień tylko te identyfikatory, które faktycznie zostały użyte do udzielenia odpowiedzi (maksymalnie 5 najważniejszych)."
+    "które zostały faktycznie użyte w odpowiedzi. Nie wymieniaj wszystkich dostępnych chunków.\n\n"
+    f"---\n{STATIC_FAQ}---"
+)
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class PromptAssembly:
+    """
+    Chat messages sent to the LLM together with their token accounting.
+
+    Attributes
+    ----------
+    messages : list[dict[str, str]]
+        The chat messages: the invariant system message (rules and FAQ) first,
+        so providers can cache it as a prefix, then the user message.
+    num_chunks : int
+        How many of the leading context chunks fit into the token budget.
+    section_tokens : dict[str, int]
+        Number of tokens of every prompt section ('system', 'student_info',
+        'context', 'question') and their 'total'.
+    """
+
+    messages: list[dict[str, str]]
+    num_chunks: int = 0
+    section_tokens: dict[str, int] = field(default_factory=dict)
+
+
+@functools.cache
+def get_encoding(model: str | None) -> tiktoken.Encoding | None:
+    """
+    Returns the tokenizer of a model, falling back to o200k_base.
+
+    Parameters
+    ----------
+    model : str | None
+        The model name, e.g. "openai/gpt-oss-20b:free"; a provider prefix is ignored.
+
+    Returns
+    -------
+    tiktoken.Encoding | None
+        The encoding, or None if no encoding could be loaded.
+    """
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model.split("/")[-1].split(":")[0])
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning("Couldn't load a tokenizer, estimating token counts: %s", e)
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """
+    Counts the tokens of a text for the given model.
+
+    Parameters
+    ----------
+    text : str
+        The text to count.
+    model : str | None, optional
+        The target model, by default None (o200k_base).
+
+    Returns
+    -------
+    int
+        The number of tokens, estimated from the length if no tokenizer is available.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    """
+    Cuts a text down to at most `max_tokens` tokens of the given model.
+
+    Parameters
+    ----------
+    text : str
+        The text to truncate.
+    max_tokens : int
+        The maximum number of tokens to keep.
+    model : str | None, optional
+        The target model, by default None (o200k_base).
+
+    Returns
+    -------
+    str
+        The beginning of the text, estimated from the length if no tokenizer is available.
+    """
+    max_tokens = max(max_tokens, 0)
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+@tracer.start_as_current_span("build_prompt")
+def build_prompt(
+    query: str,
+    context: list[str],
+    field_of_study: str | None = None,
+    semester: str | None = None,
+    model: str | None = None,
+    context_budget: int = CONTEXT_TOKEN_BUDGET,
+) -> PromptAssembly:
+    """
+    Builds the chat messages for the LLM based on the user query and context.
+
+    The rules and static FAQ knowledge form a system message that is identical
+    for every request. The user message holds the optional student metadata
+    (field of study, semester), the retrieved context chunks and the question.
+    Chunks are packed in order until the next one would exceed `context_budget`
+    tokens of the target model. A top chunk that alone exceeds the budget is
+    truncated to fit, so the context is never empty.
+
+    Parameters
+    ----------
+    query : str
+        The user's question or input.
+    context : list[str]
+        A list of text chunks retrieved from the vector database, best first.
+    field_of_study : str | None, optional
+        The student's field of study (e.g., "Informatyka"), by default None.
+    semester : str | None, optional
+        The student's current semester, by default None.
+    model : str | None, optional
+        The model whose tokenizer is used for counting, by default None (o200k_base).
+    context_budget : int, optional
+        Maximum number of context tokens, by default PROMPT_CONTEXT_TOKENS.
+
+    Returns
+    -------
+    PromptAssembly
+        The messages, the number of packed chunks and the tokens per section.
+    """
+    logger.info(
+        "Building prompt for query: '%s', Field: %s, Sem: %s",
+        query,
+        field_of_study,
+        semester,
+    )
+
+    try:
+        labeled = []
+        context_tokens = 0
+        for i, chunk in enumerate(context, start=1):
+            block = f"[S{i}]\n{chunk}"
+            block_tokens = count_tokens(
+                block if not labeled else CHUNK_SEPARATOR + block, model
+            )
+            if context_tokens + block_tokens > context_budget:
+                if labeled:
+                    break
+                label = f"[S{i}]\n"
+                chunk = truncate_tokens(
+                    chunk, context_budget - count_tokens(label, model), model
+                )
+                block = label + chunk
+                block_tokens = count_tokens(block, model)
+                logger.info(
+                    "Top chunk exceeds the context budget of %d tokens, truncated it.",
+                    context_budget,
+                )
+            labeled.append(block)
+            context_tokens += block_tokens
+
+        if len(labeled) < len(context):
+            logger.info(
+                "Context budget of %d tokens fits %d of %d chunks.",
+                context_budget,
+                len(labeled),
+                len(context),
+            )
+
+        joined_context = CHUNK_SEPARATOR.join(labeled)
+
+        logger.debug("Joined %d context chunks into prompt.", len(labeled))
+
+        student_info = ""
+        if field_of_study and semester:
+            student_info = (
+                f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}', "
+                f"semestr {semester}. Wykorzystaj tę wiedzę przy pytaniach o plan zajęć, "
+                "przedmioty, sale wykładowe lub egzaminy."
+            )
+        elif field_of_study:
+            student_info = f"Informacja o użytkowniku: Użytkownik studiuje na kierunku '{field_of_study}'."
+
+        question = f"Pytanie: {query}\n\nOdpowiedź:"
+        user_prompt = (
+            f"{student_info}\n\n"
+            f"---\nKontekst:\n{joined_context}\n---\n\n"
+            f"{question}"
+        )
+
+        section_tokens = {
+            "system": count_tokens(SYSTEM_PROMPT, model),
+            "student_info": count_tokens(student_info, model),
+            "context": context_tokens,
+            "question": count_tokens(question, model),
+        }
+        section_tokens["total"] = section_tokens["system"] + count_tokens(
+            user_prompt, model
+        )
+
+        tracing.set_attributes(
+            {
+                "prompt.model": model,
+                "prompt.chunks_offered": len(context),
+                "prompt.chunks_used": len(labeled),
+                "prompt.context_budget": context_budget,
+                **{f"prompt.tokens.{k}": v for k, v in section_tokens.items()},
+            }
+        )
+        logger.info("Prompt built successfully. Tokens: %s", section_tokens)
+        return PromptAssembly(
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            num_chunks=len(labeled),
+            section_tokens=section_tokens,
+        )
+
+    except Exception as e:
+        tracing.record_error(e)
+        logger.error("Failed to build prompt: %s", e, exc_info=True)
+        return PromptAssembly(messages=[{"role": "user", "content": ERROR_PROMPT}])
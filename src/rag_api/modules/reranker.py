@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class Reranker:
+    """
+    Reorders retrieved chunks by the relevance score of a cross-encoder.
+
+    The (query, chunk) pairs are scored on CPU in small batches by a pool of
+    background workers. Scoring has a hard time budget, counted from when a
+    worker picks the query up, so waiting behind concurrent queries does not
+    use it up; the wait itself is capped separately. If either limit is
+    exceeded, `rerank` returns None so the caller keeps the original order,
+    and the worker drops the remaining batches.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        batch_size: int = 8,
+        budget_ms: float = 300.0,
+        workers: int = 1,
+        max_queue_ms: float = 300.0,
+    ):
+        """
+        Loads the cross-encoder model.
+
+        Parameters
+        ----------
+        model_name : str, optional
+            The Hugging Face cross-encoder model, by default a multilingual
+            MiniLM trained on mMARCO (handles Polish).
+        batch_size : int, optional
+            Number of pairs scored per forward pass, by default 8.
+        budget_ms : float, optional
+            Maximum time spent on scoring one query, by default 300.0.
+        workers : int, optional
+            Number of queries scored concurrently, by default 1; should match
+            the expected number of concurrent requests the CPU can serve.
+        max_queue_ms : float, optional
+            Maximum time a query waits for a free worker, by default 300.0.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.max_queue_ms = max_queue_ms
+
+        # imported here because it pulls in torch, which takes seconds
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="reranker"
+        )
+
+    def _score(
+        self,
+        query: str,
+        texts: list[str],
+        started: threading.Event,
+        cancelled: threading.Event,
+    ) -> list[float]:
+        """
+        Scores the texts against the query batch by batch.
+
+        Parameters
+        ----------
+        query : str
+            The user's search query.
+        texts : list[str]
+            The candidate chunks.
+        started : threading.Event
+            Set when a worker starts scoring, which starts the budget.
+        cancelled : threading.Event
+            Set by the caller when the budget or the queue wait ran out.
+
+        Returns
+        -------
+        list[float]
+            The relevance scores, or the scores computed before cancellation.
+        """
+        started.set()
+        scores: list[float] = []
+        for i in range(0, len(texts), self.batch_size):
+            if cancelled.is_set():
+                break
+            pairs = [(query, text) for text in texts[i : i + self.batch_size]]
+            scores.extend(float(s) for s in self.model.predict(pairs))
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        chunks: list[dict[str, Any]],
+        top_n: int,
+        timings: dict[str, float] | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """
+        Returns the `top_n` chunks most relevant to the query.
+
+        Parameters
+        ----------
+        query : str
+            The user's search query.
+        chunks : list[dict[str, Any]]
+            Candidate chunks with a 'text_chunk' key.
+        top_n : int
+            The number of chunks to keep.
+        timings : dict[str, float] | None, optional
+            If given, filled with the time spent waiting for a worker in
+            milliseconds ('rerank_queue_ms'), by default None.
+
+        Returns
+        -------
+        list[dict[str, Any]] | None
+            The best chunks ordered by score, or None if no worker was free in
+            time, the time budget was exceeded or scoring failed.
+        """
+        if not chunks:
+            return []
+
+        texts = [chunk["text_chunk"] for chunk in chunks]
+        started, cancelled = threading.Event(), threading.Event()
+        submitted = time.perf_counter()
+        future = self._executor.submit(self._score, query, texts, started, cancelled)
+
+        waited = started.wait(timeout=self.max_queue_ms / 1000)
+        queue_ms = (time.perf_counter() - submitted) * 1000
+        if timings is not None:
+            timings["rerank_queue_ms"] = queue_ms
+        if not waited:
+            cancelled.set()
+            future.cancel()
+            logger.warning(
+                "No reranker worker was free within %.0f ms, keeping the original order.",
+                self.max_queue_ms,
+            )
+            return None
+
+        scoring_started = time.perf_counter()
+        try:
+            scores = future.result(timeout=self.budget_ms / 1000)
+        except FutureTimeoutError:
+            cancelled.set()
+            logger.warning(
+                "Reranking %d chunks exceeded the %.0f ms budget, keeping the original order.",
+                len(chunks),
+                self.budget_ms,
+            )
+            return None
+        except Exception as e:
+            logger.error("Reranking failed: %s", e, exc_info=True)
+            return None
+
+        logger.debug(
+            "Reranked %d chunks in %.1f ms after %.1f ms in the queue",
+            len(chunks),
+            (time.perf_counter() - scoring_started) * 1000,
+            queue_ms,
+        )
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+        return [chunks[i] for i in order[:top_n]]
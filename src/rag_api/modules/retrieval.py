@@ -1,26 +1,268 @@
+import functools
 import logging
 import os
-from typing import Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
 
-from data_ingest.modules.embedder import Embedder
-from data_ingest.modules.vector_db import load_vector_db
+from data_ingest.modules.embedder import CachedEmbedder, Embedder
+from data_ingest.modules.embedding_batcher import EmbeddingBatcher
+from data_ingest.modules.lexical_index import LexicalIndexManager, get_fact_sources
+from data_ingest.modules.remote_embedder import RemoteEmbedder
+from rag_api.modules.reranker import DEFAULT_RERANK_MODEL, Reranker
+from utils import tracing
 from utils.paths import get_data_dir
 
+if TYPE_CHECKING:
+    from chromadb.api.models.Collection import Collection
+
+    from data_ingest.modules.vector_db import CollectionManager
+
 logger = logging.getLogger(__name__)
 
 DATABASE_PATH = os.environ.get("CHROMA_DIR", get_data_dir("chroma_db"))
+RELOAD_CHECK_INTERVAL = float(os.environ.get("CHROMA_RELOAD_INTERVAL", 5.0))
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 2048))
+EMBEDDING_CACHE_TTL = float(os.environ.get("EMBEDDING_CACHE_TTL", 3600.0))
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", 32))
+EMBEDDING_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_MAX_WAIT_MS", 2.0))
+EMBEDDING_BATCH_WORKERS = int(os.environ.get("EMBEDDING_BATCH_WORKERS", 1))
+# e.g. "unix:///run/embedder/embedder.sock"; empty to load the model in-process
+EMBEDDER_URL = os.environ.get("EMBEDDER_URL", "")
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+# results taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.environ.get("RRF_K", 60))
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+# candidates fetched for reranking and chunks kept after it
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 20))
+RERANK_TOP_N = int(os.environ.get("RERANK_TOP_N", 3))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", 8))
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", 300.0))
+# queries scored concurrently, and the longest wait for a free worker
+RERANK_WORKERS = int(os.environ.get("RERANK_WORKERS", 1))
+RERANK_MAX_QUEUE_MS = float(os.environ.get("RERANK_MAX_QUEUE_MS", 300.0))
+
+lexical_executor = ThreadPoolExecutor(thread_name_prefix="lexical-search")
+tracer = tracing.get_tracer(__name__)
+
+# models are loaded on first use (or by the API warm-up), never at import
+_load_lock = threading.Lock()
+
+
+def get_collection_manager() -> "CollectionManager":
+    """
+    Returns the shared manager of the Chroma collection.
+
+    Chroma is imported on the first call, so importing this module stays cheap.
+
+    Returns
+    -------
+    CollectionManager
+        The process-wide manager for DATABASE_PATH.
+    """
+    from data_ingest.modules import vector_db
+
+    return vector_db.get_collection_manager(DATABASE_PATH, RELOAD_CHECK_INTERVAL)
+
+
+@functools.cache
+def _load_lexical_index_manager() -> LexicalIndexManager:
+    """Creates the lexical index manager; called once."""
+    return LexicalIndexManager(DATABASE_PATH)
+
+
+def get_lexical_index_manager() -> LexicalIndexManager:
+    """
+    Returns the shared manager of the BM25 index.
+
+    Returns
+    -------
+    LexicalIndexManager
+        The process-wide manager for DATABASE_PATH.
+    """
+    with _load_lock:
+        return _load_lexical_index_manager()
+
+
+@functools.cache
+def _load_embedder() -> CachedEmbedder:
+    """Creates the query embedder; called once."""
+    if EMBEDDER_URL:
+        # the model lives in the shared embedding service, which also batches
+        logger.info("Using the embedding service at %s", EMBEDDER_URL)
+        base_embedder = RemoteEmbedder(EMBEDDER_URL)
+    else:
+        logger.info("Loading Embedder model for retrieval...")
+        base_embedder = EmbeddingBatcher(
+            Embedder(),
+            max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+            max_wait_ms=EMBEDDING_MAX_WAIT_MS,
+            num_workers=EMBEDDING_BATCH_WORKERS,
+        )
+        logger.info("Embedder loaded.")
+    return CachedEmbedder(base_embedder, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL)
+
+
+def get_embedder() -> CachedEmbedder:
+    """
+    Returns the shared query embedder, loading the model on the first call.
+
+    Returns
+    -------
+    CachedEmbedder
+        The cached embedder backed by the local model or the embedding service.
+    """
+    with _load_lock:
+        return _load_embedder()
+
+
+@functools.cache
+def _load_reranker() -> Reranker | None:
+    """Creates the reranker if enabled; called once."""
+    if not RERANK_ENABLED:
+        return None
+    logger.info("Loading reranker model %s...", RERANK_MODEL)
+    reranker = Reranker(
+        RERANK_MODEL,
+        RERANK_BATCH_SIZE,
+        RERANK_BUDGET_MS,
+        workers=RERANK_WORKERS,
+        max_queue_ms=RERANK_MAX_QUEUE_MS,
+    )
+    logger.info("Reranker loaded.")
+    return reranker
+
+
+def get_reranker() -> Reranker | None:
+    """
+    Returns the shared reranker, loading the model on the first call.
+
+    Returns
+    -------
+    Reranker | None
+        The reranker, or None if RERANK_ENABLED is not set.
+    """
+    with _load_lock:
+        return _load_reranker()
+
+
+def embed_query(query: str) -> list[float]:
+    """
+    Generates the (cached) embedding of a user query.
+
+    Parameters
+    ----------
+    query : str
+        The user's search query.
 
-logger.info("Loading Embedder model for retrieval...")
-embedder = Embedder()
-logger.info("Embedder loaded.")
+    Returns
+    -------
+    list[float]
+        The query embedding.
+    """
+    return get_embedder().generate_embedding(query)
 
 
-def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
+def dense_search(
+    vector_db: "Collection", query_embedding: list[float], top_k: int
+) -> list[dict[str, Any]]:
+    """
+    Finds the chunks closest to the query embedding in the vector database.
+
+    Parameters
+    ----------
+    vector_db : chromadb.api.models.Collection.Collection
+        The collection to search.
+    query_embedding : list[float]
+        The query embedding.
+    top_k : int
+        The number of results.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Results ordered by similarity, each with 'id', 'text_chunk', 'source_url'
+        and 'sources'.
+    """
+    results = vector_db.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k,
+        include=["documents", "metadatas"],
+    )
+
+    if not results["documents"] or not results["documents"][0]:
+        return []
+
+    return [
+        {
+            "id": doc_id,
+            "text_chunk": doc,
+            "source_url": meta.get("url", "Unknown Source"),
+            "sources": get_fact_sources(meta),
+        }
+        for doc_id, doc, meta in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            strict=False,
+        )
+    ]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[dict[str, Any]]], k: int = RRF_K
+) -> list[dict[str, Any]]:
+    """
+    Merges ranked result lists with reciprocal-rank fusion.
+
+    Every result scores 1 / (k + rank) in each list it appears in; results are
+    identified by their 'id' and ordered by the summed score.
+
+    Parameters
+    ----------
+    rankings : list[list[dict[str, Any]]]
+        Result lists, each ordered from best to worst.
+    k : int, optional
+        Rank offset damping the influence of top positions, by default RRF_K.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        The fused results, best first.
+    """
+    scores: dict[str, float] = {}
+    results: dict[str, dict[str, Any]] = {}
+
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            doc_id = result["id"]
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            results.setdefault(doc_id, result)
+
+    return [results[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)]
+
+
+@tracer.start_as_current_span("get_top_k_chunks")
+def get_top_k_chunks(
+    query: str,
+    top_k: int = 5,
+    query_embedding: list[float] | None = None,
+    timings: dict[str, float] | None = None,
+) -> list[dict[str, Any]]:
     """
     Retrieves the top-k most relevant text chunks from the vector database.
 
-    Connects to the ChromaDB, generates an embedding for the user query,
-    and performs a similarity search to find the most relevant documents.
+    Uses the shared ChromaDB collection, generates an embedding for the user query,
+    and performs a similarity search to find the most relevant documents. With
+    HYBRID_SEARCH enabled and a BM25 index available, a lexical search runs in
+    parallel and both result lists are merged with reciprocal-rank fusion.
+    With RERANK_ENABLED, RERANK_CANDIDATES chunks are fetched and a
+    cross-encoder keeps the best RERANK_TOP_N of them (at most `top_k`); if it
+    exceeds RERANK_BUDGET_MS (or waits longer than RERANK_MAX_QUEUE_MS for a
+    free worker), the first `top_k` chunks in retrieval order are used.
 
     Parameters
     ----------
@@ -28,6 +270,12 @@ def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
         The user's search query.
     top_k : int, optional
         The number of top results to retrieve, by default 5.
+    query_embedding : list[float] | None, optional
+        A precomputed embedding of the query, by default None (computed here).
+    timings : dict[str, float] | None, optional
+        If given, filled with the duration of each stage in milliseconds
+        ('embed_ms', 'search_ms', 'rerank_queue_ms', 'rerank_ms'), by default
+        None.
 
     Returns
     -------
@@ -35,41 +283,95 @@ def get_top_k_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
         A list of dictionaries, where each dictionary contains:
         - 'text_chunk': The text content of the retrieved document.
         - 'source_url': The URL source of the document.
+        - 'sources': Every source URL of the fact, including those of the
+          near-duplicates merged into it at ingest time.
     """
     logger.info("Starting retrieval for top %d chunks. Query: '%s'", top_k, query)
 
     try:
-        logger.debug("Loading vector database from: %s", DATABASE_PATH)
-        vector_db = load_vector_db(DATABASE_PATH)
-
-        logger.debug("Generating embedding for query...")
-        # Embedder expects a list of strings and returns a list of vectors
-        query_embedding = embedder.generate_embeddings([query])
+        collection_manager = get_collection_manager()
+        vector_db = collection_manager.get_collection()
+        lexical_index = (
+            get_lexical_index_manager().get_index(collection_manager.version)
+            if HYBRID_SEARCH
+            else None
+        )
+        reranker = get_reranker()
 
-        logger.debug("Querying vector database...")
-        results = vector_db.query(
-            query_embeddings=query_embedding,
-            n_results=top_k,
-            include=["documents", "metadatas"],
+        fetch_k = max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+        tracing.set_attributes(
+            {
+                "retrieval.top_k": top_k,
+                "retrieval.fetch_k": fetch_k,
+                "retrieval.hybrid": lexical_index is not None,
+                "retrieval.rerank": reranker is not None,
+                "index.version": collection_manager.version,
+            }
         )
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
 
-        structured_results = []
+        lexical_future = None
+        candidates = fetch_k
+        if lexical_index is not None:
+            # the lexical search overlaps with embedding and the dense query
+            candidates = max(fetch_k, HYBRID_CANDIDATES)
+            lexical_future = lexical_executor.submit(
+                lexical_index.search, query, candidates
+            )
 
-        if results["documents"] and results["documents"][0]:
-            documents = results["documents"][0]
-            metadatas = results["metadatas"][0]
+        if query_embedding is None:
+            logger.debug("Generating embedding for query...")
+            with tracer.start_as_current_span("embed_query"):
+                query_embedding = embed_query(query)
+            logger.debug("Embedding cache stats: %s", get_embedder().stats())
+            timings["embed_ms"] = (time.perf_counter() - started) * 1000
 
-            for doc, meta in zip(documents, metadatas, strict=False):
-                structured_results.append(
+        search_started = time.perf_counter()
+        logger.debug("Querying vector database...")
+        with tracer.start_as_current_span("search"):
+            results = dense_search(vector_db, query_embedding, candidates)
+            tracing.set_attributes({"retrieval.dense_results": len(results)})
+
+            if lexical_future is not None:
+                lexical_results = lexical_future.result()
+                tracing.set_attributes(
+                    {"retrieval.lexical_results": len(lexical_results)}
+                )
+                results = reciprocal_rank_fusion([results, lexical_results])
+                results = results[:fetch_k]
+        timings["search_ms"] = (time.perf_counter() - search_started) * 1000
+
+        if reranker is not None:
+            rerank_started = time.perf_counter()
+            with tracer.start_as_current_span("rerank"):
+                reranked = reranker.rerank(
+                    query, results, min(top_k, RERANK_TOP_N), timings
+                )
+                tracing.set_attributes(
                     {
-                        "text_chunk": doc,
-                        "source_url": meta.get("url", "Unknown Source"),
+                        "rerank.candidates": len(results),
+                        "rerank.within_budget": reranked is not None,
+                        "rerank.queue_ms": timings.get("rerank_queue_ms"),
                     }
                 )
+            timings["rerank_ms"] = (time.perf_counter() - rerank_started) * 1000
+            results = reranked if reranked is not None else results[:top_k]
+
+        structured_results = [
+            {
+                "text_chunk": result["text_chunk"],
+                "source_url": result["source_url"],
+                "sources": result.get("sources", [result["source_url"]]),
+            }
+            for result in results
+        ]
 
+        tracing.set_attributes({"retrieval.chunks": len(structured_results)})
         logger.info("Successfully retrieved %d results.", len(structured_results))
         return structured_results
 
     except Exception as e:
+        tracing.record_error(e)
         logger.error("Failed during chunk retrieval: %s", e, exc_info=True)
         return []
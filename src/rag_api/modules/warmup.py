@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from utils.rate_limit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Runs the slow start-up steps of the service in a background thread.
+
+    The server can bind its port immediately while models and indexes load.
+    Each stage is recorded as 'pending', 'running', 'done' or 'failed' together
+    with its duration, so health endpoints can report the progress. Requests
+    that arrive earlier still work, since every component is also loaded
+    lazily on first use. Failed stages are retried with a jittered backoff
+    until they succeed, so readiness recovers once e.g. the collection has
+    been ingested or the embedder is reachable again.
+    """
+
+    def __init__(
+        self,
+        stages: list[tuple[str, Callable[[], Any]]],
+        retry_base: float = 2.0,
+        retry_cap: float = 60.0,
+    ):
+        """
+        Initializes the warm-up without starting it.
+
+        Parameters
+        ----------
+        stages : list[tuple[str, Callable[[], Any]]]
+            Names and functions of the stages, run in order.
+        retry_base : float, optional
+            The backoff scale in seconds between retries of failed stages,
+            by default 2.0.
+        retry_cap : float, optional
+            The maximum delay in seconds between retries, by default 60.0.
+        """
+        self.stages = stages
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.started_at = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._progress: dict[str, dict[str, Any]] = {
+            name: {"status": "pending"} for name, _ in stages
+        }
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """
+        Starts running the stages in a daemon thread.
+
+        Returns
+        -------
+        None
+        """
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Runs every stage and records its outcome, then retries the failed
+        stages with backoff until all of them are done; a failed stage does
+        not stop the following ones.
+
+        Returns
+        -------
+        None
+        """
+        pending = [
+            (name, stage)
+            for name, stage in self.stages
+            if not self._run_stage(name, stage)
+        ]
+        attempt = 0
+        while pending:
+            delay = backoff_delay(attempt, self.retry_base, self.retry_cap)
+            logger.info(
+                "Retrying %d failed warm-up stage(s) in %.1f s", len(pending), delay
+            )
+            time.sleep(delay)
+            pending = [
+                (name, stage)
+                for name, stage in pending
+                if not self._run_stage(name, stage)
+            ]
+            attempt += 1
+        logger.info("Warm-up finished, the service is ready")
+
+    def _run_stage(self, name: str, stage: Callable[[], Any]) -> bool:
+        """
+        Runs a single stage and records its outcome.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage.
+        stage : Callable[[], Any]
+            The function of the stage.
+
+        Returns
+        -------
+        bool
+            True if the stage succeeded.
+        """
+        with self._lock:
+            attempts = self._progress[name].get("attempts", 0) + 1
+            # a retried stage stays 'failed' until it succeeds
+            if self._progress[name]["status"] != "failed":
+                self._progress[name] = {"status": "running"}
+
+        started = time.perf_counter()
+        try:
+            stage()
+        except Exception as e:
+            logger.error(
+                "Warm-up stage '%s' failed: %s", name, e, exc_info=attempts == 1
+            )
+            outcome = {"status": "failed", "error": str(e)}
+        else:
+            outcome = {"status": "done"}
+        outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        outcome["attempts"] = attempts
+
+        with self._lock:
+            self._progress[name] = outcome
+        logger.info(
+            "Warm-up stage '%s' %s in %.0f ms",
+            name,
+            outcome["status"],
+            outcome["duration_ms"],
+        )
+        return outcome["status"] == "done"
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether every stage finished successfully.
+
+        Returns
+        -------
+        bool
+            True once all stages are done.
+        """
+        with self._lock:
+            return all(p["status"] == "done" for p in self._progress.values())
+
+    def status(self) -> dict[str, Any]:
+        """
+        Returns the warm-up progress.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary with 'ready', 'uptime_s' and the progress of every
+            stage under 'stages'.
+        """
+        with self._lock:
+            stages = {name: dict(progress) for name, progress in self._progress.items()}
+
+        return {
+            "ready": all(p["status"] == "done" for p in stages.values()),
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "stages": stages,
+        }
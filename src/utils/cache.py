@@ -0,0 +1,131 @@
+"""
+In-memory caching utilities shared across the project.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Attributes
+    ----------
+    max_size : int
+        Maximum number of entries; the least recently used entry is evicted first.
+    ttl : float
+        Time to live of an entry in seconds.
+    hits : int
+        Number of lookups that returned a cached value.
+    misses : int
+        Number of lookups that found no (or an expired) entry.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        """
+        Initializes an empty cache.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            Maximum number of entries, by default 1024.
+        ttl : float, optional
+            Time to live of an entry in seconds, by default 3600.0.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Returns the cached value for a key and marks it as recently used.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key.
+
+        Returns
+        -------
+        Any | None
+            The cached value, or None if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key.
+        value : Any
+            The value to store.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Removes all entries. Hit and miss counters are kept.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of stored entries, including not yet purged expired ones.
+
+        Returns
+        -------
+        int
+            The number of entries.
+        """
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+        dict[str, Any]
+            A dictionary with 'size', 'hits', 'misses' and 'hit_rate'.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
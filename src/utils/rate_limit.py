@@ -0,0 +1,77 @@
+"""
+Rate limiting and retry helpers shared across the project.
+"""
+
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket limiting how often an action may happen.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; every
+    `acquire` takes one token, blocking until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        """
+        Initializes a full bucket.
+
+        Parameters
+        ----------
+        rate : float
+            Tokens added per second. A non-positive rate disables limiting.
+        capacity : float | None, optional
+            Maximum number of tokens (the allowed burst), by default max(1, rate).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def acquire(self) -> None:
+        """
+        Takes one token, sleeping until one is available.
+        """
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Returns an exponential backoff delay with full jitter.
+
+    Parameters
+    ----------
+    attempt : int
+        The zero-based number of the retry.
+    base : float, optional
+        The delay scale in seconds, by default 1.0.
+    cap : float, optional
+        The maximum delay in seconds, by default 60.0.
+
+    Returns
+    -------
+    float
+        A random delay between 0 and min(cap, base * 2 ** attempt).
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
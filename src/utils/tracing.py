@@ -0,0 +1,200 @@
+"""
+OpenTelemetry tracing shared by the API and the frontend.
+
+Spans are created through the OpenTelemetry API everywhere; unless
+TRACING_ENABLED=1, no tracer provider is installed and they are no-ops. When
+enabled, TRACING_SAMPLE_RATIO of the traces are recorded (a trace started by
+the frontend keeps its sampling decision in the API) and exported in batches
+to a JSONL file or to an OTLP collector.
+"""
+
+import functools
+import logging
+import os
+from collections.abc import Mapping
+from typing import Any
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.trace import Status, StatusCode
+
+from utils.paths import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "0") == "1"
+TRACING_SAMPLE_RATIO = float(os.environ.get("TRACING_SAMPLE_RATIO", 0.1))
+# 'jsonl' or 'otlp'; the collector address is read from OTEL_EXPORTER_OTLP_ENDPOINT
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "jsonl")
+TRACING_JSONL_PATH = os.environ.get(
+    "TRACING_JSONL_PATH", get_data_dir("traces", "spans.jsonl")
+)
+
+
+@functools.cache
+def setup_tracing(service_name: str) -> bool:
+    """
+    Installs the tracer provider of this process, once.
+
+    The SDK and the exporter are imported only if tracing is enabled.
+
+    Parameters
+    ----------
+    service_name : str
+        The 'service.name' resource attribute, e.g. 'rag_api' or 'frontend'.
+
+    Returns
+    -------
+    bool
+        True if tracing was enabled.
+
+    Raises
+    ------
+    ValueError
+        If TRACING_EXPORTER is not supported.
+    """
+    if not TRACING_ENABLED:
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        exporter = OTLPSpanExporter()
+    elif TRACING_EXPORTER == "jsonl":
+        os.makedirs(os.path.dirname(TRACING_JSONL_PATH), exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(TRACING_JSONL_PATH, "a", encoding="utf-8", buffering=1),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    else:
+        raise ValueError(
+            f"Unknown tracing exporter '{TRACING_EXPORTER}', expected 'jsonl' or 'otlp'."
+        )
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    logger.info(
+        "Tracing enabled for %s: sampling %.0f%% of traces, exporting to %s",
+        service_name,
+        TRACING_SAMPLE_RATIO * 100,
+        TRACING_JSONL_PATH if TRACING_EXPORTER == "jsonl" else "OTLP",
+    )
+    return True
+
+
+def get_tracer(name: str) -> trace.Tracer:
+    """
+    Returns a tracer; before `setup_tracing` it resolves to the provider
+    installed later, so module-level tracers are safe.
+
+    Parameters
+    ----------
+    name : str
+        The instrumenting module, usually `__name__`.
+
+    Returns
+    -------
+    opentelemetry.trace.Tracer
+        The tracer.
+    """
+    return trace.get_tracer(name)
+
+
+def request_context(headers: Mapping[str, str]) -> Context:
+    """
+    Returns the trace context a request handler should record its spans in.
+
+    If the web framework already started a server span, the handler's spans
+    become its children; otherwise the trace of the caller is continued from
+    the W3C 'traceparent' headers.
+
+    Parameters
+    ----------
+    headers : Mapping[str, str]
+        The incoming request headers.
+
+    Returns
+    -------
+    opentelemetry.context.Context
+        The parent context (empty if the request is not part of a trace).
+    """
+    if trace.get_current_span().get_span_context().is_valid:
+        return context.get_current()
+    return propagate.extract(headers)
+
+
+def inject_context(headers: dict[str, str] | None = None) -> dict[str, str]:
+    """
+    Adds the current trace context to outgoing request headers.
+
+    Parameters
+    ----------
+    headers : dict[str, str] | None, optional
+        The headers to extend, by default a new dictionary.
+
+    Returns
+    -------
+    dict[str, str]
+        The headers with 'traceparent' if a span is active.
+    """
+    headers = {} if headers is None else headers
+    propagate.inject(headers)
+    return headers
+
+
+def set_attributes(attributes: dict[str, Any], span: trace.Span | None = None) -> None:
+    """
+    Sets attributes on a span, if it is recorded.
+
+    Parameters
+    ----------
+    attributes : dict[str, Any]
+        The attribute values; None values are skipped.
+    span : opentelemetry.trace.Span | None, optional
+        The span, by default the current one.
+
+    Returns
+    -------
+    None
+    """
+    span = trace.get_current_span() if span is None else span
+    if span.is_recording():
+        span.set_attributes(
+            {key: value for key, value in attributes.items() if value is not None}
+        )
+
+
+def record_error(error: BaseException, span: trace.Span | None = None) -> None:
+    """
+    Marks a span as failed with the given exception.
+
+    Parameters
+    ----------
+    error : BaseException
+        The exception that was handled.
+    span : opentelemetry.trace.Span | None, optional
+        The span, by default the current one.
+
+    Returns
+    -------
+    None
+    """
+    span = trace.get_current_span() if span is None else span
+    if span.is_recording():
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))